@@ -9,12 +9,16 @@ from pathlib import Path
 import json
 import io
 import csv
-import unicodedata
 import logging
 import psycopg2.extras
-from utils.db_utils import test_connection, init_db, get_metadata, get_metadata_columns
+from utils.db_utils import (
+    test_connection, init_db, get_metadata_columns, list_metadata_page,
+    get_metadata_details, get_facet_counts, DEFAULT_PAGE_SIZE, METADATA_CACHE_TTL,
+    SEARCH_MODE_FULLTEXT, SEARCH_MODE_FUZZY, FUZZY_SIMILARITY_THRESHOLD
+)
 import importlib
 from utils.auth import authenticate_and_logout
+from utils.cache import cached
 from utils.sql_generator import display_sql_generation_interface_new
 
 # Configuration de la page
@@ -30,10 +34,8 @@ name, authentication_status, username, authenticator = authenticate_and_logout()
 # Ajout du répertoire parent au PYTHONPATH
 sys.path.append(str(Path(__file__).parent))
 
-def remove_accents(input_str):
-    """Supprime les accents d'une chaîne de caractères"""
-    nfkd_form = unicodedata.normalize('NFKD', input_str)
-    return ''.join([c for c in nfkd_form if not unicodedata.combining(c)])
+# Tailles de page proposées pour la liste des résultats
+PAGE_SIZE_OPTIONS = [25, 50, 100]
 
 def highlight_text(text, search_term):
     """Met en surbrillance le terme recherché dans le texte"""
@@ -60,6 +62,52 @@ def highlight_text(text, search_term):
         logging.error(f"Erreur lors de la mise en surbrillance : {str(e)}")
         return text
 
+def facet_selectbox(label, counts):
+    """
+    Liste déroulante d'un filtre affichant le nombre de fiches par valeur.
+    Retourne la valeur choisie, ou None pour "Tous".
+    """
+    return st.selectbox(
+        label, [None] + list(counts),
+        format_func=lambda value: "Tous" if value is None else f"{value} ({counts[value]})"
+    )
+
+def parse_metadata_blob(blob, nrows=None):
+    """
+    Convertit un contenu stocké (JSONB {header, data} ou texte CSV) en DataFrame.
+    Retourne None si le contenu est absent ou illisible.
+    """
+    if isinstance(blob, str):
+        for sep in (';', ','):
+            try:
+                return pd.read_csv(io.StringIO(blob), sep=sep, nrows=nrows)
+            except Exception:
+                continue
+        return None
+    if isinstance(blob, dict) and 'data' in blob:
+        frame = pd.DataFrame(blob.get('data', []), columns=blob.get('header', []))
+        return frame.head(nrows) if nrows else frame
+    return None
+
+@cached(ttl=METADATA_CACHE_TTL, max_entries=200,
+        copy=lambda frames: tuple(None if frame is None else frame.copy() for frame in frames))
+def load_metadata_frames(metadata_id):
+    """
+    Lit et analyse le dictionnaire des variables et l'aperçu des données d'une fiche.
+    Le résultat est mis en cache par identifiant : un rerun ne relit ni ne réanalyse
+    les fiches déjà affichées.
+
+    Returns:
+        (dictionnaire, aperçu) sous forme de DataFrames, None pour un contenu absent
+    """
+    details = get_metadata_details(metadata_id)
+    if not details:
+        return None, None
+    return (
+        parse_metadata_blob(details.get('dictionnaire')),
+        parse_metadata_blob(details.get('contenu_csv'), nrows=4)
+    )
+
 # CSS pour le style de l'interface
 st.markdown("""
 <style>
@@ -218,220 +266,216 @@ except Exception as e:
 
 # Interface de recherche
 st.subheader("Recherche")
-st.write("La recherche s'effectue dans les champs suivants : nom du jeu de données, producteur de la donnée, description et dictionnaire des variables.")
+st.write("La recherche s'effectue dans les champs suivants : nom du jeu de données, nom de la table, producteur de la donnée, description et dictionnaire des variables. Les accents et la casse sont ignorés, et les mots sont reconnus à partir de leur début.")
 
 col1, col2, col3 = st.columns([3, 1, 2])
 
 with col1:
     search_text = st.text_input("Rechercher", placeholder="Entrez un terme à rechercher...")
+    search_mode_label = st.radio(
+        "Type de recherche",
+        ["Plein texte", "Approchée (noms de table, jeux de données, producteurs)"],
+        horizontal=True,
+        help="La recherche approchée tolère les fautes de frappe et les noms partiels (ex. « sirene geo », « filosofi »)."
+    )
+    search_mode = SEARCH_MODE_FUZZY if search_mode_label.startswith("Approchée") else SEARCH_MODE_FULLTEXT
+    similarity_threshold = None
+    if search_mode == SEARCH_MODE_FUZZY:
+        similarity_threshold = st.slider(
+            "Seuil de similarité", min_value=0.1, max_value=0.9,
+            value=FUZZY_SIMILARITY_THRESHOLD, step=0.05,
+            help="Plus le seuil est bas, plus la recherche est tolérante."
+        )
 
-with col2:
-    selected_schema = st.selectbox("Filtrer par schéma", 
-                                ["Tous", "economie", "education", "energie", "environnement", 
-                                 "geo", "logement", "mobilite", "population", "reseau", "securite"])
-
-# Récupération des métadonnées depuis la base de données (avant filtre producteur)
-if search_text:
-    schema_filter = selected_schema if selected_schema != "Tous" else None
-    metadata_results = get_metadata(search_text, schema_filter)
-elif selected_schema and selected_schema != "Tous":
-    metadata_results = get_metadata(None, selected_schema)
-else:
-    metadata_results = get_metadata()
+# Décomptes par valeur de filtre pour la recherche courante (une seule requête, mise en cache)
+facets = get_facet_counts(search_text or None, search_mode, similarity_threshold)
 
-# --- Ajout du filtre producteur ---
-# Extraire la liste des producteurs uniques
-if metadata_results:
-    producteurs_uniques = sorted(list({meta.get('producteur', '') for meta in metadata_results if meta.get('producteur', '')}))
-    producteurs_options = ["Tous"] + producteurs_uniques
-else:
-    producteurs_options = ["Tous"]
+with col2:
+    schema_filter = facet_selectbox("Filtrer par schéma", facets['schema'])
 
 with col3:
-    selected_producteur = st.selectbox("Filtrer par producteur", producteurs_options)
+    producteur_filter = facet_selectbox("Filtrer par producteur", facets['producteur'])
+
+col_type, col_geo = st.columns(2)
+with col_type:
+    type_donnees_filter = facet_selectbox("Filtrer par type de données", facets['type_donnees'])
+with col_geo:
+    granularite_filter = facet_selectbox("Filtrer par granularité géographique", facets['granularite_geo'])
+
+page_size = st.selectbox("Résultats par page", PAGE_SIZE_OPTIONS,
+                         index=PAGE_SIZE_OPTIONS.index(DEFAULT_PAGE_SIZE))
+
+# Pile des curseurs de pagination : remise à zéro dès qu'un critère change
+filters_key = (search_text, search_mode, similarity_threshold, schema_filter, producteur_filter,
+               type_donnees_filter, granularite_filter, page_size)
+if st.session_state.get('catalogue_filters') != filters_key:
+    st.session_state['catalogue_filters'] = filters_key
+    st.session_state['catalogue_cursors'] = [None]
 
-# Appliquer le filtre producteur si sélectionné
-if selected_producteur != "Tous":
-    metadata_results = [meta for meta in metadata_results if meta.get('producteur', '') == selected_producteur]
+def go_next_page(cursor):
+    st.session_state['catalogue_cursors'].append(cursor)
+
+def go_previous_page():
+    if len(st.session_state['catalogue_cursors']) > 1:
+        st.session_state['catalogue_cursors'].pop()
+
+cursors = st.session_state['catalogue_cursors']
+page = list_metadata_page(
+    search_text or None, schema_filter, producteur_filter,
+    search_mode=search_mode, similarity_threshold=similarity_threshold,
+    page_size=page_size, cursor=cursors[-1],
+    type_donnees=type_donnees_filter, granularite_geo=granularite_filter
+)
+metadata_results = page['rows']
+total_results = page['total']
+page_number = len(cursors)
 
 # Affichage du nombre total de résultats
-st.info(f"Nombre total de métadonnées disponibles : {len(metadata_results)}")
+st.info(f"Nombre total de métadonnées disponibles : {total_results}")
 
 # Affichage des résultats
 if not metadata_results:
     st.info("Aucun résultat trouvé.")
 else:
     # Création du DataFrame avec les colonnes principales
-    if metadata_results:
-        # Si les résultats sont des dicts
-        if isinstance(metadata_results[0], dict):
-            data_list = []
-            for meta in metadata_results:
-                data_dict = {
-                    'Nom du jeu de données': meta.get('nom_jeu_donnees', ''),
-                    'Nom de la table': meta.get('nom_table', ''),
-                    'Producteur de la donnée': meta.get('producteur', ''),
-                    'Schéma du SGBD': meta.get('schema', ''),
-                    'Granularité géographique': meta.get('granularite_geo', ''),
-                    'Millésime/année': meta.get('millesime', '') if meta.get('millesime') else '',
-                    'Date de publication': meta.get('date_publication', '').strftime('%d-%m-%Y') if meta.get('date_publication') else '',
-                }
-                data_list.append(data_dict)
-            df = pd.DataFrame(data_list)
-        else:
-            # fallback: ancienne logique (index)
-            data_list = []
-            for meta in metadata_results:
-                data_dict = {
-                    'Nom du jeu de données': meta[5] if len(meta) > 5 and meta[5] else '',
-                    'Nom de la table': meta[17] if len(meta) > 17 and meta[17] else '',
-                    'Producteur de la donnée': meta[2] if len(meta) > 2 and meta[2] else '',
-                    'Schéma du SGBD': meta[3] if len(meta) > 3 and meta[3] else '',
-                    'Granularité géographique': meta[18] if len(meta) > 18 and meta[18] else '',
-                    'Millésime/année': meta[8] if len(meta) > 8 and meta[8] else '',
-                    'Date de publication': meta[9].strftime('%d-%m-%Y') if len(meta) > 9 and meta[9] else '',
-                }
-                data_list.append(data_dict)
-            df = pd.DataFrame(data_list)
-        # Affichage du nombre de résultats
-        st.write(f"**{len(metadata_results)} résultat(s) trouvé(s)**")
-        # Mise en forme conditionnelle
-        def highlight_search_term(val):
-            if search_text and isinstance(val, str):
-                if search_text.lower() in val.lower():
-                    return 'background-color: yellow'
-            return ''
-        styled_df = df.style.map(highlight_search_term, subset=['Nom du jeu de données', 'Nom de la table', 'Producteur de la donnée'])
-        # Création d'un conteneur pour le tableau (comme dans la page de suivi)
-        table_container = st.container()
-        
-        with table_container:
-            st.dataframe(
-                styled_df,
-                column_config={
-                    "Nom du jeu de données": st.column_config.TextColumn(
-                        "Nom du jeu de données",
-                        help="Nom du jeu de données (regroupement logique)"
-                    ),
-                    "Nom de la table": st.column_config.TextColumn(
-                        "Nom de la table",
-                        help="Nom de la table dans la base de données"
-                    ),
-                    "Producteur de la donnée": st.column_config.TextColumn(
-                        "Producteur de la donnée",
-                        help="Organisme producteur des données"
-                    ),
-                    "Date de publication": st.column_config.TextColumn(
-                        "Date de publication",
-                        help="Date de publication de la table"
-                    )
-                },
-                hide_index=True,
-                use_container_width=True
-            )
-
-        # Affichage détaillé des métadonnées
-        for i, meta in enumerate(metadata_results):
-            with st.expander(f"📄 {meta['nom_table'] if meta['nom_table'] else 'Métadonnée ' + str(i+1)}", expanded=False):
-                st.markdown('<div class="metadata-result">', unsafe_allow_html=True)
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.markdown("### 📋 Informations de base")
-                    st.write(f"**Nom du jeu de données :** {meta['nom_jeu_donnees'] if meta['nom_jeu_donnees'] else 'Non spécifié'}")
-                    st.write(f"**Producteur :** {meta['producteur'] if meta['producteur'] else 'Non spécifié'}")
-                    st.write(f"**Schéma :** {meta['schema'] if meta['schema'] else 'Non spécifié'}")
-                    st.write(f"**Millésime :** {meta['millesime'] if meta['millesime'] else 'Non spécifié'}")
-                    st.write(f"**Date de publication :** {meta['date_publication'].strftime('%d-%m-%Y') if meta['date_publication'] else 'Non spécifié'}")
-                    st.write(f"**Fréquence de mise à jour :** {meta['frequence_maj'] if meta['frequence_maj'] else 'Non spécifié'}")
-                    st.write(f"**Type de données :** {meta['type_donnees'] if meta['type_donnees'] else 'Non spécifié'}")
-                    
-                with col2:
-                    st.markdown("### 📝 Description")
-                    st.write(meta['description'] if meta['description'] else "Aucune description disponible")
-                    
-                    if meta['source']:  # URL source
-                        st.markdown("#### 🔗 Source des données")
-                        st.write(f"[Lien vers les données]({meta['source']})")
-                
-                # Affichage des données et du dictionnaire des variables dans des onglets (dictionnaire en premier)
-                if meta['contenu_csv'] and meta['dictionnaire']:
-                    tab1, tab2 = st.tabs(["Dictionnaire des variables", "Aperçu des données"])
-                    with tab1:
-                        try:
-                            # Conversion du dictionnaire en DataFrame
-                            if isinstance(meta['dictionnaire'], str):
-                                try:
-                                    if meta['separateur']:
-                                        dict_data = pd.read_csv(io.StringIO(meta['dictionnaire']), sep=meta['separateur'])
-                                    else:
-                                        dict_data = pd.read_csv(io.StringIO(meta['dictionnaire']), sep=';')
-                                except:
-                                    try:
-                                        dict_data = pd.read_csv(io.StringIO(meta['dictionnaire']), sep=',')
-                                    except:
-                                        dict_data = None
-                            elif isinstance(meta['dictionnaire'], dict) and 'data' in meta['dictionnaire']:
-                                headers = meta['dictionnaire'].get('header', [])
-                                data = meta['dictionnaire'].get('data', [])
-                                dict_data = pd.DataFrame(data, columns=headers)
-                            else:
-                                dict_data = None
-                            if dict_data is not None and not dict_data.empty:
-                                def highlight_search_term_dict(val):
-                                    if search_text and isinstance(val, str):
-                                        if search_text.lower() in val.lower():
-                                            return 'background-color: yellow'
-                                    return ''
-                                styled_dict_data = dict_data.style.map(highlight_search_term_dict)
-                                st.dataframe(styled_dict_data, use_container_width=True)
-                            else:
-                                st.info("Aucune information sur les variables disponible")
-                        except Exception as e:
-                            st.error(f"Erreur lors du chargement du dictionnaire des variables : {str(e)}")
-                    with tab2:
-                        try:
-                            if isinstance(meta['contenu_csv'], str):
-                                try:
-                                    if meta['separateur']:
-                                        csv_data = pd.read_csv(io.StringIO(meta['contenu_csv']), sep=meta['separateur'], nrows=4)
-                                    else:
-                                        csv_data = pd.read_csv(io.StringIO(meta['contenu_csv']), sep=';', nrows=4)
-                                except:
-                                    try:
-                                        csv_data = pd.read_csv(io.StringIO(meta['contenu_csv']), sep=',', nrows=4)
-                                    except:
-                                        csv_data = None
-                            elif isinstance(meta['contenu_csv'], dict) and 'data' in meta['contenu_csv']:
-                                headers = meta['contenu_csv'].get('header', [])
-                                data = meta['contenu_csv'].get('data', [])
-                                csv_data = pd.DataFrame(data, columns=headers)
-                                csv_data = csv_data.head(4)
-                            else:
-                                csv_data = None
-                            if csv_data is not None and not csv_data.empty:
-                                st.dataframe(csv_data, use_container_width=True)
-                            else:
-                                st.info("Aucune donnée disponible")
-                        except Exception as e:
-                            st.info("Erreur lors du chargement des données")
-                            st.error(str(e))
-                
-                # Séparateur visuel
-                st.markdown("---")
-                
-                # Section de génération SQL (visible pour toutes les tables)
-                st.markdown("### 🔧 Génération du script SQL d'import")
-                col_sql1, col_sql2 = st.columns([3, 1])
-                with col_sql1:
-                    st.info("Générez automatiquement le script SQL d'import pour cette table.")
-                with col_sql2:
-                    debug_mode = st.checkbox("Mode debug", key=f"debug_{meta['nom_table']}", help="Affiche des informations supplémentaires pour le débogage")
-                
-                if st.button("Générer le script SQL d'import", key=f"sql_btn_{meta['nom_table']}", type="primary"):
-                    display_sql_generation_interface_new(meta['nom_table'], debug_mode=debug_mode)
-                
-                st.markdown('</div>', unsafe_allow_html=True)
+    data_list = []
+    for meta in metadata_results:
+        data_dict = {
+            'Nom du jeu de données': meta.get('nom_jeu_donnees', ''),
+            'Nom de la table': meta.get('nom_table', ''),
+            'Producteur de la donnée': meta.get('producteur', ''),
+            'Schéma du SGBD': meta.get('schema', ''),
+            'Granularité géographique': meta.get('granularite_geo', ''),
+            'Millésime/année': meta.get('millesime', '') if meta.get('millesime') else '',
+            'Date de publication': meta.get('date_publication', '').strftime('%d-%m-%Y') if meta.get('date_publication') else '',
+        }
+        data_list.append(data_dict)
+    df = pd.DataFrame(data_list)
+
+    # Affichage du nombre de résultats et de la position dans la pagination
+    first_row = (page_number - 1) * page_size + 1
+    last_row = first_row + len(metadata_results) - 1
+    st.write(f"**{total_results} résultat(s) trouvé(s)** — page {page_number}, résultats {first_row} à {last_row}")
+    # Mise en forme conditionnelle
+    def highlight_search_term(val):
+        if search_text and isinstance(val, str):
+            if search_text.lower() in val.lower():
+                return 'background-color: yellow'
+        return ''
+    styled_df = df.style.map(highlight_search_term, subset=['Nom du jeu de données', 'Nom de la table', 'Producteur de la donnée'])
+    # Création d'un conteneur pour le tableau (comme dans la page de suivi)
+    table_container = st.container()
+    
+    with table_container:
+        st.dataframe(
+            styled_df,
+            column_config={
+                "Nom du jeu de données": st.column_config.TextColumn(
+                    "Nom du jeu de données",
+                    help="Nom du jeu de données (regroupement logique)"
+                ),
+                "Nom de la table": st.column_config.TextColumn(
+                    "Nom de la table",
+                    help="Nom de la table dans la base de données"
+                ),
+                "Producteur de la donnée": st.column_config.TextColumn(
+                    "Producteur de la donnée",
+                    help="Organisme producteur des données"
+                ),
+                "Date de publication": st.column_config.TextColumn(
+                    "Date de publication",
+                    help="Date de publication de la table"
+                )
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+
+    # Navigation entre les pages
+    nav_prev, nav_next = st.columns(2)
+    with nav_prev:
+        st.button("◀ Précédent", on_click=go_previous_page, disabled=page_number == 1)
+    with nav_next:
+        st.button("Suivant ▶", on_click=go_next_page, args=(page['next_cursor'],),
+                  disabled=page['next_cursor'] is None)
+
+    # Fiche détaillée : une seule fiche est rendue, celle choisie dans la page courante
+    detail_labels = {
+        meta['id']: f"{meta['nom_table'] if meta['nom_table'] else 'Métadonnée ' + str(first_row + i)}"
+                    f" — {meta['nom_jeu_donnees'] or 'Non spécifié'}"
+        for i, meta in enumerate(metadata_results)
+    }
+    selected_id = st.selectbox(
+        "📄 Afficher la fiche détaillée",
+        [None] + list(detail_labels),
+        format_func=lambda meta_id: "— Choisir une table —" if meta_id is None else detail_labels[meta_id],
+        key=f"detail_select_{page_number}"
+    )
+
+    if selected_id is not None:
+        meta = next(m for m in metadata_results if m['id'] == selected_id)
+        st.markdown('<div class="metadata-result">', unsafe_allow_html=True)
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.markdown("### 📋 Informations de base")
+            st.write(f"**Nom du jeu de données :** {meta['nom_jeu_donnees'] if meta['nom_jeu_donnees'] else 'Non spécifié'}")
+            st.write(f"**Producteur :** {meta['producteur'] if meta['producteur'] else 'Non spécifié'}")
+            st.write(f"**Schéma :** {meta['schema'] if meta['schema'] else 'Non spécifié'}")
+            st.write(f"**Millésime :** {meta['millesime'] if meta['millesime'] else 'Non spécifié'}")
+            st.write(f"**Date de publication :** {meta['date_publication'].strftime('%d-%m-%Y') if meta['date_publication'] else 'Non spécifié'}")
+            st.write(f"**Fréquence de mise à jour :** {meta['frequence_maj'] if meta['frequence_maj'] else 'Non spécifié'}")
+            st.write(f"**Type de données :** {meta['type_donnees'] if meta['type_donnees'] else 'Non spécifié'}")
+
+        with col2:
+            st.markdown("### 📝 Description")
+            st.write(meta['description'] if meta['description'] else "Aucune description disponible")
+
+            if meta['source']:  # URL source
+                st.markdown("#### 🔗 Source des données")
+                st.write(f"[Lien vers les données]({meta['source']})")
+
+        # Affichage des données et du dictionnaire des variables dans des onglets (dictionnaire en premier)
+        try:
+            dict_data, csv_data = load_metadata_frames(meta['id'])
+        except Exception as e:
+            st.error(f"Erreur lors du chargement du dictionnaire des variables : {str(e)}")
+            dict_data, csv_data = None, None
+
+        if dict_data is not None or csv_data is not None:
+            tab1, tab2 = st.tabs(["Dictionnaire des variables", "Aperçu des données"])
+            with tab1:
+                if dict_data is not None and not dict_data.empty:
+                    def highlight_search_term_dict(val):
+                        if search_text and isinstance(val, str):
+                            if search_text.lower() in val.lower():
+                                return 'background-color: yellow'
+                        return ''
+                    styled_dict_data = dict_data.style.map(highlight_search_term_dict)
+                    st.dataframe(styled_dict_data, use_container_width=True)
+                else:
+                    st.info("Aucune information sur les variables disponible")
+            with tab2:
+                if csv_data is not None and not csv_data.empty:
+                    st.dataframe(csv_data, use_container_width=True)
+                else:
+                    st.info("Aucune donnée disponible")
+
+        # Séparateur visuel
+        st.markdown("---")
+
+        # Section de génération SQL
+        st.markdown("### 🔧 Génération du script SQL d'import")
+        col_sql1, col_sql2 = st.columns([3, 1])
+        with col_sql1:
+            st.info("Générez automatiquement le script SQL d'import pour cette table.")
+        with col_sql2:
+            debug_mode = st.checkbox("Mode debug", key=f"debug_{meta['nom_table']}", help="Affiche des informations supplémentaires pour le débogage")
+
+        if st.button("Générer le script SQL d'import", key=f"sql_btn_{meta['nom_table']}", type="primary"):
+            display_sql_generation_interface_new(meta['nom_table'], debug_mode=debug_mode)
+
+        st.markdown('</div>', unsafe_allow_html=True)
 
 # Section d'aide et informations
 st.markdown('<div class="help-section">', unsafe_allow_html=True)
@@ -441,7 +485,7 @@ with st.expander("❓ Aide et informations"):
     
     - **Recherche** : Saisissez un terme dans le champ de recherche pour filtrer les métadonnées. La recherche s'effectue dans le nom de la base, le nom de la table, le producteur, la description, le schéma, la source, la licence et la personne ayant rempli le formulaire.
     - **Filtre par schéma** : Utilisez le menu déroulant pour filtrer par schéma de base de données.
-    - **Consulter les détails** : Cochez la case "Afficher les détails complets" pour voir toutes les informations, y compris le contenu CSV et le dictionnaire des variables si disponibles.
+    - **Consulter les détails** : Choisissez une table dans la liste "Afficher la fiche détaillée" pour voir toutes les informations, y compris le contenu CSV et le dictionnaire des variables si disponibles.
     
     ### Structure des métadonnées
     
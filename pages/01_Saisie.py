@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
 import sys
 from pathlib import Path
@@ -11,7 +11,8 @@ import re
 
 # Ajout du répertoire parent au PYTHONPATH
 sys.path.append(str(Path(__file__).parent.parent))
-from utils.db_utils import init_db, save_metadata, get_types_donnees, get_producteurs_by_type, get_jeux_donnees_by_producteur, get_db_connection
+from utils.db_utils import init_db, save_metadata, get_types_donnees, get_producteurs_by_type, get_jeux_donnees_by_producteur
+from utils.scheduling import next_publication_date
 
 def parse_csv_line(line: str, separator: str) -> list:
     """Parse intelligente d'une ligne CSV avec gestion des guillemets."""
@@ -175,22 +176,8 @@ with col8:
     frequence_maj = st.selectbox("Fréquence de mise à jour des données*", [
         "", "Annuelle", "Semestrielle", "Trimestrielle", "Mensuelle", "Quotidienne", "Ponctuelle"
     ], help="Fréquence à laquelle les données sont mises à jour")
-    def calculer_prochaine_publication(date_pub, freq):
-        if not date_pub or not freq:
-            return None
-        if freq == "Annuelle":
-            return date_pub + timedelta(days=365)
-        elif freq == "Semestrielle":
-            return date_pub + timedelta(days=182)
-        elif freq == "Trimestrielle":
-            return date_pub + timedelta(days=91)
-        elif freq == "Mensuelle":
-            return date_pub + timedelta(days=30)
-        elif freq == "Quotidienne":
-            return date_pub + timedelta(days=1)
-        else:
-            return None
-    date_prochaine_publication_auto = calculer_prochaine_publication(date_publication, frequence_maj)
+    # Calcul calendaire (même règle que le recalcul du catalogue, voir utils/scheduling.py)
+    date_prochaine_publication_auto = next_publication_date(date_publication, frequence_maj)
 with col8:
     date_prochaine_publication = st.date_input(
         "Date estimative de la prochaine publication*",
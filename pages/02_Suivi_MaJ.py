@@ -1,9 +1,10 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta, date
 import plotly.express as px
 import plotly.graph_objects as go
-from utils.db_utils import get_db_connection
+from utils.db_utils import get_update_tracking
 from utils.auth import authenticate_and_logout
 
 st.set_page_config(
@@ -17,107 +18,6 @@ name, authentication_status, username, authenticator = authenticate_and_logout()
 
 st.title("Suivi des mises à jour des données")
 
-# Fonction pour récupérer les données de suivi
-@st.cache_data(ttl=3600)  # Cache pour 1 heure
-def get_update_data():
-    try:
-        conn = get_db_connection()
-        query = '''
-        SELECT 
-            nom_jeu_donnees,
-            producteur,
-            schema,
-            date_publication,
-            millesime,
-            date_prochaine_publication,
-            frequence_maj,
-            source
-        FROM metadata
-        WHERE nom_jeu_donnees IS NOT NULL 
-        AND date_publication IS NOT NULL
-        ORDER BY nom_jeu_donnees, date_publication DESC, millesime DESC, id DESC
-        '''
-        df = pd.read_sql(query, conn)
-        conn.close()
-        
-        return df
-    except Exception as e:
-        st.error(f"Erreur lors de la récupération des données : {e}")
-        return pd.DataFrame()
-
-def compute_status_by_dataset(df):
-    """
-    Calcule le statut pour chaque jeu de données basé sur sa version la plus récente,
-    puis applique ce statut à toutes les versions du même jeu de données.
-    """
-    # Créer une copie pour éviter les modifications
-    df = df.copy()
-    
-    # Fonction pour calculer le statut d'une ligne
-    def compute_single_status(row):
-        freq = str(row.get('frequence_maj', '') or '').strip().lower()
-        if freq == "ponctuelle" or freq == "" or pd.isnull(freq):
-            return "MaJ non prévue"
-        
-        if pd.isnull(row['date_prochaine_publication']):
-            return "Inconnu"
-        
-        dpp = row['date_prochaine_publication']
-        date_publication = row['date_publication']
-        today = pd.Timestamp.now().normalize()
-        
-        if not pd.isnull(date_publication) and date_publication >= dpp:
-            return "À jour"
-        
-        if dpp < today:
-            return "En retard"
-        elif (dpp - today).days < 7:
-            return "À mettre à jour"
-        else:
-            return "À jour"
-    
-    # Grouper par jeu de données et trouver la version la plus récente
-    dataset_status = {}
-    
-    for dataset_name in df['nom_jeu_donnees'].unique():
-        dataset_rows = df[df['nom_jeu_donnees'] == dataset_name].copy()
-        # Trier par date de publication décroissante pour avoir la plus récente en premier
-        dataset_rows = dataset_rows.sort_values(['date_publication', 'millesime'], ascending=[False, False])
-        
-        if not dataset_rows.empty:
-            # Prendre la première ligne (la plus récente)
-            latest_row = dataset_rows.iloc[0]
-            status = compute_single_status(latest_row)
-            dataset_status[dataset_name] = status
-    
-    # Appliquer le statut du jeu de données à toutes ses versions
-    df['statut'] = df['nom_jeu_donnees'].map(dataset_status)
-    
-    return df
-
-def compute_status(row):
-    """Fonction de compatibilité - ne devrait plus être utilisée directement"""
-    freq = str(row.get('frequence_maj', '') or '').strip().lower()
-    if freq == "ponctuelle" or freq == "" or pd.isnull(freq):
-        return "MaJ non prévue"
-    
-    if pd.isnull(row['date_prochaine_publication']):
-        return "Inconnu"
-    
-    dpp = row['date_prochaine_publication']
-    date_publication = row['date_publication']
-    today = pd.Timestamp.now().normalize()
-    
-    if not pd.isnull(date_publication) and date_publication >= dpp:
-        return "À jour"
-    
-    if dpp < today:
-        return "En retard"
-    elif (dpp - today).days < 7:
-        return "À mettre à jour"
-    else:
-        return "À jour"
-
 def get_status_color(status):
     return {
         "En retard": "#ff4b4b",
@@ -127,23 +27,83 @@ def get_status_color(status):
         "Inconnu": "#bdbdbd"
     }.get(status, "#bdbdbd")
 
+def timeline_traces(df_versions, color_map):
+    """
+    Traces de la timeline de couverture : pour chaque statut, une trace de barres
+    (publication → fin de validité, segments séparés par None) puis, par-dessus
+    toutes les barres, une trace de points de publication avec leur infobulle.
+
+    Args:
+        df_versions: Versions à afficher (dates valides, valeurs manquantes déjà remplacées)
+        color_map: Couleur par statut
+
+    Returns:
+        Liste de go.Scatter (deux par statut présent)
+    """
+    hover_text = (
+        "<b>Publication</b><br>"
+        "Jeu: " + df_versions['nom_jeu_donnees'].astype(str) + "<br>"
+        "Millésime: " + df_versions['millesime'].astype(str) + "<br>"
+        "Date: " + df_versions['date_publication'].dt.strftime('%Y-%m-%d') + "<br>"
+        "Fin validité: " + df_versions['date_prochaine_publication'].dt.strftime('%Y-%m-%d') + "<br>"
+        "Producteur: " + df_versions['producteur'].astype(str) + "<br>"
+        "Fréquence: " + df_versions['frequence_maj'].astype(str) + "<br>"
+        "Statut: " + df_versions['statut'].astype(str)
+    )
+
+    line_traces, marker_traces = [], []
+    for statut, group in df_versions.groupby('statut', sort=False):
+        color = color_map.get(statut, '#bdbdbd')
+        n = len(group)
+
+        # Segments [début, fin, None] mis bout à bout : une seule trace pour toutes les barres
+        x = np.empty(3 * n, dtype=object)
+        x[0::3] = group['date_publication'].to_numpy(dtype=object)
+        x[1::3] = group['date_prochaine_publication'].to_numpy(dtype=object)
+        x[2::3] = None
+        y = np.empty(3 * n, dtype=object)
+        y[0::3] = y[1::3] = group['nom_jeu_donnees'].to_numpy(dtype=object)
+        y[2::3] = None
+
+        line_traces.append(go.Scatter(
+            x=x,
+            y=y,
+            mode='lines',
+            line=dict(
+                color=color,
+                width=8  # Épaisseur des barres augmentée pour plus de visibilité
+            ),
+            connectgaps=False,
+            showlegend=False,
+            hoverinfo='skip'  # Désactiver complètement le hover pour les barres
+        ))
+        marker_traces.append(go.Scatter(
+            x=group['date_publication'],
+            y=group['nom_jeu_donnees'],
+            mode='markers',
+            marker=dict(
+                color=color,
+                size=12,  # Taille des marqueurs augmentée
+                symbol='circle',
+                line=dict(width=2, color='white')  # Bordure plus épaisse pour plus de contraste
+            ),
+            text=hover_text.loc[group.index],
+            showlegend=False,
+            hovertemplate="%{text}<extra></extra>"
+        ))
+    return line_traces + marker_traces
+
 # --- MAIN LOGIC ---
 try:
-    df = get_update_data()
-    if df.empty:
+    # Tableau de suivi : seule la version la plus récente de chaque jeu de données est lue,
+    # avec son statut calculé par la base (vue metadata_latest_version)
+    df_table = get_update_tracking()
+    if df_table.empty:
         st.info("Aucune donnée à afficher (base vide ou erreur de connexion).")
     else:
         # Conversion des dates (garder en datetime pour Plotly)
         for col in ["date_publication", "date_prochaine_publication"]:
-            df[col] = pd.to_datetime(df[col])
-        
-        # Calcul du statut pour toutes les données
-        df = compute_status_by_dataset(df)
-        
-        # Pour le tableau de suivi, on ne garde que la version la plus récente de chaque jeu de données
-        df_table = df.groupby('nom_jeu_donnees').apply(
-            lambda x: x.sort_values(['date_publication', 'millesime'], ascending=[False, False]).iloc[0]
-        ).reset_index(drop=True)
+            df_table[col] = pd.to_datetime(df_table[col])
         
         # Affichage du tableau de suivi
         st.subheader("Tableau de suivi")
@@ -178,17 +138,16 @@ try:
         if selected_statut != "Tous":
             df_table_filtered = df_table_filtered[df_table_filtered['statut'] == selected_statut]
         
-        # Application des mêmes filtres sur le dataset complet pour le graphique
-        df_filtered = df.copy()
-        
-        if selected_producteur != "Tous":
-            df_filtered = df_filtered[df_filtered['producteur'] == selected_producteur]
-        
-        if selected_schema != "Tous" and 'schema' in df_filtered.columns:
-            df_filtered = df_filtered[df_filtered['schema'] == selected_schema]
-        
-        if selected_statut != "Tous":
-            df_filtered = df_filtered[df_filtered['statut'] == selected_statut]
+        # Graphique : historique complet des seuls jeux de données retenus par les filtres
+        # (chaque version porte le statut de la plus récente)
+        filters_active = (selected_producteur, selected_schema, selected_statut) != ("Tous", "Tous", "Tous")
+        datasets = tuple(sorted(df_table_filtered['nom_jeu_donnees'])) if filters_active else None
+        if datasets == ():
+            df_filtered = df_table_filtered.iloc[0:0]
+        else:
+            df_filtered = get_update_tracking(history=True, datasets=datasets)
+            for col in ["date_publication", "date_prochaine_publication"]:
+                df_filtered[col] = pd.to_datetime(df_filtered[col])
         
         # Mise à jour de df_display avec les données filtrées du tableau
         df_display = df_table_filtered.copy().reset_index(drop=True)
@@ -329,61 +288,9 @@ try:
                     # Créer une liste unique des jeux de données pour l'affichage Y
                     jeux_uniques = sorted(df_clean['nom_jeu_donnees'].unique())
                     
-                    # Étape 1: Ajouter les barres de couverture temporelle (publication → fin de validité)
-                    for idx, row in df_clean.iterrows():
-                        # Vérifier que les données sont valides
-                        if pd.isna(row['date_publication']) or pd.isna(row['date_prochaine_publication']):
-                            continue
-                        
-                        # Utiliser le nom du jeu de données (toutes les versions sur la même ligne)
-                        dataset_name = row['nom_jeu_donnees']
-                        
-                        # Barre horizontale : de la date de publication à la fin de validité
-                        fig.add_trace(go.Scatter(
-                            x=[row['date_publication'], row['date_prochaine_publication']],
-                            y=[dataset_name, dataset_name],
-                            mode='lines',
-                            line=dict(
-                                color=color_map.get(row['statut'], '#bdbdbd'),
-                                width=8  # Épaisseur des barres augmentée pour plus de visibilité
-                            ),
-                            showlegend=False,
-                            hoverinfo='skip'  # Désactiver complètement le hover pour les barres
-                        ))
-                    
-                    # Étape 2: Ajouter les points de publication (par-dessus les barres)
-                    for idx, row in df_clean.iterrows():
-                        if pd.isna(row['date_publication']):
-                            continue
-                        
-                        # Utiliser le nom du jeu de données (toutes les versions sur la même ligne)
-                        dataset_name = row['nom_jeu_donnees']
-                        
-                        # Créer un hovertemplate propre avec info de la version
-                        hover_text = (
-                            f"<b>Publication</b><br>"
-                            f"Jeu: {str(row['nom_jeu_donnees'])}<br>"
-                            f"Millésime: {str(row['millesime'])}<br>"
-                            f"Date: {row['date_publication'].strftime('%Y-%m-%d')}<br>"
-                            f"Fin validité: {row['date_prochaine_publication'].strftime('%Y-%m-%d')}<br>"
-                            f"Producteur: {str(row['producteur'])}<br>"
-                            f"Fréquence: {str(row['frequence_maj'])}<br>"
-                            f"Statut: {str(row['statut'])}"
-                        )
-                        
-                        fig.add_trace(go.Scatter(
-                            x=[row['date_publication']],
-                            y=[dataset_name],
-                            mode='markers',
-                            marker=dict(
-                                color=color_map.get(row['statut'], '#bdbdbd'),
-                                size=12,  # Taille des marqueurs augmentée
-                                symbol='circle',
-                                line=dict(width=2, color='white')  # Bordure plus épaisse pour plus de contraste
-                            ),
-                            showlegend=False,
-                            hovertemplate=hover_text + "<extra></extra>"
-                        ))
+                    # Quelques traces seulement (barres puis points, une trace par statut),
+                    # quel que soit le nombre de versions
+                    fig.add_traces(timeline_traces(df_clean, color_map))
                     
                     # Configuration du layout avec extension future
                     # Calculer les bornes temporelles étendues
@@ -485,18 +392,21 @@ try:
             else:
                 st.warning("Aucun jeu de données avec des dates valides pour afficher la timeline.")
             
-            # Légende des statuts
+            # Légende des statuts : nombre de versions de tout le catalogue, quels que soient les filtres
+            # (historique complet lu dans l'instantané incrémental de get_update_tracking)
+            df_all = df_filtered if datasets is None else get_update_tracking(history=True)
+            status_counts = df_all['statut'].value_counts() if 'statut' in df_all.columns else pd.Series(dtype=int)
             col1, col2, col3, col4, col5 = st.columns(5)
             with col1:
-                st.markdown(f"🔴 **En retard** ({len(df[df['statut'] == 'En retard'])})")
+                st.markdown(f"🔴 **En retard** ({status_counts.get('En retard', 0)})")
             with col2:
-                st.markdown(f"🟠 **À mettre à jour** ({len(df[df['statut'] == 'À mettre à jour'])})")
+                st.markdown(f"🟠 **À mettre à jour** ({status_counts.get('À mettre à jour', 0)})")
             with col3:
-                st.markdown(f"🟢 **À jour** ({len(df[df['statut'] == 'À jour'])})")
+                st.markdown(f"🟢 **À jour** ({status_counts.get('À jour', 0)})")
             with col4:
-                st.markdown(f"🔵 **MaJ non prévue** ({len(df[df['statut'] == 'MaJ non prévue'])})")
+                st.markdown(f"🔵 **MaJ non prévue** ({status_counts.get('MaJ non prévue', 0)})")
             with col5:
-                st.markdown(f"⚪ **Inconnu** ({len(df[df['statut'] == 'Inconnu'])})")
+                st.markdown(f"⚪ **Inconnu** ({status_counts.get('Inconnu', 0)})")
         else:
             st.info("Aucune donnée à afficher pour les filtres sélectionnés.")
 
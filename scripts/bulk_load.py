@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Charge un fichier CSV dans une table décrite dans le catalogue de métadonnées.
+
+La table cible (schéma, colonnes, séparateur) est lue dans la fiche du catalogue ;
+elle doit déjà exister dans la base cible (script SQL généré depuis le catalogue).
+La connexion à la base cible suit les conventions libpq : chaîne --dsn ou
+variables d'environnement PGHOST, PGPORT, PGDATABASE, PGUSER, PGPASSWORD.
+Le chargement est validé par lots ; après une interruption, relancer la même
+commande avec --resume pour repartir du dernier lot validé. Sans --resume, une
+table qui contient déjà des lignes est refusée : --truncate la vide avant le
+chargement, --append y ajoute les lignes du fichier.
+
+Exemple :
+    python scripts/bulk_load.py sirene_geo_2025_t2 fichier.csv --dsn "host=localhost dbname=opendata"
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+import psycopg2
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.bulk_loader import (
+    checkpointed_load, parallel_load, target_from_catalogue, DEFAULT_CHECKPOINT_ROWS
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chargement COPY d'un fichier CSV décrit dans le catalogue")
+    parser.add_argument('nom_table', help="Nom de la table dans le catalogue")
+    parser.add_argument('csv_path', help="Fichier CSV à charger")
+    parser.add_argument('--dsn', default='', help="Chaîne de connexion libpq de la base cible")
+    parser.add_argument('--encoding', default='utf-8', help="Encodage du fichier (défaut : utf-8)")
+    parser.add_argument('--no-header', action='store_true', help="Le fichier n'a pas de ligne d'en-tête")
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_CHECKPOINT_ROWS,
+                        help=f"Lignes par lot validé avec son point de reprise (défaut : {DEFAULT_CHECKPOINT_ROWS})")
+    parser.add_argument('--resume', action='store_true',
+                        help="Reprendre un chargement interrompu au dernier point de reprise validé")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--truncate', action='store_true',
+                      help="Vider la table cible avant le chargement (avec la réinitialisation du point de reprise)")
+    mode.add_argument('--append', action='store_true',
+                      help="Ajouter les lignes à une table cible qui en contient déjà")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Chargement parallèle par N processus, avec bascule atomique de la table")
+    args = parser.parse_args()
+
+    target = target_from_catalogue(args.nom_table, encoding=args.encoding, header=not args.no_header)
+    print(f"🗂️  Cible : {target.qualified_name} ({len(target.columns)} colonnes, séparateur '{target.delimiter}')")
+
+    if args.resume and (args.truncate or args.append):
+        parser.error("--truncate et --append ne s'appliquent pas à une reprise (--resume)")
+
+    if args.workers > 1:
+        if args.append:
+            parser.error("--append est incompatible avec --workers : le chargement parallèle remplace le contenu de la table")
+        try:
+            stats = parallel_load({'dsn': args.dsn}, target, args.csv_path, workers=args.workers,
+                                  resume=args.resume, batch_rows=args.batch_rows)
+        except Exception as e:
+            print(f"❌ Erreur lors du chargement : {e}")
+            return 1
+        print(f"✅ {stats['rows']:,} lignes chargées en {stats['seconds']:.1f}s ({stats['rows_per_second']:,.0f} lignes/s)")
+        return 0
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        stats = checkpointed_load(conn, target, args.csv_path, resume=args.resume,
+                                  batch_rows=args.batch_rows, truncate=args.truncate,
+                                  append=args.append)
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Erreur lors du chargement : {e}")
+        return 1
+    finally:
+        conn.close()
+
+    print(f"✅ {stats['rows']:,} lignes chargées en {stats['seconds']:.1f}s ({stats['rows_per_second']:,.0f} lignes/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -69,6 +69,9 @@ def delete_insee_records():
                     AND (nom_base ILIKE '%Population%' OR nom_base ILIKE '%Logement%');
                 """)
                 deleted_count = cur.rowcount
+
+                # Invalide les caches des applications en cours d'exécution
+                cur.execute("UPDATE metadata_cache_generation SET generation = generation + 1")
                 
                 # Commit des changements
                 conn.commit()
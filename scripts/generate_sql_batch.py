@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Génère les scripts SQL d'import de plusieurs tables du catalogue en une fois.
+
+Les tables sont désignées par leur nom (nom_table) ou par schéma. Les scripts
+sont écrits un par table, ou réunis en une migration unique (--combined), dans
+un répertoire ou une archive (chemin de sortie se terminant par .zip).
+
+Les fichiers CSV locaux (--csv, --csv-dir) sont profilés en entier pour déduire les
+types et leur chemin est écrit dans la commande \\copy. Sans fichier, les types
+viennent de l'extrait du catalogue et le chemin reste à compléter ; la migration
+unique (--combined) charge les données et exige donc un fichier pour chaque table.
+
+Exemples :
+    python scripts/generate_sql_batch.py --schema insee --output scripts_insee.zip
+    python scripts/generate_sql_batch.py table_a table_b --output sql/ --combined --csv-dir donnees/
+    python scripts/generate_sql_batch.py table_a --csv table_a=export.csv --output sql/
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.sql_batch import generate_sql_batch, write_batch
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génération par lots des scripts SQL d'import")
+    parser.add_argument('tables', nargs='*', help="Noms des tables dans le catalogue")
+    parser.add_argument('--schema', help="Toutes les tables de ce schéma")
+    parser.add_argument('--output', required=True, help="Répertoire de sortie, ou archive .zip")
+    parser.add_argument('--combined', action='store_true',
+                        help="Une seule migration pour toutes les tables (une transaction)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Nombre de processus de génération (défaut : nombre de processeurs)")
+    parser.add_argument('--csv', action='append', default=[], metavar='TABLE=CHEMIN',
+                        help="Fichier CSV d'une table (option répétable)")
+    parser.add_argument('--csv-dir', help="Répertoire des fichiers <nom_table>.csv")
+    parser.add_argument('--csv-encoding', default='utf-8', help="Encodage des fichiers CSV (défaut : utf-8)")
+    args = parser.parse_args()
+
+    if not args.tables and not args.schema:
+        parser.error("indiquer des noms de tables ou --schema")
+    csv_paths = {}
+    for item in args.csv:
+        name, sep, path = item.partition('=')
+        if not sep or not name or not path:
+            parser.error(f"--csv attend TABLE=CHEMIN : {item}")
+        csv_paths[name] = path
+
+    try:
+        batch = generate_sql_batch(table_names=args.tables or None, schema=args.schema, workers=args.workers,
+                                   csv_paths=csv_paths, csv_dir=args.csv_dir, csv_encoding=args.csv_encoding)
+    except Exception as e:
+        print(f"❌ Erreur lors de la génération : {e}")
+        return 1
+
+    results = batch['results']
+    for result in results:
+        if result['error']:
+            print(f"❌ {result['nom_table']} : {result['error']}")
+        else:
+            print(f"✅ {result['nom_table']} ({result['schema']}) : {result['seconds'] * 1000:.0f} ms")
+
+    label = args.schema or 'catalogue'
+    try:
+        files = write_batch(results, args.output, combined=args.combined, label=label)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    errors = sum(1 for result in results if result['error'])
+    print(f"📦 {len(files)} fichiers écrits dans {args.output} "
+          f"({len(results) - errors} tables, {errors} erreurs, lecture {batch['fetch_seconds']:.2f}s, "
+          f"total {batch['seconds']:.1f}s)")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
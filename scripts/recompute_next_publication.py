@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Recalcule la date de prochaine publication des fiches du catalogue d'après leur
+date de publication et leur fréquence de mise à jour (arithmétique calendaire,
+voir utils/scheduling.py), en une passe et un seul UPDATE.
+
+Par défaut seules les dates absentes sont complétées ; --all remplace aussi les
+dates existantes qui diffèrent du calcul.
+
+Exemples :
+    python scripts/recompute_next_publication.py --dry-run
+    python scripts/recompute_next_publication.py --all
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.db_utils import db_connection
+from utils.scheduling import recompute_next_publications
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcul des dates de prochaine publication du catalogue")
+    parser.add_argument('--all', action='store_true',
+                        help="Remplacer aussi les dates existantes (défaut : compléter les dates absentes)")
+    parser.add_argument('--dry-run', action='store_true', help="Calculer sans écrire dans la base")
+    args = parser.parse_args()
+
+    try:
+        with db_connection() as conn:
+            stats = recompute_next_publications(conn, missing_only=not args.all, dry_run=args.dry_run)
+    except Exception as e:
+        print(f"❌ Erreur lors du recalcul : {e}")
+        return 1
+
+    if args.dry_run:
+        print(f"🔍 {stats['changes']} fiches à mettre à jour sur {stats['rows']} "
+              f"({stats['computed']} dates calculées, simulation sans écriture)")
+    else:
+        print(f"✅ {stats['updated']} fiches mises à jour sur {stats['rows']} ({stats['seconds']:.2f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,823 @@
+"""
+Chargement massif de fichiers CSV dans PostgreSQL par COPY ... FROM STDIN.
+Le fichier est lu en flux : chaque enregistrement est complété ou tronqué au
+nombre de colonnes de la table cible à la volée, sans jamais charger le fichier
+en mémoire. Les lignes déjà conformes (cas général) sont transmises telles
+quelles à PostgreSQL ; seules les lignes à corriger sont réécrites.
+
+Exemple :
+    target = LoadTarget('economie', 'sirene_geo_2025_t2', colonnes, delimiter=';')
+    with psycopg2.connect(...) as conn:
+        stats = bulk_load(conn, target, 'fichier.csv')
+"""
+
+import csv
+import hashlib
+import io
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import psycopg2
+
+# Correspondance des encodages Python usuels vers les noms PostgreSQL
+PG_ENCODINGS = {
+    'utf-8': 'UTF8',
+    'utf8': 'UTF8',
+    'utf-8-sig': 'UTF8',
+    'latin-1': 'LATIN1',
+    'latin1': 'LATIN1',
+    'iso-8859-1': 'LATIN1',
+    'iso-8859-15': 'LATIN9',
+    'cp1252': 'WIN1252',
+    'windows-1252': 'WIN1252',
+}
+
+# Taille des blocs lus par COPY dans le flux
+COPY_BUFFER_SIZE = 1 << 16
+# Taille des blocs lus pour compter les guillemets lors du découpage en plages
+SCAN_BLOCK_SIZE = 1 << 23
+
+QUOTE = b'"'
+
+# Table de suivi des chargements reprenables (créée dans la base cible)
+CHECKPOINT_TABLE = 'public.bulk_load_checkpoints'
+# Lignes par lot validé lorsque le chargement est reprenable
+DEFAULT_CHECKPOINT_ROWS = 500000
+# Octets lus au début et à la fin du fichier pour son empreinte
+FINGERPRINT_SAMPLE_SIZE = 1 << 20
+
+
+class LoadTarget:
+    """
+    Description de la table cible d'un chargement.
+
+    Args:
+        schema: Schéma de la table
+        table: Nom de la table
+        columns: Colonnes de la table dans l'ordre du fichier
+        delimiter: Séparateur du fichier CSV
+        encoding: Encodage Python du fichier (voir PG_ENCODINGS)
+        header: Le fichier commence par une ligne d'en-tête
+        empty_as_null: Les champs vides deviennent NULL ; sinon des chaînes vides
+    """
+
+    def __init__(self, schema: str, table: str, columns: List[str], delimiter: str = ';',
+                 encoding: str = 'utf-8', header: bool = True, empty_as_null: bool = True):
+        if encoding.lower() not in PG_ENCODINGS:
+            raise ValueError(f"Encodage non pris en charge : {encoding}")
+        self.schema = schema
+        self.table = table
+        self.columns = list(columns)
+        self.delimiter = delimiter
+        self.encoding = encoding
+        self.header = header
+        self.empty_as_null = empty_as_null
+
+    @property
+    def qualified_name(self) -> str:
+        return f'"{self.schema}"."{self.table}"'
+
+    def copy_sql(self, table: Optional[str] = None) -> str:
+        """Requête COPY vers la table cible (ou vers une autre table du même schéma)"""
+        columns = ', '.join(f'"{col}"' for col in self.columns)
+        name = f'"{self.schema}"."{table}"' if table else self.qualified_name
+        delimiter = self.delimiter.replace("'", "''")
+        options = [
+            "FORMAT csv",
+            f"DELIMITER '{delimiter}'",
+            "QUOTE '\"'",
+            f"ENCODING '{PG_ENCODINGS[self.encoding.lower()]}'",
+        ]
+        if not self.empty_as_null:
+            options.append(f"FORCE_NOT_NULL ({columns})")
+        return f"COPY {name} ({columns}) FROM STDIN WITH ({', '.join(options)})"
+
+
+def iter_records(f, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[bytes, int]]:
+    """
+    Découpe un fichier binaire en enregistrements CSV complets.
+
+    Un enregistrement peut s'étendre sur plusieurs lignes lorsqu'un champ entre
+    guillemets contient un retour à la ligne : les lignes sont accumulées tant que
+    le nombre de guillemets est impair.
+
+    Args:
+        f: Fichier ouvert en mode binaire
+        start: Position du premier enregistrement (doit être un début d'enregistrement)
+        end: Les enregistrements commençant à cette position ou après ne sont pas lus
+
+    Yields:
+        (enregistrement sans fin de ligne, position juste après l'enregistrement)
+    """
+    f.seek(start)
+    position = start
+    while end is None or position < end:
+        line = f.readline()
+        if not line:
+            return
+        record = line
+        while record.count(QUOTE) % 2:
+            continuation = f.readline()
+            if not continuation:
+                break
+            record += continuation
+        position += len(record)
+        record = record.rstrip(b'\r\n')
+        if record:
+            yield record, position
+
+
+class CopyStream(io.RawIOBase):
+    """
+    Flux lu par ``cursor.copy_expert`` : normalise chaque enregistrement au nombre
+    de colonnes de la cible et s'arrête après ``max_rows`` lignes (lot).
+
+    Args:
+        records: Itérateur de iter_records (partagé entre les lots successifs)
+        target: Table cible
+        max_rows: Nombre maximal de lignes de ce lot (None = jusqu'à la fin du fichier)
+        progress: Appelée avec (lignes, position) toutes les ``progress_every`` lignes
+    """
+
+    def __init__(self, records: Iterator[Tuple[bytes, int]], target: LoadTarget,
+                 max_rows: Optional[int] = None,
+                 progress: Optional[Callable[[int, int], None]] = None,
+                 progress_every: int = 100000):
+        super().__init__()
+        self._records = records
+        self._target = target
+        self._ncols = len(target.columns)
+        self._delimiter = target.delimiter.encode(target.encoding)
+        self._max_rows = max_rows
+        self._progress = progress
+        self._progress_every = progress_every
+        self._buffer = bytearray()
+        self.rows = 0
+        self.rows_normalized = 0
+        self.offset = None
+        self.exhausted = False
+
+    def readable(self) -> bool:
+        return True
+
+    def _normalize(self, record: bytes) -> bytes:
+        """Complète ou tronque un enregistrement au nombre de colonnes de la cible"""
+        if QUOTE not in record:
+            fields = record.split(self._delimiter)
+            if len(fields) == self._ncols:
+                return record
+            self.rows_normalized += 1
+            fields = fields[:self._ncols] + [b''] * (self._ncols - len(fields))
+            return self._delimiter.join(fields)
+
+        # Champs entre guillemets : passage par le module csv
+        text = record.decode(self._target.encoding)
+        fields = next(csv.reader([text], delimiter=self._target.delimiter, quotechar='"'))
+        if len(fields) == self._ncols:
+            return record
+        self.rows_normalized += 1
+        fields = fields[:self._ncols] + [''] * (self._ncols - len(fields))
+        out = io.StringIO()
+        csv.writer(out, delimiter=self._target.delimiter, quotechar='"',
+                   lineterminator='').writerow(fields)
+        return out.getvalue().encode(self._target.encoding)
+
+    def _fill(self, size: int) -> None:
+        while len(self._buffer) < size:
+            if self._max_rows is not None and self.rows >= self._max_rows:
+                return
+            try:
+                record, self.offset = next(self._records)
+            except StopIteration:
+                self.exhausted = True
+                return
+            self._buffer += self._normalize(record)
+            self._buffer += b'\n'
+            self.rows += 1
+            if self._progress and self.rows % self._progress_every == 0:
+                self._progress(self.rows, self.offset)
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = COPY_BUFFER_SIZE
+        self._fill(size)
+        chunk = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return chunk
+
+    def readinto(self, b) -> int:
+        chunk = self.read(len(b))
+        b[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def data_start_offset(csv_path: str, target: LoadTarget) -> int:
+    """Position du premier enregistrement de données (après l'éventuel BOM et l'en-tête)"""
+    with open(csv_path, 'rb') as f:
+        start = 3 if f.read(3) == b'\xef\xbb\xbf' else 0
+        if not target.header:
+            return start
+        for _, position in iter_records(f, start):
+            return position
+        return start
+
+
+def bulk_load(conn, target: LoadTarget, csv_path: str, start: Optional[int] = None,
+              end: Optional[int] = None, batch_rows: Optional[int] = None,
+              table: Optional[str] = None,
+              on_batch: Optional[Callable] = None,
+              log_prefix: str = "") -> dict:
+    """
+    Charge un fichier CSV (ou une plage d'octets de ce fichier) par COPY.
+
+    Args:
+        conn: Connexion psycopg2 vers la base cible
+        target: Table cible
+        csv_path: Chemin du fichier
+        start: Position de départ (par défaut : début des données, après l'en-tête)
+        end: Position de fin exclue (par défaut : fin du fichier)
+        batch_rows: Nombre de lignes par COPY, chaque lot étant validé séparément
+            (None = un seul COPY, validé à la fin)
+        table: Table de destination si elle diffère de target.table (table de transit)
+        on_batch: Appelée avec (curseur, position de fin du lot, lignes du lot) juste
+            avant la validation de chaque lot, dans la même transaction
+        log_prefix: Préfixe des messages de progression
+
+    Returns:
+        {'rows', 'rows_normalized', 'batches', 'seconds', 'rows_per_second', 'offset'}
+    """
+    if start is None:
+        start = data_start_offset(csv_path, target)
+    sql = target.copy_sql(table)
+    started = time.monotonic()
+    stats = {'rows': 0, 'rows_normalized': 0, 'batches': 0, 'offset': start}
+
+    def report(rows, offset):
+        elapsed = time.monotonic() - started
+        total = stats['rows'] + rows
+        logging.info(f"{log_prefix}{total:,} lignes chargées ({total / elapsed if elapsed else 0:,.0f} lignes/s)")
+
+    with open(csv_path, 'rb') as f:
+        records = iter_records(f, start, end)
+        exhausted = False
+        while not exhausted:
+            stream = CopyStream(records, target, max_rows=batch_rows, progress=report)
+            with conn.cursor() as cur:
+                cur.copy_expert(sql, stream, size=COPY_BUFFER_SIZE)
+                exhausted = stream.exhausted or batch_rows is None
+                if stream.rows == 0:
+                    conn.commit()
+                    break
+                offset = stream.offset
+                if on_batch:
+                    on_batch(cur, offset, stream.rows)
+            conn.commit()
+            stats['rows'] += stream.rows
+            stats['rows_normalized'] += stream.rows_normalized
+            stats['batches'] += 1
+            stats['offset'] = offset
+            if batch_rows is not None:
+                report(0, offset)
+
+    stats['seconds'] = time.monotonic() - started
+    stats['rows_per_second'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+    logging.info(
+        f"{log_prefix}Chargement terminé : {stats['rows']:,} lignes en {stats['seconds']:.1f}s "
+        f"({stats['rows_per_second']:,.0f} lignes/s, {stats['rows_normalized']:,} lignes complétées ou tronquées)"
+    )
+    return stats
+
+
+def file_fingerprint(csv_path: str) -> str:
+    """
+    Empreinte d'un fichier : taille, date de modification et hachage du premier
+    et du dernier mégaoctet (un hachage complet de plusieurs Go serait trop lent).
+    """
+    stat = os.stat(csv_path)
+    digest = hashlib.sha1()
+    with open(csv_path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE_SIZE))
+        if stat.st_size > FINGERPRINT_SAMPLE_SIZE:
+            f.seek(max(stat.st_size - FINGERPRINT_SAMPLE_SIZE, FINGERPRINT_SAMPLE_SIZE))
+            digest.update(f.read())
+    return f"{stat.st_size}-{int(stat.st_mtime)}-{digest.hexdigest()}"
+
+
+def ensure_checkpoint_table(cur) -> None:
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+            target_table TEXT NOT NULL,
+            file_fingerprint TEXT NOT NULL,
+            chunk_start BIGINT NOT NULL,
+            chunk_end BIGINT,
+            committed_offset BIGINT NOT NULL,
+            rows_committed BIGINT NOT NULL DEFAULT 0,
+            completed BOOLEAN NOT NULL DEFAULT FALSE,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (target_table, file_fingerprint, chunk_start)
+        )
+    """)
+
+
+def _checkpoint_key(target: LoadTarget, table: Optional[str] = None) -> str:
+    return f"{target.schema}.{table or target.table}"
+
+
+def _reset_checkpoints(cur, table_key: str, fingerprint: str, ranges) -> None:
+    """Remplace les points de reprise d'une table par ceux d'un nouveau chargement"""
+    cur.execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE target_table = %s", (table_key,))
+    for start, end in ranges:
+        cur.execute(
+            f"INSERT INTO {CHECKPOINT_TABLE} "
+            f"(target_table, file_fingerprint, chunk_start, chunk_end, committed_offset) "
+            f"VALUES (%s, %s, %s, %s, %s)",
+            (table_key, fingerprint, start, end, start)
+        )
+
+
+def _check_same_file(cur, table_key: str, fingerprint: str) -> bool:
+    """
+    Indique si des points de reprise existent pour ce fichier ; lève une erreur
+    s'ils ont été enregistrés pour un autre fichier (reprise impossible).
+    """
+    cur.execute(f"SELECT DISTINCT file_fingerprint FROM {CHECKPOINT_TABLE} WHERE target_table = %s",
+                (table_key,))
+    fingerprints = {row[0] for row in cur.fetchall()}
+    if fingerprints and fingerprint not in fingerprints:
+        raise ValueError(
+            f"Le fichier a changé depuis le chargement interrompu de {table_key} : "
+            f"reprise impossible, relancer un chargement complet"
+        )
+    return bool(fingerprints)
+
+
+def checkpointed_load(conn, target: LoadTarget, csv_path: str, resume: bool = False,
+                      start: Optional[int] = None, end: Optional[int] = None,
+                      batch_rows: int = DEFAULT_CHECKPOINT_ROWS, table: Optional[str] = None,
+                      fingerprint: Optional[str] = None, log_prefix: str = "",
+                      truncate: bool = False, append: bool = False) -> dict:
+    """
+    Chargement reprenable : chaque lot de ``batch_rows`` lignes est validé dans la
+    même transaction que son point de reprise (position dans le fichier et nombre
+    de lignes), de sorte qu'après une interruption, la reprise repart exactement
+    de la dernière position validée sans doublon ni perte.
+
+    Args:
+        resume: Reprendre au dernier point validé (ValueError s'il n'en existe aucun) ;
+            sinon le chargement repart de ``start`` dans une table vide (ValueError si
+            elle contient déjà des lignes, sauf avec ``truncate`` ou ``append``)
+        truncate: Vider la table avant un chargement complet, dans la transaction qui
+            réinitialise le point de reprise
+        append: Ajouter les lignes à une table non vide (chargement complet uniquement)
+        start, end: Plage du fichier (par défaut : toutes les données)
+        fingerprint: Empreinte du fichier si déjà calculée (file_fingerprint)
+        (les autres arguments sont ceux de bulk_load)
+
+    Returns:
+        Statistiques de bulk_load, plus 'rows_total' (lignes validées depuis le
+        premier lancement) et 'resumed_from' (position de reprise)
+    """
+    if truncate and append:
+        raise ValueError("truncate et append sont incompatibles")
+    if start is None:
+        start = data_start_offset(csv_path, target)
+    fingerprint = fingerprint or file_fingerprint(csv_path)
+    table_key = _checkpoint_key(target, table)
+    table_name = f'"{target.schema}"."{table}"' if table else target.qualified_name
+
+    with conn.cursor() as cur:
+        ensure_checkpoint_table(cur)
+        checkpoint = None
+        if resume and _check_same_file(cur, table_key, fingerprint):
+            cur.execute(
+                f"SELECT committed_offset, rows_committed, completed FROM {CHECKPOINT_TABLE} "
+                f"WHERE target_table = %s AND file_fingerprint = %s AND chunk_start = %s",
+                (table_key, fingerprint, start)
+            )
+            checkpoint = cur.fetchone()
+        if checkpoint is None and resume:
+            # Sans point de reprise, rien n'indique ce que la table contient déjà :
+            # recharger depuis le début risquerait de dupliquer des lignes
+            conn.rollback()
+            raise ValueError(
+                f"Aucun point de reprise pour {table_key} : reprise impossible, "
+                f"relancer un chargement complet (sans reprise) dans une table vide"
+            )
+        if checkpoint is None:
+            if truncate:
+                cur.execute(f"TRUNCATE {table_name}")
+            elif not append:
+                cur.execute(f"SELECT EXISTS (SELECT 1 FROM {table_name})")
+                if cur.fetchone()[0]:
+                    # Recharger le fichier dans une table déjà remplie dupliquerait ses lignes
+                    conn.rollback()
+                    raise ValueError(
+                        f"La table {table_name} contient déjà des lignes : reprendre le chargement "
+                        f"interrompu, ou indiquer explicitement de la vider (truncate) ou d'y ajouter (append)"
+                    )
+            cur.execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE target_table = %s", (table_key,))
+            cur.execute(
+                f"INSERT INTO {CHECKPOINT_TABLE} "
+                f"(target_table, file_fingerprint, chunk_start, chunk_end, committed_offset) "
+                f"VALUES (%s, %s, %s, %s, %s)",
+                (table_key, fingerprint, start, end, start)
+            )
+            checkpoint = (start, 0, False)
+    conn.commit()
+
+    offset, rows_before, completed = checkpoint
+    if completed:
+        logging.info(f"{log_prefix}Plage déjà chargée ({rows_before:,} lignes), ignorée")
+        return {'rows': 0, 'rows_normalized': 0, 'batches': 0, 'offset': offset,
+                'seconds': 0.0, 'rows_per_second': 0.0,
+                'rows_total': rows_before, 'resumed_from': offset}
+    if offset > start:
+        logging.info(f"{log_prefix}Reprise à l'octet {offset:,} ({rows_before:,} lignes déjà validées)")
+
+    def save_checkpoint(cur, batch_offset, batch_rows_count):
+        cur.execute(
+            f"UPDATE {CHECKPOINT_TABLE} SET committed_offset = %s, "
+            f"rows_committed = rows_committed + %s, updated_at = CURRENT_TIMESTAMP "
+            f"WHERE target_table = %s AND file_fingerprint = %s AND chunk_start = %s",
+            (batch_offset, batch_rows_count, table_key, fingerprint, start)
+        )
+
+    stats = bulk_load(conn, target, csv_path, start=offset, end=end, batch_rows=batch_rows,
+                      table=table, on_batch=save_checkpoint, log_prefix=log_prefix)
+
+    with conn.cursor() as cur:
+        cur.execute(
+            f"UPDATE {CHECKPOINT_TABLE} SET completed = TRUE, updated_at = CURRENT_TIMESTAMP "
+            f"WHERE target_table = %s AND file_fingerprint = %s AND chunk_start = %s",
+            (table_key, fingerprint, start)
+        )
+    conn.commit()
+    stats['rows_total'] = rows_before + stats['rows']
+    stats['resumed_from'] = offset
+    return stats
+
+
+def split_ranges(csv_path: str, target: LoadTarget, parts: int) -> List[Tuple[int, int]]:
+    """
+    Découpe les données d'un fichier en plages d'octets [début, fin) de tailles voisines,
+    chacune commençant au début d'un enregistrement.
+
+    La parité des guillemets est suivie depuis le début des données : une coupure
+    n'est placée qu'en fin de ligne hors champ entre guillemets, de sorte qu'un champ
+    contenant un retour à la ligne n'est jamais partagé entre deux plages.
+    """
+    start = data_start_offset(csv_path, target)
+    size = os.path.getsize(csv_path)
+    bounds = [start]
+    with open(csv_path, 'rb') as f:
+        f.seek(start)
+        position = start
+        odd_quotes = 0
+        for k in range(1, parts):
+            cut = start + (size - start) * k // parts
+            if cut <= bounds[-1]:
+                continue
+            # Comptage des guillemets jusqu'au point de coupure, par blocs
+            while position < cut:
+                block = f.read(min(SCAN_BLOCK_SIZE, cut - position))
+                if not block:
+                    break
+                odd_quotes ^= block.count(QUOTE) & 1
+                position += len(block)
+            # Avance jusqu'à la première fin de ligne hors guillemets
+            while True:
+                line = f.readline()
+                if not line:
+                    break
+                position += len(line)
+                odd_quotes ^= line.count(QUOTE) & 1
+                if not odd_quotes:
+                    break
+            if position >= size:
+                break
+            bounds.append(position)
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def _load_range(conn_params: dict, target: LoadTarget, csv_path: str,
+                start: int, end: int, table: str, fingerprint: str, batch_rows: int) -> dict:
+    """Charge une plage du fichier dans la table de transit (exécuté dans un processus fils)"""
+    conn = psycopg2.connect(**conn_params)
+    try:
+        with conn.cursor() as cur:
+            # La durabilité est assurée par la bascule finale, pas par chaque lot
+            cur.execute("SET synchronous_commit = off")
+        # Les points de reprise de toutes les plages sont créés par le processus parent
+        return checkpointed_load(conn, target, csv_path, resume=True, start=start, end=end,
+                                 batch_rows=batch_rows, table=table, fingerprint=fingerprint,
+                                 log_prefix=f"[{start:,}-{end:,}] ")
+    finally:
+        conn.close()
+
+
+def _table_exists(cur, schema: str, table: str) -> bool:
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (f'"{schema}"."{table}"',))
+    return cur.fetchone()[0]
+
+
+def _check_swappable(cur, qualified_name: str) -> None:
+    """
+    Vérifie que la table cible peut être remplacée par renommage : ses triggers,
+    les vues qui en dépendent et les clés étrangères qui la référencent ne suivraient
+    pas la nouvelle table. Lève ValueError (chargement séquentiel à utiliser).
+    """
+    cur.execute("""
+        SELECT
+            (SELECT COUNT(*) FROM pg_trigger WHERE tgrelid = to_regclass(%(t)s) AND NOT tgisinternal),
+            (SELECT COUNT(DISTINCT r.ev_class) FROM pg_depend d
+             JOIN pg_rewrite r ON r.oid = d.objid
+             WHERE d.classid = 'pg_rewrite'::regclass AND d.refobjid = to_regclass(%(t)s)
+             AND r.ev_class <> to_regclass(%(t)s)),
+            (SELECT COUNT(*) FROM pg_constraint WHERE confrelid = to_regclass(%(t)s) AND contype = 'f')
+    """, {'t': qualified_name})
+    triggers, views, foreign_keys = cur.fetchone()
+    blockers = [label for count, label in ((triggers, "triggers"), (views, "vues dépendantes"),
+                                          (foreign_keys, "clés étrangères entrantes")) if count]
+    if blockers:
+        raise ValueError(
+            f"La table {qualified_name} ne peut pas être remplacée par bascule ({', '.join(blockers)}) : "
+            f"utiliser le chargement séquentiel"
+        )
+
+
+def _index_definitions(cur, qualified_name: str) -> List[dict]:
+    """
+    Index de la table (et contraintes PRIMARY KEY / UNIQUE qu'ils portent), décrits
+    à partir du catalogue : méthode, colonnes ou expressions avec collation, classe
+    d'opérateurs et ordre, colonnes INCLUDE, options de stockage et prédicat.
+    """
+    cur.execute("""
+        SELECT i.relname, c.conname, c.contype, x.indisunique, quote_ident(am.amname),
+               ARRAY(
+                   SELECT pg_get_indexdef(x.indexrelid, k, true)
+                       || COALESCE((SELECT ' COLLATE ' || quote_ident(cn.nspname) || '.' || quote_ident(co.collname)
+                                    FROM pg_collation co JOIN pg_namespace cn ON cn.oid = co.collnamespace
+                                    WHERE co.oid = x.indcollation[k - 1]), '')
+                       || (SELECT ' ' || quote_ident(oc.nspname) || '.' || quote_ident(o.opcname)
+                           FROM pg_opclass o JOIN pg_namespace oc ON oc.oid = o.opcnamespace
+                           WHERE o.oid = x.indclass[k - 1])
+                       || CASE x.indoption[k - 1] & 3
+                              WHEN 1 THEN ' DESC NULLS LAST'
+                              WHEN 2 THEN ' NULLS FIRST'
+                              WHEN 3 THEN ' DESC NULLS FIRST'
+                              ELSE '' END
+                   FROM generate_series(1, x.indnkeyatts) AS k ORDER BY k
+               ),
+               ARRAY(
+                   SELECT pg_get_indexdef(x.indexrelid, k, true)
+                   FROM generate_series(x.indnkeyatts + 1, x.indnatts) AS k ORDER BY k
+               ),
+               array_to_string(i.reloptions, ', '),
+               pg_get_expr(x.indpred, x.indrelid, true)
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_am am ON am.oid = i.relam
+        LEFT JOIN pg_constraint c ON c.conindid = x.indexrelid AND c.contype IN ('p', 'u')
+        WHERE x.indrelid = to_regclass(%s)
+        ORDER BY i.relname
+    """, (qualified_name,))
+    return [
+        {'name': name, 'constraint': conname, 'constraint_type': contype, 'unique': unique,
+         'method': method, 'keys': keys, 'include': include, 'options': options, 'predicate': predicate}
+        for name, conname, contype, unique, method, keys, include, options, predicate in cur.fetchall()
+    ]
+
+
+def _create_index_sql(index: dict, index_name: str, table_name: str) -> str:
+    sql = (f'CREATE {"UNIQUE " if index["unique"] else ""}INDEX "{index_name}" ON {table_name} '
+           f'USING {index["method"]} ({", ".join(index["keys"])})')
+    if index['include']:
+        sql += f' INCLUDE ({", ".join(index["include"])})'
+    if index['options']:
+        sql += f' WITH ({index["options"]})'
+    if index['predicate']:
+        sql += f' WHERE {index["predicate"]}'
+    return sql
+
+
+def _copy_table_properties(cur, source: str, dest: str) -> None:
+    """
+    Reporte sur dest ce que le renommage ne transmet pas : propriétaire, droits
+    (niveau table), commentaire de la table et propriété des séquences (colonnes serial,
+    dont les valeurs par défaut copiées par LIKE désignent la séquence de source).
+    """
+    cur.execute("""
+        SELECT quote_ident(pg_get_userbyid(relowner)), pg_get_userbyid(relowner) = current_user,
+               obj_description(oid, 'pg_class')
+        FROM pg_class WHERE oid = to_regclass(%s)
+    """, (source,))
+    owner, owned_by_current_user, comment = cur.fetchone()
+    if comment is not None:
+        cur.execute(f"COMMENT ON TABLE {dest} IS %s", (comment,))
+
+    cur.execute("""
+        SELECT CASE WHEN a.grantee = 0 THEN 'PUBLIC' ELSE quote_ident(r.rolname) END,
+               a.privilege_type, a.is_grantable
+        FROM pg_class t
+        CROSS JOIN LATERAL aclexplode(t.relacl) AS a
+        LEFT JOIN pg_roles r ON r.oid = a.grantee
+        WHERE t.oid = to_regclass(%s) AND a.grantee <> t.relowner
+    """, (source,))
+    for grantee, privilege, grantable in cur.fetchall():
+        cur.execute(f"GRANT {privilege} ON {dest} TO {grantee}{' WITH GRANT OPTION' if grantable else ''}")
+
+    # Une séquence ne peut appartenir qu'à une table du même propriétaire ; le renommage
+    # de la cible exige de toute façon d'être membre du rôle propriétaire
+    if not owned_by_current_user:
+        cur.execute(f"ALTER TABLE {dest} OWNER TO {owner}")
+
+    cur.execute("""
+        SELECT quote_ident(sn.nspname) || '.' || quote_ident(s.relname), quote_ident(a.attname)
+        FROM pg_depend d
+        JOIN pg_class s ON s.oid = d.objid AND s.relkind = 'S'
+        JOIN pg_namespace sn ON sn.oid = s.relnamespace
+        JOIN pg_attribute a ON a.attrelid = d.refobjid AND a.attnum = d.refobjsubid
+        WHERE d.classid = 'pg_class'::regclass AND d.refclassid = 'pg_class'::regclass
+        AND d.refobjid = to_regclass(%s) AND d.deptype = 'a'
+    """, (source,))
+    for sequence, column in cur.fetchall():
+        cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY {dest}.{column}")
+
+
+def parallel_load(conn_params: dict, target: LoadTarget, csv_path: str, workers: int = 4,
+                  chunks: Optional[int] = None, resume: bool = False,
+                  batch_rows: int = DEFAULT_CHECKPOINT_ROWS) -> dict:
+    """
+    Charge un fichier en parallèle puis remplace atomiquement le contenu de la table cible.
+
+    Le fichier est découpé en plages (split_ranges) chargées simultanément par
+    ``workers`` processus, chacun avec sa propre connexion, dans une table de transit
+    UNLOGGED de même structure que la cible. Une fois toutes les plages chargées, la
+    table de transit est rendue journalisée, reçoit les index, le propriétaire, les
+    droits, le commentaire et les séquences de la cible, puis prend sa place en une
+    transaction (renommage) : les lecteurs voient l'ancien contenu ou le nouveau,
+    jamais un chargement partiel. En cas d'échec, la table cible est laissée intacte.
+    Une cible portant des triggers, référencée par des vues ou des clés étrangères
+    est refusée (ValueError) : ces objets ne suivraient pas la bascule.
+
+    Chaque plage est chargée par lots validés avec leur point de reprise
+    (checkpointed_load) : après une interruption, ``resume=True`` réutilise la table
+    de transit et les plages enregistrées, et chaque plage repart de sa dernière
+    position validée.
+
+    Args:
+        conn_params: Paramètres de psycopg2.connect (transmis aux processus fils)
+        target: Table cible (doit exister : sa structure sert de modèle)
+        workers: Nombre de processus de chargement
+        chunks: Nombre de plages (par défaut 4 par processus, pour équilibrer la charge)
+        resume: Reprendre un chargement interrompu du même fichier
+        batch_rows: Lignes par lot validé
+
+    Returns:
+        {'rows', 'rows_normalized', 'chunks', 'seconds', 'rows_per_second'}
+    """
+    started = time.monotonic()
+    staging = f"{target.table}__staging"
+    previous = f"{target.table}__previous"
+    staging_name = f'"{target.schema}"."{staging}"'
+
+    fingerprint = file_fingerprint(csv_path)
+    table_key = _checkpoint_key(target, staging)
+
+    conn = psycopg2.connect(**conn_params)
+    try:
+        ranges = []
+        with conn.cursor() as cur:
+            if not _table_exists(cur, target.schema, target.table):
+                raise ValueError(f"La table cible {target.qualified_name} n'existe pas")
+            _check_swappable(cur, target.qualified_name)
+            ensure_checkpoint_table(cur)
+            if resume and _table_exists(cur, target.schema, staging) \
+                    and _check_same_file(cur, table_key, fingerprint):
+                cur.execute(
+                    f"SELECT chunk_start, chunk_end, rows_committed FROM {CHECKPOINT_TABLE} "
+                    f"WHERE target_table = %s AND file_fingerprint = %s ORDER BY chunk_start",
+                    (table_key, fingerprint)
+                )
+                checkpoints = cur.fetchall()
+                # Une table UNLOGGED est vidée par un arrêt brutal du serveur :
+                # la reprise n'est sûre que si son contenu correspond aux points validés
+                cur.execute(f"SELECT COUNT(*) FROM {staging_name}")
+                if cur.fetchone()[0] == sum(row[2] for row in checkpoints):
+                    ranges = [(row[0], row[1]) for row in checkpoints]
+                    logging.info(f"Reprise du chargement parallèle : {len(ranges)} plages")
+                else:
+                    logging.warning("Table de transit incohérente avec les points de reprise, rechargement complet")
+            if not ranges:
+                cur.execute(f"DROP TABLE IF EXISTS {staging_name}")
+                cur.execute(
+                    f"CREATE UNLOGGED TABLE {staging_name} "
+                    f"(LIKE {target.qualified_name} INCLUDING DEFAULTS INCLUDING IDENTITY "
+                    f"INCLUDING CONSTRAINTS INCLUDING COMMENTS)"
+                )
+                ranges = split_ranges(csv_path, target, chunks or workers * 4)
+                _reset_checkpoints(cur, table_key, fingerprint, ranges)
+        conn.commit()
+
+        logging.info(f"Chargement parallèle : {len(ranges)} plages, {workers} processus")
+
+        stats = {'rows': 0, 'rows_normalized': 0, 'chunks': len(ranges)}
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(_load_range, conn_params, target, csv_path, a, b, staging,
+                                    fingerprint, batch_rows)
+                    for a, b in ranges
+                ]
+                for future in as_completed(futures):
+                    result = future.result()
+                    stats['rows'] += result['rows_total']
+                    stats['rows_normalized'] += result['rows_normalized']
+                    elapsed = time.monotonic() - started
+                    logging.info(
+                        f"Plage chargée : {stats['rows']:,} lignes au total "
+                        f"({stats['rows'] / elapsed if elapsed else 0:,.0f} lignes/s)"
+                    )
+        except Exception:
+            # La table de transit et les points de reprise sont conservés pour --resume
+            logging.error("Chargement parallèle interrompu : relancer avec resume=True pour reprendre")
+            raise
+
+        logging.info("Finalisation : journalisation, index et bascule de la table")
+        with conn.cursor() as cur:
+            cur.execute(f"ALTER TABLE {staging_name} SET LOGGED")
+            # Index de la cible (et contraintes PRIMARY KEY / UNIQUE qu'ils portent),
+            # créés après le chargement : bien plus rapide qu'une mise à jour ligne à ligne
+            renames = []
+            for position, index in enumerate(_index_definitions(cur, target.qualified_name)):
+                temp_name = f"{staging}_idx{position}"
+                cur.execute(_create_index_sql(index, temp_name, staging_name))
+                if index['constraint']:
+                    kind = "PRIMARY KEY" if index['constraint_type'] == 'p' else "UNIQUE"
+                    cur.execute(f'ALTER TABLE {staging_name} ADD CONSTRAINT "{temp_name}" {kind} USING INDEX "{temp_name}"')
+                renames.append((temp_name, index['constraint'] or index['name'], bool(index['constraint'])))
+            cur.execute(f"ANALYZE {staging_name}")
+            _copy_table_properties(cur, target.qualified_name, staging_name)
+
+            # Bascule atomique : renommages et suppression dans une seule transaction
+            cur.execute(f'ALTER TABLE {target.qualified_name} RENAME TO "{previous}"')
+            cur.execute(f'ALTER TABLE {staging_name} RENAME TO "{target.table}"')
+            cur.execute(f'DROP TABLE "{target.schema}"."{previous}"')
+            cur.execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE target_table = %s", (table_key,))
+            for temp_name, final_name, is_constraint in renames:
+                if is_constraint:
+                    # Renomme la contrainte et l'index qui la porte
+                    cur.execute(f'ALTER TABLE {target.qualified_name} RENAME CONSTRAINT "{temp_name}" TO "{final_name}"')
+                else:
+                    cur.execute(f'ALTER INDEX "{target.schema}"."{temp_name}" RENAME TO "{final_name}"')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    stats['seconds'] = time.monotonic() - started
+    stats['rows_per_second'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+    logging.info(
+        f"Chargement parallèle terminé : {stats['rows']:,} lignes en {stats['seconds']:.1f}s "
+        f"({stats['rows_per_second']:,.0f} lignes/s)"
+    )
+    return stats
+
+
+def target_from_catalogue(nom_table: str, **options) -> LoadTarget:
+    """
+    Construit la cible d'un chargement à partir de la fiche du catalogue :
+    schéma, nom de table, colonnes (en-tête de l'aperçu) et séparateur.
+
+    Args:
+        nom_table: Nom de la table dans le catalogue
+        options: Surcharges des paramètres de LoadTarget (encoding, header...)
+    """
+    # Import local : le chargeur reste utilisable sans Streamlit ni base de métadonnées
+    from .db_utils import db_connection
+
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT schema, nom_table, contenu_csv FROM metadata WHERE nom_table = %s "
+                "ORDER BY id DESC LIMIT 1",
+                (nom_table,)
+            )
+            row = cur.fetchone()
+    if not row:
+        raise ValueError(f"Table '{nom_table}' non trouvée dans la base de métadonnées")
+    schema, table, contenu_csv = row
+    if not contenu_csv or not contenu_csv.get('header'):
+        raise ValueError(f"Structure CSV non disponible pour la table '{nom_table}'")
+
+    params = {'delimiter': contenu_csv.get('separator', ';')}
+    params.update(options)
+    return LoadTarget(schema or 'public', table,
+                      [col.strip() for col in contenu_csv['header']], **params)
+
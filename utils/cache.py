@@ -0,0 +1,184 @@
+"""
+Cache mémoire des lectures du catalogue, partagé par toutes les sessions du processus.
+Chaque fonction décorée par ``cached`` dispose de son propre espace borné (LRU)
+et d'une durée de vie par entrée. Toute écriture incrémente un compteur de
+génération : les entrées calculées avant l'écriture ne sont plus jamais servies.
+
+Le compteur local est incrémenté par ``bump_generation`` (écritures faites par
+ce processus) ; une source de génération externe peut être enregistrée avec
+``set_generation_source`` pour prendre en compte les écritures faites ailleurs
+(scripts, autres instances), interrogée au plus une fois par ``poll_interval``.
+"""
+
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+_lock = threading.Lock()
+_generation = 0
+_registry: Dict[str, "LRUCache"] = {}
+
+_source: Optional[Callable[[], int]] = None
+_source_poll_interval = 5.0
+_source_last_poll = 0.0
+_source_last_value: Optional[int] = None
+
+# Indicateur (par thread) : le résultat de l'appel en cours ne doit pas être mis en cache
+_skip = threading.local()
+
+
+class LRUCache:
+    """
+    Dictionnaire borné avec durée de vie par entrée et génération.
+
+    Args:
+        max_entries: Nombre maximal d'entrées conservées (les moins récemment lues sont évincées)
+        ttl: Durée de vie par défaut d'une entrée (secondes)
+    """
+
+    def __init__(self, max_entries: int = 128, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()  # clé -> (valeur, expiration, génération)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key: Hashable, generation: int):
+        """Retourne (True, valeur) si une entrée valide existe, (False, None) sinon"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at, entry_generation = entry
+                if entry_generation == generation and time.monotonic() < expires_at:
+                    self._data.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return True, value
+                del self._data[key]
+            self._stats['misses'] += 1
+            return False, None
+
+    def set(self, key: Hashable, value, generation: int, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at, generation)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['size'] = len(self._data)
+            snapshot['max_entries'] = self.max_entries
+        return snapshot
+
+
+def set_generation_source(source: Optional[Callable[[], int]], poll_interval: float = 5.0) -> None:
+    """
+    Enregistre une fonction retournant la génération persistée (par exemple en base).
+    Un changement de valeur invalide tous les caches du processus.
+    """
+    global _source, _source_poll_interval, _source_last_poll, _source_last_value
+    with _lock:
+        _source = source
+        _source_poll_interval = poll_interval
+        _source_last_poll = 0.0
+        _source_last_value = None
+
+
+def _poll_source() -> None:
+    """Interroge la source externe si l'intervalle est écoulé (hors verrou pendant l'appel)"""
+    global _generation, _source_last_poll, _source_last_value
+    with _lock:
+        source = _source
+        if source is None or time.monotonic() - _source_last_poll < _source_poll_interval:
+            return
+        _source_last_poll = time.monotonic()
+    try:
+        value = source()
+    except Exception as e:
+        logging.warning(f"Lecture de la génération du cache impossible : {str(e)}")
+        return
+    with _lock:
+        if _source_last_value is not None and value != _source_last_value:
+            _generation += 1
+        _source_last_value = value
+
+
+def current_generation() -> int:
+    """Génération courante des caches (après prise en compte de la source externe)"""
+    _poll_source()
+    with _lock:
+        return _generation
+
+
+def bump_generation() -> int:
+    """Invalide toutes les entrées en cache du processus ; à appeler après chaque écriture"""
+    global _generation
+    with _lock:
+        _generation += 1
+        return _generation
+
+
+def skip_current() -> None:
+    """
+    Demande de ne pas mettre en cache le résultat de l'appel en cours
+    (typiquement la valeur par défaut retournée après une erreur de base de données).
+    """
+    _skip.value = True
+
+
+def cached(ttl: float = 300, max_entries: int = 128, copy: Optional[Callable] = None):
+    """
+    Décorateur de mise en cache d'une fonction de lecture.
+
+    Args:
+        ttl: Durée de vie des entrées (secondes)
+        max_entries: Taille maximale du cache de la fonction
+        copy: Fonction appliquée à la valeur servie. La valeur en cache est partagée par
+            toutes les sessions : tout résultat modifiable (liste, dictionnaire, DataFrame)
+            doit être copié (``copy.deepcopy``, ``list``, ``lambda df: df.copy()``...)
+
+    La fonction décorée expose ``clear()`` et ``stats()``.
+    """
+    def decorator(func):
+        cache = LRUCache(max_entries=max_entries, ttl=ttl)
+        _registry[f"{func.__module__}.{func.__qualname__}"] = cache
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            generation = current_generation()
+            found, value = cache.get(key, generation)
+            if not found:
+                # Appels imbriqués : le drapeau de l'appelant est rétabli à la sortie,
+                # et une valeur non mise en cache à l'intérieur ne l'est pas non plus à l'extérieur
+                previous = getattr(_skip, 'value', False)
+                _skip.value = False
+                skipped = True
+                try:
+                    value = func(*args, **kwargs)
+                    skipped = _skip.value
+                    if not skipped:
+                        cache.set(key, value, generation)
+                finally:
+                    _skip.value = previous or skipped
+            return copy(value) if copy else value
+
+        wrapper.clear = cache.clear
+        wrapper.stats = cache.stats
+        return wrapper
+    return decorator
+
+
+def cache_stats() -> Dict[str, Dict]:
+    """Statistiques de chaque cache enregistré (succès, échecs, évictions, taille)"""
+    return {name: cache.stats() for name, cache in _registry.items()}
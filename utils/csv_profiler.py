@@ -0,0 +1,240 @@
+"""
+Profilage complet d'un fichier CSV en une seule passe et en mémoire bornée.
+
+L'extrait stocké dans le catalogue (50 lignes au plus) ne suffit pas à dimensionner
+les colonnes : une valeur plus longue ou un entier plus grand plus loin dans le
+fichier fait échouer l'import. Le profileur lit tout le fichier ligne à ligne et
+ne conserve par colonne que des compteurs, des extrêmes et une esquisse de
+cardinalité de taille fixe ; ces statistiques alimentent ``detect_column_type``.
+"""
+
+import csv
+import heapq
+import logging
+import re
+import time
+from typing import Dict, List, Optional
+
+# Mêmes tests que detect_column_type (appliqués après suppression des espaces)
+NUMERIC_FR_RE = re.compile(r'^-?\d+(,\d*)?$')
+NUMERIC_EN_RE = re.compile(r'^-?\d+(\.\d*)?$')
+DATE_RES = {
+    'jj/mm/aaaa': re.compile(r'^\d{2}/\d{2}/\d{4}$'),
+    'aaaa-mm-jj': re.compile(r'^\d{4}-\d{2}-\d{2}$'),
+}
+
+# Marqueurs de masquage INSEE reconnus par detect_column_type (comparés en majuscules)
+INSEE_MASKING_PATTERNS = frozenset(['ZZZZZZ', 'ZZZZZ', 'ZZZZ', 'ZZZ', 'XX', 'XXX', 'XXXX', 's', 'SECRET'])
+
+# Champs de ColumnProfile.to_dict contenant des valeurs du fichier
+PROFILE_VALUE_FIELDS = ('min_value', 'max_value', 'min_number', 'max_number', 'max_abs_int')
+
+DEFAULT_SKETCH_SIZE = 1024
+PROGRESS_LOG_ROWS = 1000000
+
+_HASH_MASK = 2 ** 64 - 1
+_HASH_SPACE = float(2 ** 64)
+
+
+class DistinctSketch:
+    """
+    Estimation du nombre de valeurs distinctes (esquisse KMV : k plus petites empreintes).
+    Exacte tant que la colonne compte moins de k valeurs distinctes, erreur relative
+    d'environ 1/sqrt(k) au-delà, pour une mémoire fixe de k entiers.
+    """
+
+    def __init__(self, k: int = DEFAULT_SKETCH_SIZE):
+        self.k = k
+        self._heap = []      # opposés des k plus petites empreintes (tas max)
+        self._members = set()
+
+    def add(self, value: str) -> None:
+        # Empreinte 64 bits (hash natif : stable pendant toute la durée du processus)
+        h = hash(value) & _HASH_MASK
+        if self._heap and len(self._heap) >= self.k and h >= -self._heap[0]:
+            return
+        if h in self._members:
+            return
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, -h)
+            self._members.add(h)
+        elif h < -self._heap[0]:
+            evicted = -heapq.heappushpop(self._heap, -h)
+            self._members.discard(evicted)
+            self._members.add(h)
+
+    def estimate(self) -> int:
+        if len(self._heap) < self.k:
+            return len(self._heap)
+        kth_smallest = -self._heap[0]
+        return int((self.k - 1) / ((kth_smallest + 1) / _HASH_SPACE))
+
+
+class ColumnProfile:
+    """Statistiques d'une colonne accumulées valeur par valeur"""
+
+    def __init__(self, name: str, sketch_size: int = DEFAULT_SKETCH_SIZE):
+        self.name = name
+        self.count = 0              # valeurs lues (vides comprises)
+        self.null_count = 0         # valeurs vides ou absentes (ligne trop courte)
+        self.max_len = 0
+        self.min_value = None       # extrêmes lexicographiques des valeurs non vides
+        self.max_value = None
+        self.min_number = None      # extrêmes des valeurs numériques
+        self.max_number = None
+        self.max_abs_int = 0        # plus grande valeur absolue des entiers
+        self.masked_count = 0       # marqueurs de masquage INSEE
+        self.numeric_fr_count = 0   # valeurs numériques au format français (virgule)
+        self.numeric_en_count = 0   # valeurs numériques au format anglais (point)
+        self.decimal_comma_count = 0
+        self.decimal_point_count = 0
+        self.date_counts = {pattern: 0 for pattern in DATE_RES}
+        self.distinct = DistinctSketch(sketch_size)
+
+    def add(self, value: Optional[str]) -> None:
+        self.count += 1
+        if value is None:
+            self.null_count += 1
+            return
+        stripped = value.strip()
+        if not stripped:
+            self.null_count += 1
+            return
+
+        self.max_len = max(self.max_len, len(stripped))
+        if self.min_value is None or stripped < self.min_value:
+            self.min_value = stripped
+        if self.max_value is None or stripped > self.max_value:
+            self.max_value = stripped
+        self.distinct.add(stripped)
+
+        if stripped.upper() in INSEE_MASKING_PATTERNS:
+            self.masked_count += 1
+            return
+
+        compact = stripped.replace(' ', '')
+        digits = compact[1:] if compact[:1] == '-' else compact
+        if digits.isdecimal():
+            # Entier : numérique dans les deux formats
+            self.numeric_fr_count += 1
+            self.numeric_en_count += 1
+            number = int(compact)
+            self.max_abs_int = max(self.max_abs_int, abs(number))
+        elif NUMERIC_FR_RE.match(compact):
+            self.numeric_fr_count += 1
+            self.decimal_comma_count += 1
+            number = float(compact.replace(',', '.').rstrip('.'))
+        elif NUMERIC_EN_RE.match(compact):
+            self.numeric_en_count += 1
+            self.decimal_point_count += 1
+            number = float(compact.rstrip('.'))
+        else:
+            for pattern, date_re in DATE_RES.items():
+                if date_re.match(stripped):
+                    self.date_counts[pattern] += 1
+                    break
+            return
+
+        if self.min_number is None or number < self.min_number:
+            self.min_number = number
+        if self.max_number is None or number > self.max_number:
+            self.max_number = number
+
+    @property
+    def non_null_count(self) -> int:
+        return self.count - self.null_count
+
+    def all_numeric(self, csv_separator: str = ';') -> bool:
+        """Toutes les valeurs non vides sont numériques dans le format du séparateur"""
+        numeric = self.numeric_fr_count if csv_separator == ';' else self.numeric_en_count
+        return self.non_null_count > 0 and numeric == self.non_null_count
+
+    def has_decimals(self, csv_separator: str = ';') -> bool:
+        return (self.decimal_comma_count if csv_separator == ';' else self.decimal_point_count) > 0
+
+    def to_dict(self, include_values: bool = True) -> Dict:
+        """
+        Statistiques de la colonne ; include_values=False omet les valeurs lues dans
+        le fichier (extrêmes), par exemple pour un affichage.
+        """
+        stats = {
+            'name': self.name,
+            'count': self.count,
+            'null_count': self.null_count,
+            'max_len': self.max_len,
+            'min_value': self.min_value,
+            'max_value': self.max_value,
+            'min_number': self.min_number,
+            'max_number': self.max_number,
+            'max_abs_int': self.max_abs_int,
+            'masked_count': self.masked_count,
+            'numeric_fr_count': self.numeric_fr_count,
+            'numeric_en_count': self.numeric_en_count,
+            'decimal_comma_count': self.decimal_comma_count,
+            'decimal_point_count': self.decimal_point_count,
+            'date_counts': dict(self.date_counts),
+            'distinct_estimate': self.distinct.estimate(),
+        }
+        if not include_values:
+            for key in PROFILE_VALUE_FIELDS:
+                del stats[key]
+        return stats
+
+
+def profile_csv(csv_path: str, separator: str = ';', encoding: str = 'utf-8',
+                header: bool = True, max_rows: Optional[int] = None,
+                sketch_size: int = DEFAULT_SKETCH_SIZE) -> Dict:
+    """
+    Lit un fichier CSV en entier (ou ses max_rows premières lignes) et profile chaque colonne.
+
+    Args:
+        csv_path: Chemin du fichier
+        separator: Séparateur de champs
+        encoding: Encodage Python du fichier
+        header: La première ligne contient les noms de colonnes
+        max_rows: Nombre maximal de lignes de données lues (toutes par défaut)
+        sketch_size: Taille de l'esquisse de cardinalité par colonne
+
+    Returns:
+        Dictionnaire {columns, profiles (ColumnProfile par position), rows, seconds}
+    """
+    start = time.monotonic()
+    with open(csv_path, 'r', encoding=encoding, newline='') as f:
+        reader = csv.reader(f, delimiter=separator)
+        first = next(reader, None)
+        if first is None:
+            return {'columns': [], 'profiles': [], 'rows': 0, 'seconds': 0.0}
+        if first:
+            # Marque d'ordre des octets (fichiers UTF-8 exportés par Excel) : sans cela le
+            # premier nom de colonne ne correspond plus à l'en-tête du catalogue
+            first[0] = first[0].lstrip('\ufeff')
+
+        if header:
+            columns = [name.strip() for name in first]
+            pending = []
+        else:
+            columns = [f"colonne_{i + 1}" for i in range(len(first))]
+            pending = [first]
+        profiles = [ColumnProfile(name, sketch_size) for name in columns]
+        width = len(profiles)
+
+        rows = 0
+        for row_values in _chain(pending, reader):
+            if max_rows is not None and rows >= max_rows:
+                break
+            rows += 1
+            if len(row_values) < width:
+                row_values = row_values + [None] * (width - len(row_values))
+            for profile, value in zip(profiles, row_values):
+                profile.add(value)
+            if rows % PROGRESS_LOG_ROWS == 0:
+                logging.info(f"Profilage de {csv_path} : {rows:,} lignes lues")
+
+    seconds = time.monotonic() - start
+    logging.info(f"Profilage de {csv_path} terminé : {rows:,} lignes, {width} colonnes en {seconds:.1f}s")
+    return {'columns': columns, 'profiles': profiles, 'rows': rows, 'seconds': seconds}
+
+
+def _chain(first_rows: List, reader):
+    yield from first_rows
+    yield from reader
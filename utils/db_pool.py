@@ -0,0 +1,210 @@
+"""
+Pool de connexions PostgreSQL partagé par tout le processus Streamlit.
+Les connexions TLS vers Neon.tech sont coûteuses à établir : le pool les
+réutilise d'un rerun à l'autre, vérifie leur état avant de les prêter,
+ferme celles restées inactives trop longtemps et borne leur nombre.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+import psycopg2
+import psycopg2.extensions
+
+
+class PoolTimeout(Exception):
+    """Aucune connexion n'a pu être obtenue dans le délai imparti"""
+
+
+class ConnectionPool:
+    """
+    Pool de connexions thread-safe.
+
+    Args:
+        connect: Fonction sans argument retournant une nouvelle connexion psycopg2
+        max_size: Nombre maximal de connexions ouvertes simultanément
+        max_idle: Durée (secondes) au-delà de laquelle une connexion inactive est fermée
+        checkout_timeout: Attente maximale (secondes) quand le pool est saturé
+        health_check_after: Inactivité (secondes) au-delà de laquelle la connexion
+            est testée par un ``SELECT 1`` avant d'être prêtée
+    """
+
+    def __init__(self, connect: Callable, max_size: int = 5, max_idle: float = 300,
+                 checkout_timeout: float = 10, health_check_after: float = 30):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.checkout_timeout = checkout_timeout
+        self.health_check_after = health_check_after
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()  # (connexion, horodatage de restitution)
+        self._size = 0
+        self._closed = False
+        self._stats = {
+            'checkouts': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'created': 0,
+            'reconnects': 0,
+            'evicted_idle': 0,
+            'discarded': 0,
+        }
+
+    def _evict_idle(self, now: float) -> list:
+        """Retire du pool les connexions inactives depuis plus de max_idle (verrou tenu)"""
+        expired = []
+        while self._idle and now - self._idle[0][1] > self.max_idle:
+            conn, _ = self._idle.popleft()
+            expired.append(conn)
+            self._size -= 1
+            self._stats['evicted_idle'] += 1
+        return expired
+
+    @staticmethod
+    def _close_quietly(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_healthy(conn) -> bool:
+        """Vérifie qu'une connexion est encore utilisable"""
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self, timeout: Optional[float] = None):
+        """Emprunte une connexion au pool (à restituer avec putconn)"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        expired = []
+        conn = None
+        idle_since = None
+        must_create = False
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Le pool de connexions est fermé")
+                expired.extend(self._evict_idle(time.monotonic()))
+                if self._idle:
+                    # LIFO : la connexion la plus récemment utilisée est la plus sûre
+                    conn, idle_since = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    must_create = True
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        f"Aucune connexion disponible après {timeout:.1f}s "
+                        f"({self.max_size} connexions en cours d'utilisation)"
+                    )
+                self._cond.wait(remaining)
+
+        for old in expired:
+            self._close_quietly(old)
+
+        try:
+            if must_create:
+                conn = self._connect()
+                self._record('created')
+            elif time.monotonic() - idle_since > self.health_check_after and not self._is_healthy(conn):
+                logging.warning("Connexion du pool invalide, reconnexion")
+                self._close_quietly(conn)
+                conn = self._connect()
+                self._record('reconnects')
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._stats['checkouts'] += 1
+            self._stats['wait_time_total'] += waited
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+        return conn
+
+    def putconn(self, conn, discard: bool = False) -> None:
+        """Restitue une connexion au pool ; les connexions cassées sont fermées"""
+        if not discard and not conn.closed:
+            try:
+                # Ne jamais remettre dans le pool une transaction ouverte
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        with self._cond:
+            if discard or conn.closed or self._closed:
+                self._size -= 1
+                self._stats['discarded'] += 1
+                to_close = conn
+            else:
+                self._idle.append((conn, time.monotonic()))
+                to_close = None
+            self._cond.notify()
+
+        if to_close is not None:
+            self._close_quietly(to_close)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """
+        Gestionnaire de contexte : emprunte une connexion et la restitue en sortie.
+        En cas d'exception la transaction est annulée ; une connexion cassée est jetée.
+        """
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        except Exception:
+            # putconn annule la transaction en cours ; une connexion fermée est jetée
+            self.putconn(conn, discard=bool(conn.closed))
+            raise
+        else:
+            self.putconn(conn)
+
+    def _record(self, key: str) -> None:
+        with self._cond:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict:
+        """Retourne un instantané des statistiques d'utilisation du pool"""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot['size'] = self._size
+            snapshot['idle'] = len(self._idle)
+            snapshot['in_use'] = self._size - len(self._idle)
+            snapshot['max_size'] = self.max_size
+        checkouts = snapshot['checkouts']
+        snapshot['wait_time_avg'] = snapshot['wait_time_total'] / checkouts if checkouts else 0.0
+        return snapshot
+
+    def closeall(self) -> None:
+        """Ferme toutes les connexions inactives et refuse les emprunts suivants"""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
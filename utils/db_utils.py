@@ -1,11 +1,21 @@
+import copy
 import json
 import logging
 import streamlit as st
+import pandas as pd
 import psycopg2
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
-import unicodedata
+import re
+import threading
+import time
 import psycopg2.extras
+import psycopg2.errors
+from contextlib import contextmanager
+from .db_pool import ConnectionPool
+from .cache import cached, skip_current, bump_generation, set_generation_source, current_generation
+from .notifications import ChangeListener
+from .migrations import run_migrations, SCHEMA_VERSION
 
 # Configuration du logging
 logging.basicConfig(
@@ -13,403 +23,733 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def get_db_connection():
-    """Établit une connexion à la base de données Neon.tech"""
-    try:
-        # Récupération sécurisée des paramètres de connexion
-        db_params = {
-            'sslmode': 'require'
-        }
+# Taille et comportement du pool de connexions (surchargeables par variables d'environnement)
+POOL_MAX_SIZE = int(os.environ.get('METADATA_DB_POOL_MAX_SIZE', 5))
+POOL_MAX_IDLE = float(os.environ.get('METADATA_DB_POOL_MAX_IDLE', 300))
+POOL_CHECKOUT_TIMEOUT = float(os.environ.get('METADATA_DB_POOL_TIMEOUT', 10))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Modes de recherche de get_metadata
+SEARCH_MODE_FULLTEXT = 'fulltext'
+SEARCH_MODE_FUZZY = 'fuzzy'
+SEARCH_MODE_SUBSTRING = 'substring'
+SEARCH_MODES = (SEARCH_MODE_FULLTEXT, SEARCH_MODE_FUZZY, SEARCH_MODE_SUBSTRING)
+
+# Recherche approchée (pg_trgm) : champs comparés et seuil de similarité par défaut
+FUZZY_SEARCH_FIELDS = ('nom_table', 'nom_jeu_donnees', 'producteur')
+FUZZY_SIMILARITY_THRESHOLD = float(os.environ.get('METADATA_FUZZY_THRESHOLD', 0.3))
+
+# Colonnes renvoyées par la liste paginée du catalogue (sans les blobs JSONB)
+METADATA_SUMMARY_COLUMNS = (
+    'id', 'nom_jeu_donnees', 'nom_table', 'producteur', 'schema', 'granularite_geo',
+    'millesime', 'date_publication', 'type_donnees', 'frequence_maj', 'source', 'description'
+)
+DEFAULT_PAGE_SIZE = 50
+
+# Colonnes du suivi des mises à jour (vue metadata_latest_version, migration 14)
+UPDATE_TRACKING_COLUMNS = (
+    'id', 'nom_jeu_donnees', 'producteur', 'schema', 'date_publication', 'millesime',
+    'date_prochaine_publication', 'frequence_maj', 'source'
+)
+# Historique du suivi : instantané en mémoire complété par les seules lignes modifiées
+# (updated_at, migration 15). Le recouvrement couvre les transactions validées après
+# la lecture précédente mais horodatées avant (updated_at = début de transaction).
+UPDATE_HISTORY_OVERLAP = float(os.environ.get('METADATA_UPDATE_HISTORY_OVERLAP', 60))
+UPDATE_HISTORY_REFRESH_INTERVAL = float(os.environ.get('METADATA_UPDATE_HISTORY_REFRESH', 5))
+
+_history_snapshot = None        # DataFrame indexé par id (toutes les fiches, sans les blobs)
+_history_high_water = None      # plus grand updated_at de l'instantané
+_history_refreshed_at = 0.0
+_history_generation = None
+_history_lock = threading.Lock()
+
+# Durées de vie (secondes) des lectures mises en cache (voir utils/cache.py) ;
+# toute écriture invalide immédiatement ces caches
+METADATA_CACHE_TTL = 300
+PRODUCTEURS_CACHE_TTL = 300
+FACETS_CACHE_TTL = 60
+# Intervalle (secondes) de lecture de la génération persistée, qui signale
+# les écritures faites par d'autres processus (scripts, autres instances)
+CACHE_GENERATION_POLL_INTERVAL = float(os.environ.get('METADATA_CACHE_POLL_INTERVAL', 5))
+
+# Canal NOTIFY alimenté par le trigger de la table metadata (contenu : id de la fiche modifiée)
+METADATA_CHANGED_CHANNEL = 'metadata_changed'
+# Écoute du canal dans un thread d'arrière-plan (désactivable pour les scripts)
+CACHE_LISTEN_ENABLED = os.environ.get('METADATA_CACHE_LISTEN', '1') != '0'
+
+_listener = None
+
+# Filtres exacts combinables avec la recherche ; chacun est servi par un index composite
+# (colonne filtrée, nom_jeu_donnees, id) qui suit aussi l'ordre de la pagination
+METADATA_FILTERS = {
+    'schema': "LOWER(schema) = LOWER(%s)",
+    'producteur': "producteur = %s",
+    'type_donnees': "type_donnees = %s",
+    'granularite_geo': "granularite_geo = %s",
+}
+
+# Configuration plein texte (français, sans accents) créée par les migrations
+TS_CONFIG = 'public.french_unaccent'
+
+# Marqueur « schéma déjà migré » pour la durée de vie du processus
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+def get_db_params():
+    """Récupère les paramètres de connexion (secrets Streamlit ou variables d'environnement)"""
+    db_params = {
+        'sslmode': 'require'
+    }
+    
+    # Priorité 1: Secrets Streamlit (pour le déploiement cloud)
+    if hasattr(st, 'secrets') and st.secrets:
+        try:
+            db_params['host'] = st.secrets['NEON_HOST']
+            db_params['database'] = st.secrets['NEON_DATABASE']
+            db_params['user'] = st.secrets['NEON_USER']
+            db_params['password'] = st.secrets['NEON_PASSWORD']
+            logging.info("Utilisation des secrets Streamlit")
+        except KeyError as e:
+            logging.error(f"Secret Streamlit manquant : {e}")
+            raise Exception(f"Configuration manquante dans les secrets Streamlit : {e}")
+    else:
+        # Priorité 2: Variables d'environnement (pour le développement local)
+        required_vars = ['NEON_HOST', 'NEON_DATABASE', 'NEON_USER', 'NEON_PASSWORD']
+        missing_vars = []
         
-        # Priorité 1: Secrets Streamlit (pour le déploiement cloud)
-        if hasattr(st, 'secrets') and st.secrets:
-            try:
-                db_params['host'] = st.secrets['NEON_HOST']
-                db_params['database'] = st.secrets['NEON_DATABASE']
-                db_params['user'] = st.secrets['NEON_USER']
-                db_params['password'] = st.secrets['NEON_PASSWORD']
-                logging.info("Utilisation des secrets Streamlit")
-            except KeyError as e:
-                logging.error(f"Secret Streamlit manquant : {e}")
-                raise Exception(f"Configuration manquante dans les secrets Streamlit : {e}")
-        else:
-            # Priorité 2: Variables d'environnement (pour le développement local)
-            required_vars = ['NEON_HOST', 'NEON_DATABASE', 'NEON_USER', 'NEON_PASSWORD']
-            missing_vars = []
-            
-            for var in required_vars:
-                value = os.environ.get(var)
-                if not value:
-                    missing_vars.append(var)
-                else:
-                    db_params[var.lower().replace('neon_', '')] = value
-            
-            if missing_vars:
-                raise Exception(f"Variables d'environnement manquantes : {', '.join(missing_vars)}")
-            
-            logging.info("Utilisation des variables d'environnement")
+        for var in required_vars:
+            value = os.environ.get(var)
+            if not value:
+                missing_vars.append(var)
+            else:
+                db_params[var.lower().replace('neon_', '')] = value
         
-        logging.info("Tentative de connexion à la base de données")
-        conn = psycopg2.connect(**db_params)
-        logging.info("Connexion à la base de données réussie")
-        return conn
+        if missing_vars:
+            raise Exception(f"Variables d'environnement manquantes : {', '.join(missing_vars)}")
         
+        logging.info("Utilisation des variables d'environnement")
+    
+    return db_params
+
+def _connect():
+    """Ouvre une nouvelle connexion physique à la base de données"""
+    logging.info("Tentative de connexion à la base de données")
+    conn = psycopg2.connect(**get_db_params())
+    logging.info("Connexion à la base de données réussie")
+    return conn
+
+def get_db_connection():
+    """
+    Établit une connexion directe (hors pool) à la base de données Neon.tech.
+    Réservée aux usages ponctuels ; les helpers de l'application utilisent db_connection().
+    """
+    try:
+        return _connect()
     except Exception as e:
         logging.error(f"Erreur de connexion à la base de données : {str(e)}")
         if hasattr(st, 'error'):
             st.error(f"Erreur de connexion à la base de données. Vérifiez la configuration.")
         return None
 
+def get_pool() -> ConnectionPool:
+    """Retourne le pool de connexions partagé par le processus (créé à la première demande)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    _connect,
+                    max_size=POOL_MAX_SIZE,
+                    max_idle=POOL_MAX_IDLE,
+                    checkout_timeout=POOL_CHECKOUT_TIMEOUT
+                )
+                start_change_listener()
+    return _pool
+
+def _on_metadata_changed(payload: str) -> None:
+    logging.info(f"Notification {METADATA_CHANGED_CHANNEL} reçue, invalidation des caches")
+    bump_generation()
+
+def start_change_listener() -> None:
+    """
+    Démarre l'écoute de METADATA_CHANGED_CHANNEL pour ce processus : chaque écriture,
+    quelle que soit l'instance ou le script qui la fait, invalide les caches locaux.
+    """
+    global _listener
+    if not CACHE_LISTEN_ENABLED:
+        return
+    if _listener is None:
+        _listener = ChangeListener(
+            _connect, METADATA_CHANGED_CHANNEL,
+            on_notify=_on_metadata_changed,
+            on_reconnect=bump_generation
+        )
+    _listener.start()
+
+@contextmanager
+def db_connection():
+    """
+    Emprunte une connexion au pool partagé et la restitue automatiquement.
+    Les erreurs de connexion sont journalisées puis propagées à l'appelant.
+
+    Exemple :
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+    """
+    pool = get_pool()
+    try:
+        conn = pool.getconn()
+    except Exception as e:
+        logging.error(f"Erreur de connexion à la base de données : {str(e)}")
+        if hasattr(st, 'error'):
+            st.error(f"Erreur de connexion à la base de données. Vérifiez la configuration.")
+        raise
+    try:
+        yield conn
+    except Exception:
+        pool.putconn(conn, discard=bool(conn.closed))
+        raise
+    else:
+        pool.putconn(conn)
+
+CACHE_GENERATION_BUMP_SQL = "UPDATE metadata_cache_generation SET generation = generation + 1"
+
+def _read_cache_generation() -> int:
+    """
+    Lit la génération persistée des caches (0 tant que la migration n'est pas appliquée).
+    Emprunt direct au pool, sans message dans la page : la lecture est faite à chaque
+    accès en cache et ses erreurs sont seulement journalisées par utils/cache.py.
+    """
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            try:
+                cur.execute("SELECT generation FROM metadata_cache_generation")
+            except psycopg2.errors.UndefinedTable:
+                conn.rollback()
+                return 0
+            row = cur.fetchone()
+            conn.rollback()
+            return row[0] if row else 0
+
+set_generation_source(_read_cache_generation, CACHE_GENERATION_POLL_INTERVAL)
+
+def get_pool_stats() -> dict:
+    """Statistiques du pool de connexions (emprunts, temps d'attente, reconnexions...)"""
+    return get_pool().stats()
+
 def test_connection():
     """Teste la connexion à la base de données et affiche le résultat"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return False, "Erreur de connexion - vérifiez la configuration"
-        
-        with conn.cursor() as cur:
-            cur.execute("SELECT version();")
-            version = cur.fetchone()
-            conn.close()
-            return True, f"Connexion réussie ! Version PostgreSQL : {version[0]}"
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT version();")
+                version = cur.fetchone()
+                return True, f"Connexion réussie ! Version PostgreSQL : {version[0]}"
     except Exception as e:
         return False, f"Erreur de connexion : {str(e)}"
 
 def init_db():
-    """Initialise la base de données avec la table des métadonnées"""
-    conn = get_db_connection()
-    if conn:
+    """
+    Met le schéma de la base à jour via les migrations versionnées.
+    Les migrations ne sont vérifiées qu'une fois par processus : les reruns
+    suivants des pages ne font plus aucun aller-retour vers la base.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        start = time.perf_counter()
         try:
-            with conn.cursor() as cur:
-                # Vérification si la table metadata existe
-                cur.execute("""
-                    SELECT table_name 
-                    FROM information_schema.tables 
-                    WHERE table_name = 'metadata'
-                """)
-                
-                table_exists = cur.fetchone() is not None
-                
-                # Création de la table si elle n'existe pas
-                if not table_exists:
-                    cur.execute("""
-                        CREATE TABLE metadata (
-                            id SERIAL PRIMARY KEY,
-                            nom_table VARCHAR(255),
-                            nom_base VARCHAR(255) NOT NULL,
-                            type_donnees VARCHAR(255),
-                            producteur VARCHAR(255),
-                            nom_jeu_donnees VARCHAR(255),
-                            schema VARCHAR(255),
-                            description TEXT,
-                            millesime DATE,
-                            date_maj DATE,
-                            source VARCHAR(255),
-                            frequence_maj VARCHAR(255),
-                            licence VARCHAR(255),
-                            envoi_par VARCHAR(255),
-                            contact VARCHAR(255),
-                            mots_cles TEXT,
-                            notes TEXT,
-                            contenu_csv JSONB,
-                            dictionnaire JSONB,
-                            granularite_geo VARCHAR(100),
-                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                        )
-                    """)
-                    logging.info("Table metadata créée")
-                else:
-                    # Vérifier si les anciennes colonnes nom_fichier existe
-                    cur.execute("""
-                        SELECT column_name 
-                        FROM information_schema.columns 
-                        WHERE table_name = 'metadata' AND column_name = 'nom_fichier'
-                    """)
-                    old_column_exists = cur.fetchone() is not None
-                    
-                    # Si l'ancienne colonne existe, la renommer
-                    if old_column_exists:
-                        try:
-                            cur.execute("ALTER TABLE metadata RENAME COLUMN nom_fichier TO nom_base")
-                            logging.info("Colonne nom_fichier renommée en nom_base")
-                        except Exception as e:
-                            logging.warning(f"Erreur lors du renommage de la colonne nom_fichier : {str(e)}")
-                    
-                    # Vérifier si l'ancienne colonne date_creation existe
-                    cur.execute("""
-                        SELECT column_name 
-                        FROM information_schema.columns 
-                        WHERE table_name = 'metadata' AND column_name = 'date_creation'
-                    """)
-                    date_creation_exists = cur.fetchone() is not None
-                    
-                    # Vérifier si la nouvelle colonne millesime existe
-                    cur.execute("""
-                        SELECT column_name 
-                        FROM information_schema.columns 
-                        WHERE table_name = 'metadata' AND column_name = 'millesime'
-                    """)
-                    millesime_exists = cur.fetchone() is not None
-                    
-                    # Si l'ancienne colonne existe mais pas la nouvelle, la renommer
-                    if date_creation_exists and not millesime_exists:
-                        try:
-                            cur.execute("ALTER TABLE metadata RENAME COLUMN date_creation TO millesime")
-                            logging.info("Colonne date_creation renommée en millesime")
-                        except Exception as e:
-                            logging.warning(f"Erreur lors du renommage de la colonne date_creation : {str(e)}")
-                
-                # Vérification pour les autres colonnes nom_table et granularite_geo
-                cur.execute("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'metadata' AND column_name = 'nom_table'
-                """)
-                
-                nom_table_exists = cur.fetchone() is not None
-                if not nom_table_exists:
-                    try:
-                        cur.execute("ALTER TABLE metadata ADD COLUMN nom_table VARCHAR(255)")
-                        logging.info("Colonne nom_table ajoutée à la table metadata")
-                    except Exception as e:
-                        logging.warning(f"Impossible d'ajouter la colonne nom_table : {str(e)}")
-                
-                cur.execute("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'metadata' AND column_name = 'granularite_geo'
-                """)
-                
-                granularite_geo_exists = cur.fetchone() is not None
-                if not granularite_geo_exists:
-                    try:
-                        cur.execute("ALTER TABLE metadata ADD COLUMN granularite_geo VARCHAR(100)")
-                        logging.info("Colonne granularite_geo ajoutée à la table metadata")
-                    except Exception as e:
-                        logging.warning(f"Impossible d'ajouter la colonne granularite_geo : {str(e)}")
-                
-                conn.commit()
-                logging.info("Table metadata configurée")
+            with db_connection() as conn:
+                applied = run_migrations(conn)
+            _schema_ready = True
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if applied:
+                logging.info(f"Migrations appliquées : {applied} (schéma en version {SCHEMA_VERSION}, {elapsed_ms:.0f} ms)")
+            else:
+                logging.info(f"Schéma metadata à jour (version {SCHEMA_VERSION}, vérifié en {elapsed_ms:.0f} ms)")
         except Exception as e:
             logging.error(f"Erreur lors de l'initialisation de la base de données : {str(e)}")
             st.error(f"Erreur lors de l'initialisation de la base de données : {str(e)}")
-        finally:
-            conn.close()
 
 def get_metadata_columns():
     """Récupère la liste des colonnes de la table metadata"""
-    conn = get_db_connection()
-    if not conn:
-        return []
-        
     try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'metadata'
-                ORDER BY ordinal_position
-            """)
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT column_name 
+                    FROM information_schema.columns 
+                    WHERE table_name = 'metadata'
+                    ORDER BY ordinal_position
+                """)
             
-            columns = [row[0] for row in cur.fetchall()]
-            return columns
+                columns = [row[0] for row in cur.fetchall()]
+                return columns
             
     except Exception as e:
         logging.error(f"Erreur lors de la récupération des colonnes : {str(e)}")
         return []
-    finally:
-        conn.close()
 
-def remove_accents(input_str):
-    """Supprime les accents d'une chaîne de caractères"""
-    nfkd_form = unicodedata.normalize('NFKD', input_str)
-    return ''.join([c for c in nfkd_form if not unicodedata.combining(c)])
+def _build_tsquery(search_term: str):
+    """
+    Convertit la saisie utilisateur en requête to_tsquery : chaque mot devient
+    un préfixe (recherche au fil de la frappe) et tous les mots sont requis.
+    """
+    words = re.findall(r'[^\W_]+', search_term)
+    # Les élisions (l', d'...) donneraient des préfixes d'une lettre trop restrictifs
+    words = [word for word in words if len(word) > 1] or words
+    if not words:
+        return None
+    return ' & '.join(f"{word}:*" for word in words)
+
+def _build_search_query(search_term, search_mode, similarity_threshold=None):
+    """
+    Construit les fragments SQL de recherche pour le mode demandé.
+
+    Returns:
+        Dictionnaire {score, score_params, from, from_params, where, where_params, setup}
+        où setup liste les requêtes (sql, paramètres) à exécuter avant la requête
+        principale dans la même transaction ; None s'il n'y a aucun critère exploitable
+    """
+    if search_mode == SEARCH_MODE_FULLTEXT:
+        tsquery = _build_tsquery(search_term)
+        if not tsquery:
+            return None
+        return {
+            'score': "ts_rank_cd(metadata.search_vector, query)",
+            'score_params': [],
+            'from': "metadata, to_tsquery(%s::regconfig, %s) AS query",
+            'from_params': [TS_CONFIG, tsquery],
+            'where': "metadata.search_vector @@ query",
+            'where_params': [],
+            'setup': []
+        }
+
+    if search_mode == SEARCH_MODE_FUZZY:
+        threshold = FUZZY_SIMILARITY_THRESHOLD if similarity_threshold is None else similarity_threshold
+        term = search_term.strip()
+        if not term:
+            return None
+        fields = FUZZY_SEARCH_FIELDS
+        score_sql = "GREATEST(" + ", ".join(
+            f"word_similarity(f_unaccent(%s), f_unaccent({field}))" for field in fields
+        ) + ")"
+        # L'opérateur <% (similarité de mot ≥ seuil) est servi par les index trigrammes sur f_unaccent()
+        where_sql = "(" + " OR ".join(f"f_unaccent(%s) <%% f_unaccent({field})" for field in fields) + ")"
+        return {
+            'score': score_sql,
+            'score_params': [term] * len(fields),
+            'from': "metadata",
+            'from_params': [],
+            'where': where_sql,
+            'where_params': [term] * len(fields),
+            'setup': [("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", (str(threshold),))]
+        }
+
+    if search_mode == SEARCH_MODE_SUBSTRING:
+        # Comparaisons sur f_unaccent() des deux côtés : insensibles aux accents et à la casse,
+        # et servies par les index trigrammes (ILIKE) créés par les migrations
+        search_pattern = f'%{search_term}%'
+        score_sql = """
+            (CASE 
+                WHEN f_unaccent(nom_jeu_donnees) ILIKE f_unaccent(%s) THEN 4
+                WHEN f_unaccent(producteur) ILIKE f_unaccent(%s) THEN 3
+                WHEN f_unaccent(description) ILIKE f_unaccent(%s) THEN 2
+                WHEN f_unaccent(dictionnaire::text) ILIKE f_unaccent(%s) THEN 1
+                ELSE 0
+            END) +
+            (CASE 
+                WHEN position(LOWER(f_unaccent(%s)) in LOWER(f_unaccent(nom_jeu_donnees))) = 1 THEN 2
+                WHEN position(LOWER(f_unaccent(%s)) in LOWER(f_unaccent(producteur))) = 1 THEN 1.5
+                ELSE 1
+            END)"""
+        where_sql = """(f_unaccent(nom_jeu_donnees) ILIKE f_unaccent(%s)
+            OR f_unaccent(nom_table) ILIKE f_unaccent(%s)
+            OR f_unaccent(producteur) ILIKE f_unaccent(%s)
+            OR f_unaccent(description) ILIKE f_unaccent(%s)
+            OR f_unaccent(dictionnaire::text) ILIKE f_unaccent(%s))"""
+        return {
+            'score': score_sql,
+            # Pour le CASE du type de champ puis pour le CASE de la position
+            'score_params': [search_pattern] * 4 + [search_term] * 2,
+            'from': "metadata",
+            'from_params': [],
+            'where': where_sql,
+            'where_params': [search_pattern] * 5,
+            'setup': []
+        }
+
+    raise ValueError(f"Mode de recherche inconnu : {search_mode}")
+
+def _build_metadata_query(search_term=None, search_mode=SEARCH_MODE_FULLTEXT,
+                          similarity_threshold=None, **filters):
+    """
+    Assemble la recherche et les filtres communs aux requêtes sur la table metadata.
+
+    Args:
+        filters: Valeurs des filtres de METADATA_FILTERS (None ou vide = pas de filtre)
+
+    Returns:
+        Dictionnaire {score, score_params, from, from_params, where, where_params, setup} ;
+        score vaut None en l'absence de recherche, where est une liste de conditions
+    """
+    unknown = set(filters) - set(METADATA_FILTERS)
+    if unknown:
+        raise ValueError(f"Filtre inconnu : {', '.join(sorted(unknown))}")
+
+    search = _build_search_query(search_term, search_mode, similarity_threshold) if search_term else None
+    if search:
+        query = dict(search, where=[search['where']], where_params=list(search['where_params']))
+    else:
+        query = {'score': None, 'score_params': [], 'from': "metadata", 'from_params': [],
+                 'where': [], 'where_params': [], 'setup': []}
+
+    for name, condition in METADATA_FILTERS.items():
+        value = filters.get(name)
+        if value:
+            query['where'].append(condition)
+            query['where_params'].append(value)
+    return query
+
+def _where_sql(conditions) -> str:
+    return (" WHERE " + " AND ".join(conditions)) if conditions else ""
 
-def get_metadata(search_term=None, schema_filter=None):
-    """Récupère les métadonnées depuis la base de données avec possibilité de recherche et filtre par schéma"""
-    conn = get_db_connection()
+@cached(ttl=METADATA_CACHE_TTL, max_entries=128, copy=copy.deepcopy)
+def list_metadata_page(search_term=None, schema_filter=None, producteur=None,
+                       search_mode=SEARCH_MODE_FULLTEXT, similarity_threshold=None,
+                       page_size=DEFAULT_PAGE_SIZE, cursor=None,
+                       type_donnees=None, granularite_geo=None) -> dict:
+    """
+    Liste paginée des métadonnées, limitée aux colonnes de synthèse
+    (les blobs contenu_csv et dictionnaire sont lus à la demande par get_metadata_details).
+
+    La pagination se fait par clé (keyset) sur (nom_jeu_donnees, id), précédée
+    du score de pertinence lorsqu'une recherche est active : chaque page coûte
+    le même prix quelle que soit sa position dans le catalogue.
+
+    Args:
+        cursor: Curseur renvoyé par la page précédente (None pour la première page)
+        page_size: Nombre de lignes par page
+        producteur, type_donnees, granularite_geo: Filtres exacts, évalués par la base
+            dans la même requête que la recherche et le filtre de schéma
+        (les autres arguments sont ceux de get_metadata)
+
+    Returns:
+        {'rows': liste de dictionnaires, 'total': nombre total de résultats,
+         'next_cursor': curseur de la page suivante ou None s'il n'y en a pas}
+    """
     try:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            if search_term and schema_filter:
-                query = """
-                SELECT *, 
-                    (CASE 
-                        WHEN LOWER(nom_jeu_donnees) LIKE LOWER(%s) THEN 4
-                        WHEN LOWER(producteur) LIKE LOWER(%s) THEN 3
-                        WHEN LOWER(description) LIKE LOWER(%s) THEN 2
-                        WHEN LOWER(dictionnaire::text) LIKE LOWER(%s) THEN 1
-                        ELSE 0
-                    END) +
-                    (CASE 
-                        WHEN position(LOWER(%s) in LOWER(nom_jeu_donnees)) = 1 THEN 2
-                        WHEN position(LOWER(%s) in LOWER(producteur)) = 1 THEN 1.5
-                        ELSE 1
-                    END) as score
-                FROM metadata 
-                WHERE (LOWER(nom_jeu_donnees) LIKE LOWER(%s)
-                OR LOWER(producteur) LIKE LOWER(%s)
-                OR LOWER(description) LIKE LOWER(%s)
-                OR LOWER(dictionnaire::text) LIKE LOWER(%s))
-                AND LOWER(schema) = LOWER(%s)
-                ORDER BY score DESC, nom_jeu_donnees
-                """
-                search_pattern = f'%{search_term}%'
-                cur.execute(query, (
-                    search_pattern, search_pattern, search_pattern, search_pattern,  # Pour le CASE du type de champ
-                    search_term, search_term,  # Pour le CASE de la position
-                    search_pattern, search_pattern, search_pattern, search_pattern,  # Pour le WHERE
-                    schema_filter
-                ))
-            elif search_term:
-                query = """
-                SELECT *, 
-                    (CASE 
-                        WHEN LOWER(nom_jeu_donnees) LIKE LOWER(%s) THEN 4
-                        WHEN LOWER(producteur) LIKE LOWER(%s) THEN 3
-                        WHEN LOWER(description) LIKE LOWER(%s) THEN 2
-                        WHEN LOWER(dictionnaire::text) LIKE LOWER(%s) THEN 1
-                        ELSE 0
-                    END) +
-                    (CASE 
-                        WHEN position(LOWER(%s) in LOWER(nom_jeu_donnees)) = 1 THEN 2
-                        WHEN position(LOWER(%s) in LOWER(producteur)) = 1 THEN 1.5
-                        ELSE 1
-                    END) as score
-                FROM metadata 
-                WHERE LOWER(nom_jeu_donnees) LIKE LOWER(%s)
-                OR LOWER(producteur) LIKE LOWER(%s)
-                OR LOWER(description) LIKE LOWER(%s)
-                OR LOWER(dictionnaire::text) LIKE LOWER(%s)
-                ORDER BY score DESC, nom_jeu_donnees
-                """
-                search_pattern = f'%{search_term}%'
-                cur.execute(query, (
-                    search_pattern, search_pattern, search_pattern, search_pattern,  # Pour le CASE du type de champ
-                    search_term, search_term,  # Pour le CASE de la position
-                    search_pattern, search_pattern, search_pattern, search_pattern  # Pour le WHERE
-                ))
-            elif schema_filter:
-                query = """
-                SELECT * FROM metadata 
-                WHERE LOWER(schema) = LOWER(%s)
-                ORDER BY nom_jeu_donnees
-                """
-                cur.execute(query, (schema_filter,))
+        q = _build_metadata_query(search_term, search_mode, similarity_threshold,
+                                  schema=schema_filter, producteur=producteur,
+                                  type_donnees=type_donnees, granularite_geo=granularite_geo)
+        columns = ', '.join(f"metadata.{col}" for col in METADATA_SUMMARY_COLUMNS)
+        # Les libellés NULL sont triés comme des chaînes vides pour garder une clé totalement ordonnée
+        sort_name = "COALESCE(metadata.nom_jeu_donnees, '')"
+        if q['score']:
+            score_sql = f"({q['score']})::double precision"
+        else:
+            score_sql = "0::double precision"
+        inner = (
+            f"SELECT {columns}, {score_sql} AS score, {sort_name} AS sort_name "
+            f"FROM {q['from']}{_where_sql(q['where'])}"
+        )
+        params = q['score_params'] + q['from_params'] + q['where_params']
+
+        keyset_sql = ""
+        keyset_params = []
+        if cursor:
+            last_score, last_name, last_id = cursor
+            keyset_sql = " WHERE (page.score < %s OR (page.score = %s AND (page.sort_name, page.id) > (%s, %s)))"
+            keyset_params = [last_score, last_score, last_name, last_id]
+
+        query = (
+            f"SELECT * FROM ({inner}) AS page{keyset_sql} "
+            f"ORDER BY page.score DESC, page.sort_name, page.id LIMIT %s"
+        )
+        count_query = f"SELECT COUNT(*) AS total FROM {q['from']}{_where_sql(q['where'])}"
+
+        with db_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                for setup_sql, setup_params in q['setup']:
+                    cur.execute(setup_sql, setup_params)
+                cur.execute(query, params + keyset_params + [page_size + 1])
+                rows = cur.fetchall()
+                cur.execute(count_query, q['from_params'] + q['where_params'])
+                total = cur.fetchone()['total']
+
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            next_cursor = (last['score'], last['sort_name'], last['id'])
+        return {'rows': rows, 'total': total, 'next_cursor': next_cursor}
+    except Exception as e:
+        logging.error(f"Erreur lors de la récupération de la page de métadonnées : {str(e)}")
+        skip_current()
+        return {'rows': [], 'total': 0, 'next_cursor': None}
+
+@cached(ttl=FACETS_CACHE_TTL, max_entries=64, copy=copy.deepcopy)
+def get_facet_counts(search_term=None, search_mode=SEARCH_MODE_FULLTEXT,
+                     similarity_threshold=None) -> dict:
+    """
+    Compte les fiches par valeur de chaque filtre du catalogue pour la recherche courante.
+
+    Les quatre décomptes sont calculés par une seule requête GROUP BY GROUPING SETS
+    (un seul parcours des lignes retenues). Le résultat est mis en cache quelques
+    instants et invalidé par save_metadata.
+
+    Returns:
+        {'schema': {valeur: nombre}, 'producteur': {...}, 'type_donnees': {...},
+         'granularite_geo': {...}} ; les schémas sont en minuscules, les valeurs vides ignorées
+    """
+    facets = {name: {} for name in METADATA_FILTERS}
+    try:
+        q = _build_metadata_query(search_term, search_mode, similarity_threshold)
+        query = f"""
+            SELECT LOWER(schema) AS schema, producteur, type_donnees, granularite_geo,
+                   GROUPING(LOWER(schema)) = 0 AS by_schema,
+                   GROUPING(producteur) = 0 AS by_producteur,
+                   GROUPING(type_donnees) = 0 AS by_type_donnees,
+                   GROUPING(granularite_geo) = 0 AS by_granularite_geo,
+                   COUNT(*) AS total
+            FROM {q['from']}{_where_sql(q['where'])}
+            GROUP BY GROUPING SETS ((LOWER(schema)), (producteur), (type_donnees), (granularite_geo))
+        """
+        with db_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                for setup_sql, setup_params in q['setup']:
+                    cur.execute(setup_sql, setup_params)
+                cur.execute(query, q['from_params'] + q['where_params'])
+                rows = cur.fetchall()
+
+        for row in rows:
+            for name in facets:
+                if row[f'by_{name}'] and row[name]:
+                    facets[name][row[name]] = row['total']
+        return {name: dict(sorted(counts.items())) for name, counts in facets.items()}
+    except Exception as e:
+        logging.error(f"Erreur lors du calcul des facettes : {str(e)}")
+        skip_current()
+        return facets
+
+@cached(ttl=METADATA_CACHE_TTL, max_entries=32, copy=copy.deepcopy)
+def get_metadata_details(metadata_id: int):
+    """Récupère une fiche complète (y compris contenu_csv et dictionnaire) par son identifiant"""
+    try:
+        with db_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                cur.execute("SELECT * FROM metadata WHERE id = %s", (metadata_id,))
+                return cur.fetchone()
+    except Exception as e:
+        logging.error(f"Erreur lors de la récupération de la fiche {metadata_id} : {str(e)}")
+        skip_current()
+        return None
+
+@cached(ttl=METADATA_CACHE_TTL, max_entries=32, copy=lambda df: df.copy())
+def _get_latest_update_tracking(datasets=None) -> pd.DataFrame:
+    """Dernière version de chaque jeu de données et son statut (vue metadata_latest_version)"""
+    conditions, params = [], []
+    if datasets is not None:
+        conditions.append("nom_jeu_donnees = ANY(%s)")
+        params.append(list(datasets))
+    query = f"""
+        SELECT {', '.join(UPDATE_TRACKING_COLUMNS)}, statut
+        FROM metadata_latest_version{_where_sql(conditions)}
+        ORDER BY nom_jeu_donnees
+    """
+    try:
+        with db_connection() as conn:
+            return pd.read_sql(query, conn, params=params or None)
+    except Exception as e:
+        logging.error(f"Erreur lors de la récupération du suivi des mises à jour : {str(e)}")
+        skip_current()
+        return pd.DataFrame()
+
+def _read_history_rows(conn, since=None) -> pd.DataFrame:
+    query = f"SELECT {', '.join(UPDATE_TRACKING_COLUMNS)}, updated_at FROM metadata"
+    params = None
+    if since is not None:
+        query += " WHERE updated_at > %s"
+        params = (since,)
+    return pd.read_sql(query, conn, params=params).set_index('id', drop=False)
+
+def refresh_update_history(force: bool = False) -> pd.DataFrame:
+    """
+    Rafraîchit l'instantané de l'historique du suivi et le retourne (à ne pas modifier).
+
+    Seules les lignes dont updated_at dépasse la dernière valeur lue (moins un recouvrement)
+    sont relues et fusionnées par id : le coût suit le nombre de modifications, pas la
+    taille de la table. Une comparaison du nombre de lignes détecte les suppressions,
+    qui entraînent une relecture complète. Sans écriture signalée, l'instantané est
+    servi tel quel pendant UPDATE_HISTORY_REFRESH_INTERVAL secondes.
+
+    Args:
+        force: Relecture complète de la table
+    """
+    global _history_snapshot, _history_high_water, _history_refreshed_at, _history_generation
+    with _history_lock:
+        generation = current_generation()
+        if (not force and _history_snapshot is not None and generation == _history_generation
+                and time.monotonic() - _history_refreshed_at < UPDATE_HISTORY_REFRESH_INTERVAL):
+            return _history_snapshot
+
+        with db_connection() as conn:
+            if force or _history_snapshot is None or _history_high_water is None:
+                snapshot = _read_history_rows(conn)
+                logging.info(f"Historique du suivi chargé : {len(snapshot)} lignes")
             else:
-                query = "SELECT * FROM metadata ORDER BY nom_jeu_donnees"
-                cur.execute(query)
-            results = cur.fetchall()
-            logging.info(f"Nombre de résultats trouvés : {len(results)}")
-            return results
+                since = _history_high_water - timedelta(seconds=UPDATE_HISTORY_OVERLAP)
+                changed = _read_history_rows(conn, since)
+                snapshot = _history_snapshot
+                if not changed.empty:
+                    snapshot = pd.concat([snapshot.drop(changed.index, errors='ignore'), changed])
+                with conn.cursor() as cur:
+                    cur.execute("SELECT COUNT(*) FROM metadata")
+                    total = cur.fetchone()[0]
+                if total != len(snapshot):
+                    # Des lignes ont été supprimées (ou ajoutées pendant la lecture) : relecture complète
+                    snapshot = _read_history_rows(conn)
+                    logging.info(f"Historique du suivi rechargé : {len(snapshot)} lignes")
+            conn.rollback()
+
+        _history_snapshot = snapshot
+        _history_high_water = snapshot['updated_at'].max() if not snapshot.empty else None
+        _history_refreshed_at = time.monotonic()
+        _history_generation = generation
+        return snapshot
+
+def get_update_tracking(history: bool = False, datasets=None) -> pd.DataFrame:
+    """
+    Données de suivi des mises à jour, avec le statut calculé par la base
+    (vue metadata_latest_version).
+
+    Args:
+        history: False : dernière version de chaque jeu de données seulement ;
+            True : toutes les versions, chacune avec le statut de la dernière
+            (lues dans l'instantané rafraîchi de façon incrémentale)
+        datasets: Tuple de noms de jeux de données auxquels limiter la lecture (tous par défaut)
+
+    Returns:
+        DataFrame trié par jeu de données puis version décroissante (vide en cas d'erreur)
+    """
+    latest = _get_latest_update_tracking(datasets)
+    if not history or latest.empty:
+        return latest
+    try:
+        snapshot = refresh_update_history()
     except Exception as e:
-        logging.error(f"Erreur lors de la récupération des métadonnées : {str(e)}")
-        return []
-    finally:
-        conn.close()
+        logging.error(f"Erreur lors du rafraîchissement de l'historique du suivi : {str(e)}")
+        return pd.DataFrame()
+
+    statuts = latest.set_index('nom_jeu_donnees')['statut']
+    rows = snapshot[snapshot['nom_jeu_donnees'].isin(statuts.index) & snapshot['date_publication'].notna()]
+    rows = rows[list(UPDATE_TRACKING_COLUMNS)].reset_index(drop=True)
+    rows['statut'] = rows['nom_jeu_donnees'].map(statuts)
+    return rows.sort_values(
+        ['nom_jeu_donnees', 'date_publication', 'millesime', 'id'],
+        ascending=[True, False, False, False],
+        na_position='last',
+        kind='stable'
+    ).reset_index(drop=True)
 
 def save_metadata(metadata):
     """Sauvegarde les métadonnées dans la base de données"""
-    conn = get_db_connection()
-    if not conn:
-        return False, "Erreur de connexion à la base de données"
-    
     try:
-        with conn.cursor() as cur:
-            # Préparation des données pour l'insertion
-            data = {
-                'nom_table': metadata.get('informations_base', {}).get('nom_table'),
-                'nom_base': metadata.get('informations_base', {}).get('nom_base'),
-                'type_donnees': metadata.get('informations_base', {}).get('type_donnees'),
-                'producteur': metadata.get('informations_base', {}).get('producteur'),
-                'nom_jeu_donnees': metadata.get('informations_base', {}).get('nom_jeu_donnees'),
-                'schema': metadata.get('informations_base', {}).get('schema'),
-                'description': metadata.get('informations_base', {}).get('description'),
-                'millesime': metadata.get('informations_base', {}).get('date_creation'),
-                'date_publication': metadata.get('date_publication', None),
-                'date_maj': metadata.get('date_maj', None),
-                'date_prochaine_publication': metadata.get('date_prochaine_publication', None),
-                'source': metadata.get('informations_base', {}).get('source'),
-                'frequence_maj': metadata.get('informations_base', {}).get('frequence_maj'),
-                'licence': metadata.get('informations_base', {}).get('licence'),
-                'envoi_par': metadata.get('informations_base', {}).get('envoi_par'),
-                'granularite_geo': metadata.get('informations_base', {}).get('granularite_geo'),
-                'contenu_csv': json.dumps(metadata.get('contenu_csv', {})),
-                'dictionnaire': json.dumps(metadata.get('dictionnaire', {}))
-            }
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                # Préparation des données pour l'insertion
+                data = {
+                    'nom_table': metadata.get('informations_base', {}).get('nom_table'),
+                    'nom_base': metadata.get('informations_base', {}).get('nom_base'),
+                    'type_donnees': metadata.get('informations_base', {}).get('type_donnees'),
+                    'producteur': metadata.get('informations_base', {}).get('producteur'),
+                    'nom_jeu_donnees': metadata.get('informations_base', {}).get('nom_jeu_donnees'),
+                    'schema': metadata.get('informations_base', {}).get('schema'),
+                    'description': metadata.get('informations_base', {}).get('description'),
+                    'millesime': metadata.get('informations_base', {}).get('date_creation'),
+                    'date_publication': metadata.get('date_publication', None),
+                    'date_maj': metadata.get('date_maj', None),
+                    'date_prochaine_publication': metadata.get('date_prochaine_publication', None),
+                    'source': metadata.get('informations_base', {}).get('source'),
+                    'frequence_maj': metadata.get('informations_base', {}).get('frequence_maj'),
+                    'licence': metadata.get('informations_base', {}).get('licence'),
+                    'envoi_par': metadata.get('informations_base', {}).get('envoi_par'),
+                    'granularite_geo': metadata.get('informations_base', {}).get('granularite_geo'),
+                    'contenu_csv': json.dumps(metadata.get('contenu_csv', {})),
+                    'dictionnaire': json.dumps(metadata.get('dictionnaire', {}))
+                }
             
-            # Construction de la requête SQL
-            columns = ', '.join(data.keys())
-            values = ', '.join(['%s'] * len(data))
-            query = f"""
-                INSERT INTO metadata ({columns})
-                VALUES ({values})
-                RETURNING id
-            """
-
-            # LOG pour debug
-            print("REQUETE SQL :", query)
-            print("VALEURS :", list(data.values()))
-            # Exécution de la requête
-            cur.execute(query, list(data.values()))
-            new_id = cur.fetchone()[0]
-            conn.commit()
+                # Construction de la requête SQL
+                columns = ', '.join(data.keys())
+                values = ', '.join(['%s'] * len(data))
+                query = f"""
+                    INSERT INTO metadata ({columns})
+                    VALUES ({values})
+                    RETURNING id
+                """
+
+                # Requête seulement : les valeurs (contenu de la fiche) ne sont pas journalisées
+                logging.debug(f"Insertion dans metadata : {query.strip()}")
+                # Exécution de la requête
+                cur.execute(query, list(data.values()))
+                new_id = cur.fetchone()[0]
+                # Signale l'écriture aux autres processus dans la même transaction
+                cur.execute(CACHE_GENERATION_BUMP_SQL)
+                conn.commit()
+                bump_generation()
             
-            return True, f"Métadonnées sauvegardées avec succès (ID: {new_id})"
+                return True, f"Métadonnées sauvegardées avec succès (ID: {new_id})"
     except Exception as e:
-        conn.rollback()
         logging.error(f"Erreur lors de la sauvegarde des métadonnées : {str(e)}")
         return False, f"Erreur lors de la sauvegarde : {str(e)}"
-    finally:
-        conn.close()
 
+@cached(ttl=PRODUCTEURS_CACHE_TTL, max_entries=16, copy=list)
 def get_producteurs_by_type(type_donnees: str) -> list[str]:
     """Récupère la liste des producteurs pour un type de données donné"""
     logging.info(f"Récupération des producteurs pour le type de données : {type_donnees}")
-    conn = get_db_connection()
-    if not conn:
-        logging.error("Impossible de se connecter à la base de données")
-        return []
-    
     try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT DISTINCT producteur 
-                FROM metadata 
-                WHERE type_donnees = %s 
-                AND producteur IS NOT NULL 
-                ORDER BY producteur
-            """, (type_donnees,))
-            producteurs = [row[0] for row in cur.fetchall()]
-            logging.info(f"Producteurs trouvés : {producteurs}")
-            return producteurs if producteurs else []
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT DISTINCT producteur 
+                    FROM metadata 
+                    WHERE type_donnees = %s 
+                    AND producteur IS NOT NULL 
+                    ORDER BY producteur
+                """, (type_donnees,))
+                producteurs = [row[0] for row in cur.fetchall()]
+                logging.info(f"Producteurs trouvés : {producteurs}")
+                return producteurs if producteurs else []
     except Exception as e:
         logging.error(f"Erreur lors de la récupération des producteurs : {str(e)}")
+        skip_current()
         return []
-    finally:
-        conn.close()
 
+@cached(ttl=PRODUCTEURS_CACHE_TTL, max_entries=128, copy=list)
 def get_jeux_donnees_by_producteur(producteur: str) -> list[str]:
     """Récupère la liste des jeux de données pour un producteur donné"""
-    conn = get_db_connection()
-    if not conn:
-        return []
-    
     try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT DISTINCT nom_jeu_donnees 
-                FROM metadata 
-                WHERE producteur = %s 
-                AND nom_jeu_donnees IS NOT NULL 
-                ORDER BY nom_jeu_donnees
-            """, (producteur,))
-            jeux = [row[0] for row in cur.fetchall()]
-            return jeux if jeux else []
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT DISTINCT nom_jeu_donnees 
+                    FROM metadata 
+                    WHERE producteur = %s 
+                    AND nom_jeu_donnees IS NOT NULL 
+                    ORDER BY nom_jeu_donnees
+                """, (producteur,))
+                jeux = [row[0] for row in cur.fetchall()]
+                return jeux if jeux else []
     except Exception as e:
         logging.error(f"Erreur lors de la récupération des jeux de données : {str(e)}")
+        skip_current()
         return []
-    finally:
-        conn.close()
 
 def get_types_donnees() -> list[str]:
     """Récupère la liste des types de données existants"""
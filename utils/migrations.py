@@ -0,0 +1,279 @@
+"""
+Migrations versionnées du schéma de la base de métadonnées.
+Chaque étape est appliquée une seule fois par base et enregistrée dans la
+table schema_version ; les étapes sont exécutées dans l'ordre des versions.
+Pour faire évoluer le schéma, ajouter une nouvelle entrée à la fin de MIGRATIONS.
+"""
+
+import logging
+from typing import List, Tuple
+
+# Clé du verrou consultatif empêchant deux processus de migrer simultanément
+MIGRATION_LOCK_KEY = 72817001
+
+# (version, description, SQL)
+MIGRATIONS: List[Tuple[int, str, str]] = [
+    (1, "Création de la table metadata", """
+        CREATE TABLE IF NOT EXISTS metadata (
+            id SERIAL PRIMARY KEY,
+            nom_table VARCHAR(255),
+            nom_base VARCHAR(255) NOT NULL,
+            type_donnees VARCHAR(255),
+            producteur VARCHAR(255),
+            nom_jeu_donnees VARCHAR(255),
+            schema VARCHAR(255),
+            description TEXT,
+            millesime DATE,
+            date_maj DATE,
+            source VARCHAR(255),
+            frequence_maj VARCHAR(255),
+            licence VARCHAR(255),
+            envoi_par VARCHAR(255),
+            contact VARCHAR(255),
+            mots_cles TEXT,
+            notes TEXT,
+            contenu_csv JSONB,
+            dictionnaire JSONB,
+            granularite_geo VARCHAR(100),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """),
+    (2, "Renommage de la colonne nom_fichier en nom_base", """
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = 'metadata' AND column_name = 'nom_fichier')
+               AND NOT EXISTS (SELECT 1 FROM information_schema.columns
+                               WHERE table_name = 'metadata' AND column_name = 'nom_base') THEN
+                ALTER TABLE metadata RENAME COLUMN nom_fichier TO nom_base;
+            END IF;
+        END $$
+    """),
+    (3, "Renommage de la colonne date_creation en millesime", """
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = 'metadata' AND column_name = 'date_creation')
+               AND NOT EXISTS (SELECT 1 FROM information_schema.columns
+                               WHERE table_name = 'metadata' AND column_name = 'millesime') THEN
+                ALTER TABLE metadata RENAME COLUMN date_creation TO millesime;
+            END IF;
+        END $$
+    """),
+    (4, "Ajout des colonnes nom_table et granularite_geo", """
+        ALTER TABLE metadata ADD COLUMN IF NOT EXISTS nom_table VARCHAR(255);
+        ALTER TABLE metadata ADD COLUMN IF NOT EXISTS granularite_geo VARCHAR(100);
+    """),
+    (5, "Ajout des colonnes date_publication et date_prochaine_publication", """
+        ALTER TABLE metadata ADD COLUMN IF NOT EXISTS date_publication DATE;
+        ALTER TABLE metadata ADD COLUMN IF NOT EXISTS date_prochaine_publication DATE;
+    """),
+    (6, "Recherche plein texte : configuration french_unaccent, colonne search_vector et index GIN", """
+        CREATE EXTENSION IF NOT EXISTS unaccent;
+
+        -- unaccent() n'est que STABLE : ce wrapper IMMUTABLE est utilisable dans les index
+        CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+            LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+            AS $func$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $func$;
+
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'french_unaccent') THEN
+                CREATE TEXT SEARCH CONFIGURATION public.french_unaccent (COPY = pg_catalog.french);
+                ALTER TEXT SEARCH CONFIGURATION public.french_unaccent
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, french_stem;
+            END IF;
+        END $$;
+
+        -- Colonne calculée et stockée : l'ajout recalcule (backfill) toutes les lignes existantes
+        ALTER TABLE metadata ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('public.french_unaccent', coalesce(nom_jeu_donnees, '') || ' ' || coalesce(nom_table, '')), 'A') ||
+                setweight(to_tsvector('public.french_unaccent', coalesce(producteur, '')), 'B') ||
+                setweight(to_tsvector('public.french_unaccent', coalesce(description, '')), 'C') ||
+                setweight(jsonb_to_tsvector('public.french_unaccent', coalesce(dictionnaire, '{}'::jsonb), '["string"]'), 'D')
+            ) STORED;
+
+        CREATE INDEX IF NOT EXISTS idx_metadata_search_vector ON metadata USING GIN (search_vector);
+    """),
+    (7, "Recherche approchée : index trigrammes sur nom_table, nom_jeu_donnees et producteur", """
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS idx_metadata_nom_table_trgm ON metadata USING GIN (nom_table gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_metadata_nom_jeu_donnees_trgm ON metadata USING GIN (nom_jeu_donnees gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_metadata_producteur_trgm ON metadata USING GIN (producteur gin_trgm_ops);
+    """),
+    (8, "Recherche insensible aux accents : index trigrammes sur f_unaccent()", """
+        -- Les index trigrammes servent à la fois l'opérateur <% (recherche approchée)
+        -- et ILIKE (recherche de sous-chaîne) ; pg_trgm ignore déjà la casse
+        DROP INDEX IF EXISTS idx_metadata_nom_table_trgm;
+        DROP INDEX IF EXISTS idx_metadata_nom_jeu_donnees_trgm;
+        DROP INDEX IF EXISTS idx_metadata_producteur_trgm;
+        CREATE INDEX IF NOT EXISTS idx_metadata_nom_table_unaccent_trgm
+            ON metadata USING GIN (f_unaccent(nom_table) gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_metadata_nom_jeu_donnees_unaccent_trgm
+            ON metadata USING GIN (f_unaccent(nom_jeu_donnees) gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_metadata_producteur_unaccent_trgm
+            ON metadata USING GIN (f_unaccent(producteur) gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_metadata_description_unaccent_trgm
+            ON metadata USING GIN (f_unaccent(description) gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_metadata_dictionnaire_unaccent_trgm
+            ON metadata USING GIN (f_unaccent(dictionnaire::text) gin_trgm_ops);
+    """),
+    (9, "Index de pagination par clé (nom_jeu_donnees, id)", """
+        CREATE INDEX IF NOT EXISTS idx_metadata_keyset
+            ON metadata ((COALESCE(nom_jeu_donnees, '')), id);
+    """),
+    (10, "Index composites des filtres du catalogue", """
+        CREATE INDEX IF NOT EXISTS idx_metadata_schema_keyset
+            ON metadata (LOWER(schema), (COALESCE(nom_jeu_donnees, '')), id);
+        CREATE INDEX IF NOT EXISTS idx_metadata_producteur_keyset
+            ON metadata (producteur, (COALESCE(nom_jeu_donnees, '')), id);
+        CREATE INDEX IF NOT EXISTS idx_metadata_type_donnees_keyset
+            ON metadata (type_donnees, (COALESCE(nom_jeu_donnees, '')), id);
+        CREATE INDEX IF NOT EXISTS idx_metadata_granularite_geo_keyset
+            ON metadata (granularite_geo, (COALESCE(nom_jeu_donnees, '')), id);
+    """),
+    (11, "Génération des caches applicatifs, incrémentée à chaque écriture", """
+        CREATE TABLE IF NOT EXISTS metadata_cache_generation (
+            singleton BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (singleton),
+            generation BIGINT NOT NULL DEFAULT 0
+        );
+        INSERT INTO metadata_cache_generation (singleton, generation)
+            VALUES (TRUE, 0) ON CONFLICT DO NOTHING;
+    """),
+    (12, "Notification metadata_changed à chaque écriture sur metadata", """
+        CREATE OR REPLACE FUNCTION notify_metadata_changed() RETURNS trigger
+            LANGUAGE plpgsql AS $func$
+        BEGIN
+            -- Les notifications ne sont délivrées qu'à la validation de la transaction
+            PERFORM pg_notify('metadata_changed', COALESCE(NEW.id, OLD.id)::text);
+            RETURN NULL;
+        END
+        $func$;
+
+        DROP TRIGGER IF EXISTS trg_metadata_changed ON metadata;
+        CREATE TRIGGER trg_metadata_changed
+            AFTER INSERT OR UPDATE OR DELETE ON metadata
+            FOR EACH ROW EXECUTE FUNCTION notify_metadata_changed();
+    """),
+    (13, "Mémoire des types inférés depuis le dictionnaire des variables", """
+        CREATE TABLE IF NOT EXISTS type_inference_memo (
+            rules_version TEXT NOT NULL,
+            row_hash TEXT NOT NULL,
+            sql_type TEXT,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (rules_version, row_hash)
+        );
+    """),
+    (14, "Vue de la dernière version de chaque jeu de données et de son statut", """
+        CREATE INDEX IF NOT EXISTS idx_metadata_latest_version
+            ON metadata (nom_jeu_donnees, date_publication DESC, millesime DESC NULLS LAST, id DESC)
+            WHERE nom_jeu_donnees IS NOT NULL AND date_publication IS NOT NULL;
+
+        -- Seule définition des statuts du suivi (CURRENT_DATE : fuseau horaire de la session)
+        CREATE OR REPLACE VIEW metadata_latest_version AS
+        SELECT DISTINCT ON (nom_jeu_donnees)
+            id,
+            nom_jeu_donnees,
+            producteur,
+            schema,
+            date_publication,
+            millesime,
+            date_prochaine_publication,
+            frequence_maj,
+            source,
+            CASE
+                WHEN COALESCE(LOWER(BTRIM(frequence_maj)), '') IN ('', 'ponctuelle') THEN 'MaJ non prévue'
+                WHEN date_prochaine_publication IS NULL THEN 'Inconnu'
+                WHEN date_publication >= date_prochaine_publication THEN 'À jour'
+                WHEN date_prochaine_publication < CURRENT_DATE THEN 'En retard'
+                WHEN date_prochaine_publication - CURRENT_DATE < 7 THEN 'À mettre à jour'
+                ELSE 'À jour'
+            END AS statut
+        FROM metadata
+        WHERE nom_jeu_donnees IS NOT NULL
+        AND date_publication IS NOT NULL
+        ORDER BY nom_jeu_donnees, date_publication DESC, millesime DESC NULLS LAST, id DESC;
+    """),
+    (15, "Horodatage updated_at de chaque écriture sur metadata (rafraîchissement incrémental)", """
+        ALTER TABLE metadata ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+        UPDATE metadata SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL;
+        ALTER TABLE metadata
+            ALTER COLUMN updated_at SET DEFAULT CURRENT_TIMESTAMP,
+            ALTER COLUMN updated_at SET NOT NULL;
+
+        CREATE OR REPLACE FUNCTION set_metadata_updated_at() RETURNS trigger
+            LANGUAGE plpgsql AS $func$
+        BEGIN
+            NEW.updated_at := CURRENT_TIMESTAMP;
+            RETURN NEW;
+        END
+        $func$;
+
+        DROP TRIGGER IF EXISTS trg_metadata_updated_at ON metadata;
+        CREATE TRIGGER trg_metadata_updated_at
+            BEFORE INSERT OR UPDATE ON metadata
+            FOR EACH ROW EXECUTE FUNCTION set_metadata_updated_at();
+
+        CREATE INDEX IF NOT EXISTS idx_metadata_updated_at ON metadata (updated_at);
+    """),
+    (16, "Notification metadata_changed par requête plutôt que par ligne", """
+        -- Une écriture en masse (UPDATE de tout le catalogue) n'envoie plus qu'une
+        -- notification : les écouteurs invalident tous leurs caches, l'id est inutile
+        CREATE OR REPLACE FUNCTION notify_metadata_changed() RETURNS trigger
+            LANGUAGE plpgsql AS $func$
+        BEGIN
+            PERFORM pg_notify('metadata_changed', 'metadata');
+            RETURN NULL;
+        END
+        $func$;
+
+        DROP TRIGGER IF EXISTS trg_metadata_changed ON metadata;
+        CREATE TRIGGER trg_metadata_changed
+            AFTER INSERT OR UPDATE OR DELETE ON metadata
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_metadata_changed();
+    """),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def run_migrations(conn) -> List[int]:
+    """
+    Applique les migrations manquantes dans une seule transaction.
+
+    Args:
+        conn: Connexion psycopg2 (la transaction est validée par cette fonction)
+
+    Returns:
+        Liste des versions appliquées (vide si le schéma était déjà à jour)
+    """
+    applied = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+            current_version = cur.fetchone()[0]
+
+            for version, description, sql in MIGRATIONS:
+                if version <= current_version:
+                    continue
+                logging.info(f"Migration {version} : {description}")
+                cur.execute(sql)
+                cur.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+                applied.append(version)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return applied
@@ -0,0 +1,107 @@
+"""
+Écoute des notifications PostgreSQL (LISTEN/NOTIFY) dans un thread d'arrière-plan.
+Chaque instance de l'application reçoit ainsi les écritures faites par les autres
+instances et par les scripts, et invalide immédiatement ses caches locaux.
+"""
+
+import logging
+import select
+import threading
+import time
+from typing import Callable, Optional
+
+import psycopg2
+import psycopg2.extensions
+
+
+class ChangeListener:
+    """
+    Thread d'écoute d'un canal de notification sur une connexion dédiée (hors pool).
+
+    Args:
+        connect: Fonction sans argument retournant une nouvelle connexion psycopg2
+        channel: Nom du canal écouté
+        on_notify: Appelée avec le contenu (payload) de chaque notification reçue
+        on_reconnect: Appelée après chaque reconnexion : les notifications émises
+            pendant la coupure sont perdues, l'appelant doit donc tout invalider
+        poll_timeout: Attente maximale (secondes) entre deux vérifications de l'arrêt
+        max_backoff: Délai maximal (secondes) entre deux tentatives de reconnexion
+    """
+
+    def __init__(self, connect: Callable, channel: str, on_notify: Callable[[str], None],
+                 on_reconnect: Optional[Callable[[], None]] = None,
+                 poll_timeout: float = 5.0, max_backoff: float = 60.0):
+        self._connect = connect
+        self.channel = channel
+        self._on_notify = on_notify
+        self._on_reconnect = on_reconnect
+        self.poll_timeout = poll_timeout
+        self.max_backoff = max_backoff
+        self._stop = threading.Event()
+        self._thread = None
+        self._conn = None
+
+    def start(self) -> None:
+        """Démarre le thread d'écoute (sans effet s'il tourne déjà)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"listen-{self.channel}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Arrête le thread d'écoute et ferme sa connexion"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _listen(self):
+        conn = self._connect()
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {self.channel}")
+        return conn
+
+    def _run(self) -> None:
+        backoff = 1.0
+        first_connection = True
+        while not self._stop.is_set():
+            try:
+                self._conn = self._listen()
+                logging.info(f"Écoute du canal {self.channel} démarrée")
+                backoff = 1.0
+                if not first_connection and self._on_reconnect:
+                    self._on_reconnect()
+                first_connection = False
+
+                while not self._stop.is_set():
+                    ready, _, _ = select.select([self._conn], [], [], self.poll_timeout)
+                    if not ready:
+                        continue
+                    self._conn.poll()
+                    while self._conn.notifies:
+                        notify = self._conn.notifies.pop(0)
+                        try:
+                            self._on_notify(notify.payload)
+                        except Exception as e:
+                            logging.error(f"Erreur lors du traitement d'une notification : {str(e)}")
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                logging.warning(
+                    f"Écoute du canal {self.channel} interrompue ({str(e)}), "
+                    f"nouvelle tentative dans {backoff:.0f}s"
+                )
+                # Les notifications de la période de coupure sont perdues
+                first_connection = False
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            finally:
+                if self._conn is not None:
+                    try:
+                        self._conn.close()
+                    except Exception:
+                        pass
+                    self._conn = None
@@ -0,0 +1,139 @@
+"""
+Calcul des dates de prochaine publication d'après la fréquence de mise à jour.
+
+Les fréquences sont appliquées en arithmétique calendaire (``pd.DateOffset``) et non
+en nombre fixe de jours : une publication annuelle du 15 mars 2023 est attendue le
+15 mars 2024, une publication mensuelle du 31 janvier le 29 février (années
+bissextiles) puis le 31 mars. Le calcul existe pour une date isolée (formulaire de
+saisie) et pour des colonnes entières (recalcul de tout le catalogue en une passe,
+suivi d'un seul UPDATE).
+"""
+
+import logging
+import time
+from datetime import date
+from typing import Dict, Optional
+
+import pandas as pd
+import psycopg2.extras
+
+from .db_utils import CACHE_GENERATION_BUMP_SQL
+
+# Fréquences reconnues (comparées en minuscules, sans espaces) et décalage calendaire associé
+FREQUENCY_OFFSETS = {
+    'annuelle': pd.DateOffset(years=1),
+    'semestrielle': pd.DateOffset(months=6),
+    'trimestrielle': pd.DateOffset(months=3),
+    'mensuelle': pd.DateOffset(months=1),
+    'quotidienne': pd.DateOffset(days=1),
+}
+# Fréquences exprimées en mois ou en années : une publication en fin de mois
+# est attendue en fin de mois (30 juin + 6 mois = 31 décembre)
+MONTH_BASED_FREQUENCIES = frozenset(['annuelle', 'semestrielle', 'trimestrielle', 'mensuelle'])
+
+
+def normalize_frequency(freq) -> str:
+    """Forme canonique d'une fréquence ('Annuelle ' -> 'annuelle', valeur manquante -> '')"""
+    if freq is None or (not isinstance(freq, str) and pd.isna(freq)):
+        return ''
+    return str(freq).strip().lower()
+
+
+def next_publication_date(date_pub, freq) -> Optional[date]:
+    """
+    Date de la prochaine publication d'après la date de publication et la fréquence.
+
+    Returns:
+        Date calculée, ou None si la date manque ou si la fréquence n'est pas périodique
+    """
+    freq = normalize_frequency(freq)
+    if date_pub is None or pd.isna(date_pub) or freq not in FREQUENCY_OFFSETS:
+        return None
+    current = pd.Timestamp(date_pub)
+    result = current + FREQUENCY_OFFSETS[freq]
+    if freq in MONTH_BASED_FREQUENCIES and current.is_month_end:
+        result = result + pd.offsets.MonthEnd(0)
+    return result.date()
+
+
+def next_publication_dates(dates: pd.Series, frequencies: pd.Series) -> pd.Series:
+    """
+    Version vectorisée de next_publication_date pour des colonnes entières :
+    un décalage par fréquence présente, appliqué à toutes les lignes concernées à la fois.
+
+    Args:
+        dates: Dates de publication
+        frequencies: Fréquences de mise à jour (même index que dates)
+
+    Returns:
+        Série datetime64 (NaT si la date manque ou si la fréquence n'est pas périodique)
+    """
+    dates = pd.to_datetime(dates)
+    frequencies = frequencies.map(normalize_frequency)
+    result = pd.Series(pd.NaT, index=dates.index, dtype='datetime64[ns]')
+    for freq, offset in FREQUENCY_OFFSETS.items():
+        mask = (frequencies == freq) & dates.notna()
+        if not mask.any():
+            continue
+        current = dates[mask]
+        shifted = current + offset
+        if freq in MONTH_BASED_FREQUENCIES:
+            month_end = current.dt.is_month_end
+            shifted = shifted.where(~month_end, shifted + pd.offsets.MonthEnd(0))
+        result[mask] = shifted
+    return result
+
+
+def recompute_next_publications(conn, missing_only: bool = True, dry_run: bool = False) -> Dict:
+    """
+    Recalcule date_prochaine_publication pour tout le catalogue : lecture en une requête,
+    calcul vectorisé, puis un seul UPDATE ... FROM (VALUES ...) pour les lignes modifiées,
+    validé avec l'incrément de la génération des caches (comme save_metadata).
+    Les fiches dont la fréquence n'est pas périodique (ponctuelle, vide) sont laissées telles quelles.
+
+    Args:
+        conn: Connexion psycopg2 (la transaction est validée par cette fonction)
+        missing_only: Ne compléter que les dates absentes (sinon remplacer les dates existantes)
+        dry_run: Calculer sans écrire
+
+    Returns:
+        Dictionnaire {rows, computed, changes (lignes à modifier), updated (lignes modifiées), seconds}
+    """
+    started = time.monotonic()
+    df = pd.read_sql(
+        "SELECT id, date_publication, frequence_maj, date_prochaine_publication "
+        "FROM metadata WHERE date_publication IS NOT NULL",
+        conn
+    )
+    computed = next_publication_dates(df['date_publication'], df['frequence_maj'])
+    current = pd.to_datetime(df['date_prochaine_publication'])
+
+    changed = computed.notna() & (current.isna() | (computed != current))
+    if missing_only:
+        changed &= current.isna()
+    updates = [(int(row_id), value.date())
+               for row_id, value in zip(df.loc[changed, 'id'], computed[changed])]
+
+    if updates and not dry_run:
+        try:
+            with conn.cursor() as cur:
+                psycopg2.extras.execute_values(cur, """
+                    UPDATE metadata AS m
+                    SET date_prochaine_publication = v.date_prochaine_publication
+                    FROM (VALUES %s) AS v (id, date_prochaine_publication)
+                    WHERE m.id = v.id
+                """, updates, template="(%s, %s::date)", page_size=len(updates))
+                # Invalide les caches de toutes les instances, dans la même transaction
+                cur.execute(CACHE_GENERATION_BUMP_SQL)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    else:
+        conn.rollback()
+
+    seconds = time.monotonic() - started
+    logging.info(f"Prochaines publications : {int(computed.notna().sum())} calculées, "
+                 f"{len(updates)} à mettre à jour sur {len(df)} fiches ({seconds:.2f}s)")
+    return {'rows': len(df), 'computed': int(computed.notna().sum()), 'changes': len(updates),
+            'updated': 0 if dry_run else len(updates), 'seconds': seconds}
@@ -0,0 +1,188 @@
+"""
+Génération par lots des scripts SQL d'import de plusieurs tables du catalogue.
+
+Les fiches sont lues en une seule requête, les inférences déjà mémorisées sont
+préchargées en une requête, puis chaque script est généré dans un processus de
+travail (l'inférence des types est purement calculatoire). Les scripts sont écrits
+un par table, ou réunis en une migration unique, dans un répertoire ou une archive zip.
+
+Un fichier CSV local peut être associé à chaque table : ses types sont alors déduits
+du profil de tout le fichier (csv_profiler) et son chemin est écrit dans la commande
+\\copy. La migration unique, exécutée tout ou rien, exige un fichier pour chaque table.
+"""
+
+import csv
+import io
+import logging
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from . import type_memo
+from .db_utils import db_connection
+from .sql_generator import fetch_metadata_rows, dictionary_row_hashes, generate_sql_from_metadata_row
+
+REPORT_FILE_NAME = 'rapport_generation.csv'
+
+
+def _generate_table(metadata: Dict, memo_entries: Optional[Dict] = None, csv_path: Optional[str] = None,
+                    csv_encoding: str = 'utf-8') -> Dict:
+    """
+    Génère le script d'une fiche (exécuté dans un processus de travail).
+
+    Les inférences préchargées sont transmises explicitement : un processus démarré
+    par « spawn » (Windows, macOS) n'hérite pas de la mémoire du processus parent.
+    """
+    started = time.monotonic()
+    type_memo.seed(memo_entries or {})
+    result = {'nom_table': metadata.get('nom_table'), 'schema': metadata.get('schema'),
+              'csv_path': csv_path, 'script': None, 'error': None}
+    try:
+        result['script'] = generate_sql_from_metadata_row(metadata, csv_path=csv_path, csv_encoding=csv_encoding)
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.monotonic() - started
+    # Inférences nouvelles, enregistrées en base par le processus parent
+    result['memo'] = type_memo.take_pending()
+    return result
+
+
+def _resolve_csv_path(nom_table: str, csv_paths: Dict[str, str], csv_dir: Optional[str]) -> Optional[str]:
+    """Fichier CSV d'une table : chemin explicite, sinon <csv_dir>/<nom_table>.csv s'il existe"""
+    if nom_table in csv_paths:
+        return csv_paths[nom_table]
+    if csv_dir:
+        candidate = os.path.join(csv_dir, f"{nom_table}.csv")
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def generate_sql_batch(table_names: Optional[List[str]] = None, schema: Optional[str] = None,
+                       workers: Optional[int] = None, csv_paths: Optional[Dict[str, str]] = None,
+                       csv_dir: Optional[str] = None, csv_encoding: str = 'utf-8') -> Dict:
+    """
+    Génère les scripts SQL d'import de plusieurs tables.
+
+    Args:
+        table_names: Noms des tables (nom_table) à traiter
+        schema: Ou bien : toutes les tables de ce schéma
+        workers: Nombre de processus de travail (défaut : nombre de processeurs ; 1 = sans pool)
+        csv_paths: Fichier CSV local par nom de table (profilage complet et chemin du \\copy)
+        csv_dir: Répertoire où chercher <nom_table>.csv pour les tables sans chemin explicite
+        csv_encoding: Encodage Python des fichiers CSV
+
+    Returns:
+        Dictionnaire {results: [{nom_table, schema, csv_path, script, error, seconds}], fetch_seconds, seconds}
+    """
+    started = time.monotonic()
+    csv_paths = csv_paths or {}
+    with db_connection() as conn:
+        rows = fetch_metadata_rows(conn, table_names=table_names, schema=schema)
+        hashes = [key for row in rows for key in dictionary_row_hashes(row)]
+        preloaded = type_memo.preload(conn, hashes)
+    fetch_seconds = time.monotonic() - started
+    logging.info(f"{len(rows)} fiches lues et {preloaded} inférences préchargées en {fetch_seconds:.2f}s")
+
+    results = []
+    found = {row['nom_table'] for row in rows}
+    for name in table_names or []:
+        if name not in found:
+            results.append({'nom_table': name, 'schema': None, 'csv_path': csv_paths.get(name),
+                            'script': None, 'seconds': 0.0,
+                            'error': "Table non trouvée dans la base de métadonnées"})
+
+    tasks = [(row, type_memo.known(dictionary_row_hashes(row)),
+              _resolve_csv_path(row['nom_table'], csv_paths, csv_dir), csv_encoding)
+             for row in rows]
+    workers = min(workers or os.cpu_count() or 1, len(rows)) or 1
+    if workers == 1:
+        for task in tasks:
+            result = _generate_table(*task)
+            type_memo.merge(result.pop('memo'))
+            results.append(result)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_generate_table, *task) for task in tasks]
+            for future in as_completed(futures):
+                result = future.result()
+                type_memo.merge(result.pop('memo'))
+                results.append(result)
+
+    with db_connection() as conn:
+        type_memo.flush(conn)
+
+    results.sort(key=lambda result: result['nom_table'] or '')
+    return {'results': results, 'fetch_seconds': fetch_seconds, 'seconds': time.monotonic() - started}
+
+
+def combine_scripts(results: List[Dict], label: str = 'catalogue') -> str:
+    """
+    Réunit les scripts générés en une migration unique exécutée dans une transaction
+    (création des tables et chargement des données, tout ou rien).
+
+    Raises:
+        ValueError: si une table n'a pas de fichier CSV : son \\copy désignerait un
+            chemin à compléter et ferait échouer toute la migration
+    """
+    generated = [result for result in results if result['script']]
+    missing = [result['nom_table'] for result in generated if not result.get('csv_path')]
+    if missing:
+        raise ValueError(
+            f"Migration unique impossible sans fichier CSV pour chaque table "
+            f"(manquant : {', '.join(missing)})"
+        )
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    parts = [
+        "-- =====================================================================================\n"
+        f"-- MIGRATION D'IMPORT : {label} ({len(generated)} tables)\n"
+        f"-- Généré le {current_time}\n"
+        "-- Exécution : psql -f <fichier> (tout ou rien : une seule transaction)\n"
+        "-- =====================================================================================\n"
+        "\\set ON_ERROR_STOP on\n"
+        "BEGIN;\n"
+    ]
+    for result in generated:
+        parts.append(f"\n-- >>> {result['schema']}.{result['nom_table']}\n{result['script']}")
+    parts.append("\nCOMMIT;\n")
+    return '\n'.join(parts)
+
+
+def _report_csv(results: List[Dict]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    writer.writerow(['nom_table', 'schema', 'fichier_csv', 'secondes', 'statut', 'erreur'])
+    for result in results:
+        writer.writerow([result['nom_table'], result['schema'] or '', result.get('csv_path') or '',
+                         f"{result['seconds']:.3f}", 'erreur' if result['error'] else 'ok', result['error'] or ''])
+    return buffer.getvalue()
+
+
+def write_batch(results: List[Dict], output: str, combined: bool = False, label: str = 'catalogue') -> List[str]:
+    """
+    Écrit les scripts générés dans un répertoire, ou dans une archive si output se termine par .zip.
+    Un rapport (fichier, durée et statut par table) est joint aux scripts.
+    En mode combined, ValueError si une table n'a pas de fichier CSV (voir combine_scripts).
+
+    Returns:
+        Noms des fichiers écrits (relatifs au répertoire ou à l'archive)
+    """
+    if combined:
+        files = {f"migration_{label}.sql": combine_scripts(results, label)}
+    else:
+        files = {f"import_{result['nom_table']}.sql": result['script'] for result in results if result['script']}
+    files[REPORT_FILE_NAME] = _report_csv(results)
+
+    if output.lower().endswith('.zip'):
+        with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for name, content in files.items():
+                archive.writestr(name, content)
+    else:
+        os.makedirs(output, exist_ok=True)
+        for name, content in files.items():
+            with open(os.path.join(output, name), 'w', encoding='utf-8') as f:
+                f.write(content)
+    return list(files)
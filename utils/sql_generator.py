@@ -11,8 +11,19 @@ import io
 import csv
 from datetime import datetime
 from typing import List, Optional, Tuple, Dict
-from .db_utils import get_db_connection
+from .db_utils import db_connection
+from .csv_profiler import ColumnProfile, profile_csv, NUMERIC_FR_RE, NUMERIC_EN_RE, INSEE_MASKING_PATTERNS
+from .bulk_loader import PG_ENCODINGS
+from .type_rules import (
+    TYPE_MAPPINGS, VARCHAR_SIZE_RE, DECIMAL_SIZE_RE, DECLARED_TYPE_RULES,
+    DICTIONARY_CODES_KEY_RE, DICTIONARY_TYPE_KEY_RE, DICTIONARY_TYPE_VALUE_RULES,
+    NUMERIC_CODE_RE, ALPHANUMERIC_CODE_RE, TEXT_LENGTH_RE,
+    DESCRIPTION_RULES, COLUMN_NAME_RULES, GEO_PROTECTION_RULES
+)
+from . import type_memo
+from .type_memo import memoize_inference, normalize_dictionary_row, normalize_description
 import textwrap
+import psycopg2.extras
 
 
 def normalize_data_type(raw_type: str) -> str:
@@ -30,133 +41,42 @@ def normalize_data_type(raw_type: str) -> str:
     
     type_clean = str(raw_type).strip().lower()
     
-    # Mapping des types courants vers SQL
-    type_mappings = {
-        # Types texte
-        'text': 'TEXT',
-        'string': 'VARCHAR(255)',
-        'str': 'VARCHAR(255)', 
-        'char': 'VARCHAR(255)',
-        'character': 'VARCHAR(255)',
-        'varchar': 'VARCHAR(255)',
-        'texte': 'TEXT',
-        'chaîne': 'VARCHAR(255)',
-        'chaine': 'VARCHAR(255)',
-        
-        # Types numériques entiers
-        'int': 'INTEGER',
-        'integer': 'INTEGER',
-        'entier': 'INTEGER',
-        'number': 'INTEGER',
-        'numeric': 'INTEGER',
-        'num': 'INTEGER',
-        'bigint': 'BIGINT',
-        'smallint': 'SMALLINT',
-        
-        # Types numériques décimaux
-        'float': 'DECIMAL(15,6)',
-        'decimal': 'DECIMAL(15,6)',
-        'double': 'DECIMAL(15,6)',
-        'real': 'DECIMAL(15,6)',
-        'décimal': 'DECIMAL(15,6)',
-        'flottant': 'DECIMAL(15,6)',
-        
-        # Types date/temps
-        'date': 'DATE',
-        'datetime': 'TIMESTAMP',
-        'timestamp': 'TIMESTAMP',
-        'time': 'TIME',
-        # CORRECTION : Retirer 'temps' générique pour éviter "temps partiel" → DATE
-        # 'temps': 'TIMESTAMP',  # Trop générique, commenté
-        
-        # Types booléens
-        'boolean': 'BOOLEAN',
-        'bool': 'BOOLEAN',
-        'booléen': 'BOOLEAN',
-        'vrai/faux': 'BOOLEAN',
-        'oui/non': 'BOOLEAN',
-        
-        # Types binaires/blob
-        'blob': 'BYTEA',
-        'binary': 'BYTEA',
-        'binaire': 'BYTEA'
-    }
-    
     # Recherche directe
-    if type_clean in type_mappings:
-        return type_mappings[type_clean]
+    if type_clean in TYPE_MAPPINGS:
+        return TYPE_MAPPINGS[type_clean]
     
     # Recherche avec VARCHAR(n)
-    varchar_match = re.match(r'varchar\s*\(\s*(\d+)\s*\)', type_clean)
+    varchar_match = VARCHAR_SIZE_RE.match(type_clean)
     if varchar_match:
         size = int(varchar_match.group(1))
         return f'VARCHAR({size})'
     
     # Recherche avec DECIMAL(n,m)
-    decimal_match = re.match(r'decimal\s*\(\s*(\d+)\s*,\s*(\d+)\s*\)', type_clean)
+    decimal_match = DECIMAL_SIZE_RE.match(type_clean)
     if decimal_match:
         precision = int(decimal_match.group(1))
         scale = int(decimal_match.group(2))
         return f'DECIMAL({precision},{scale})'
     
-    # Types contenant certains mots-clés (patterns PRÉCIS pour éviter les faux positifs)
-    if any(keyword in type_clean for keyword in ['text', 'texte', 'long']):
-        return 'TEXT'
-    elif any(keyword in type_clean for keyword in ['int', 'entier', 'number']):
-        return 'INTEGER'
-    elif any(keyword in type_clean for keyword in ['float', 'decimal', 'double']):
-        return 'DECIMAL(15,6)'
-    elif any(keyword in type_clean for keyword in ['date', 'datetime', 'timestamp']):
-        # CORRECTION : Retirer 'temps' générique qui capture "temps partiel"
-        # Être plus spécifique pour éviter les faux positifs
-        return 'DATE'
-    elif any(keyword in type_clean for keyword in ['bool', 'vrai', 'faux']):
-        return 'BOOLEAN'
-    
-    return None
+    # Types contenant certains mots-clés (voir DECLARED_TYPE_RULES)
+    return DECLARED_TYPE_RULES.sql_type(type_clean)
 
 
+@memoize_inference('dictionnaire', normalize_dictionary_row)
 def _detect_column_type_from_dictionary(dict_info: Dict) -> Optional[str]:
     """
     Analyse intelligente du dictionnaire pour détecter le type de données.
     Recherche des patterns dans toutes les colonnes du dictionnaire.
     """
-    # Patterns pour la détection des types
-    type_patterns = {
-        'codes': [
-            r'code[s]?\s*(?:possible|autorisé|valide|détaillé)',
-            r'modalité[s]?\s*(?:possible|autorisée)',
-            r'correspondance[s]?[\s_](?:code|valeur)',
-            r'valeur[s]?\s*(?:possible|autorisée)',
-            r'liste\s*(?:des\s*)?(?:code|valeur)',
-            r'nomenclature',
-            r'codification',
-        ],
-        'text_type': [
-            r'type[s]?[\s_](?:donnée|variable|champ)',
-            r'format[\s_](?:donnée|variable|champ)',
-            r'nature[\s_](?:donnée|variable|champ)',
-            r'caractéristique[\s_](?:donnée|variable)',
-            r'description[\s_]type',
-        ]
-    }
-
-    # Fonction pour détecter les patterns dans une chaîne
-    def has_pattern(text: str, patterns: List[str]) -> bool:
-        if not isinstance(text, str):
-            return False
-        text = text.lower()
-        return any(re.search(pattern.lower(), text) for pattern in patterns)
-
     # Parcourir toutes les clés du dictionnaire
     for key, value in dict_info.items():
         key_lower = key.lower()
 
         # 1. Recherche de colonnes contenant des codes/modalités
-        if has_pattern(key_lower, type_patterns['codes']):
+        if DICTIONARY_CODES_KEY_RE.search(key_lower):
             if isinstance(value, str):
                 # Extraction des codes numériques (en gérant les négatifs)
-                numeric_codes = re.findall(r'[-]?\d+', value)
+                numeric_codes = NUMERIC_CODE_RE.findall(value)
                 if numeric_codes:
                     # Si tous les codes sont numériques
                     if all(c.strip('-').isdigit() for c in numeric_codes):
@@ -166,36 +86,31 @@ def _detect_column_type_from_dictionary(dict_info: Dict) -> Optional[str]:
                         return 'INTEGER'
                     
                 # Si les codes sont alphanumériques, déterminer la longueur max
-                all_codes = re.findall(r'[A-Za-z0-9]+', value)
+                all_codes = ALPHANUMERIC_CODE_RE.findall(value)
                 if all_codes:
                     max_length = max(len(code) for code in all_codes)
                     return f'VARCHAR({max(max_length * 2, 20)})'  # Marge de sécurité
 
         # 2. Recherche de colonnes décrivant le type
-        if has_pattern(key_lower, type_patterns['text_type']):
+        if DICTIONARY_TYPE_KEY_RE.search(key_lower):
             if isinstance(value, str):
                 value_lower = value.lower()
                 
                 # Détection du type à partir de la description
-                if any(x in value_lower for x in ['entier', 'integer', 'nombre entier']):
-                    return 'INTEGER'
-                elif any(x in value_lower for x in ['decimal', 'réel', 'float', 'nombre décimal']):
-                    return 'DECIMAL(10,3)'
-                elif any(x in value_lower for x in ['booléen', 'boolean', 'vrai/faux', 'oui/non']):
-                    return 'BOOLEAN'
-                elif any(x in value_lower for x in ['date', 'datetime']):
-                    return 'DATE'
-                elif 'texte' in value_lower or 'caractère' in value_lower:
-                    # Recherche d'une longueur spécifiée
-                    length_match = re.search(r'(\d+)[\s]*(?:caractère|char)', value_lower)
-                    if length_match:
-                        return f'VARCHAR({length_match.group(1)})'
-                    return 'VARCHAR(255)'
+                found = DICTIONARY_TYPE_VALUE_RULES.match(value_lower)
+                if found:
+                    if found.rule.name == 'texte':
+                        # Recherche d'une longueur spécifiée
+                        length_match = TEXT_LENGTH_RE.search(value_lower)
+                        if length_match:
+                            return f'VARCHAR({length_match.group(1)})'
+                    return found.rule.sql_type
 
     return None
 
 
-def detect_column_type(clean_values: list, csv_separator: str = ';', column_name: str = '', dict_info: Dict = None) -> str:
+def detect_column_type(clean_values: list, csv_separator: str = ';', column_name: str = '', dict_info: Dict = None,
+                       profile: Optional[ColumnProfile] = None) -> str:
     """
     Détection universelle et intelligente du type SQL pour une colonne.
     Basée sur l'analyse des données, du nom de colonne et du dictionnaire.
@@ -205,11 +120,16 @@ def detect_column_type(clean_values: list, csv_separator: str = ';', column_name
         csv_separator: Séparateur CSV utilisé (';' ou ',')
         column_name: Nom de la colonne pour une meilleure détection
         dict_info: Informations du dictionnaire pour cette colonne
+        profile: Profil du fichier complet (voir csv_profiler) ; remplace alors
+            l'analyse des valeurs d'exemple
     
     Returns:
         Type SQL approprié avec marges de sécurité
     """
-    if not clean_values:
+    if profile is not None:
+        if profile.non_null_count == 0:
+            return 'VARCHAR(255)'
+    elif not clean_values:
         return 'VARCHAR(255)'
     
     # 1. Vérification du dictionnaire si disponible
@@ -246,78 +166,100 @@ def detect_column_type(clean_values: list, csv_separator: str = ';', column_name
         return 'DECIMAL(5,2)'
     
     # 3. Analyse des valeurs avec gestion du masquage INSEE
-    max_len = max(len(str(v)) for v in clean_values)
-    
-    # Détection du masquage INSEE
-    insee_masking_patterns = ['ZZZZZZ', 'ZZZZZ', 'ZZZZ', 'ZZZ', 'XX', 'XXX', 'XXXX', 's', 'SECRET']
-    has_insee_masking = any(
-        str(val).strip().upper() in insee_masking_patterns 
-        for val in clean_values
-    )
-    
-    if has_insee_masking:
-        if max_len <= 10:
-            return 'VARCHAR(50)'
-        elif max_len <= 25:
-            return 'VARCHAR(200)'   
-        else:
-            return 'TEXT'
-    
-    # Test numérique strict
-    all_numeric = True
-    has_decimals = False
-    
-    for val in clean_values:
-        val_str = str(val).strip()
-        
-        # Gestion selon le séparateur décimal
-        if csv_separator == ';':
-            # Format français
-            if not re.match(r'^-?\d+(,\d*)?$', val_str.replace(' ', '')):
-                all_numeric = False
-                break
-            if ',' in val_str:
-                has_decimals = True
-        else:
-            # Format anglais
-            if not re.match(r'^-?\d+(\.\d*)?$', val_str.replace(' ', '')):
-                all_numeric = False
-                break
-            if '.' in val_str:
-                has_decimals = True
-    
-    # Décision finale avec marges de sécurité
-    if all_numeric:
-        if has_decimals:
-            return 'DECIMAL(15,6)'
-        else:
-            # Test pour les petits entiers
-            try:
-                max_val = max(abs(int(str(v).replace(' ', ''))) for v in clean_values)
-                if max_val < 32768:
-                    return 'SMALLINT'
-                elif max_val < 2147483648:
-                    return 'INTEGER'
-                else:
-                    return 'BIGINT'
-            except:
-                return 'INTEGER'
+    if profile is not None:
+        return _detect_column_type_from_profile(profile, csv_separator)
+
+    # Analyse vectorisée : chaque prédicat est évalué sur toute la colonne en une fois
+    values = pd.Series(clean_values, dtype=object).map(str)
+    max_len = int(values.str.len().max())
+    stripped = values.str.strip()
+    compact = stripped.str.replace(' ', '', regex=False)
+    
+    # Entiers (cas le plus fréquent) : test rapide sans expression régulière,
+    # équivalent à ^-?\d+$ ; aucun marqueur de masquage ne peut être un entier
+    is_integer = compact.str.removeprefix('-').str.isdecimal()
+    if is_integer.all():
+        try:
+            return _integer_type(_max_abs_integer(compact))
+        except:
+            return 'INTEGER'
+    
+    # Test numérique strict des autres valeurs (format français si séparateur ';', anglais sinon)
+    numeric_re = NUMERIC_FR_RE if csv_separator == ';' else NUMERIC_EN_RE
+    others = compact[~is_integer]
+    non_numeric = others[~others.str.match(numeric_re)]
+    
+    # Détection du masquage INSEE (parmi les valeurs non numériques uniquement)
+    if stripped[non_numeric.index].str.upper().isin(INSEE_MASKING_PATTERNS).any():
+        return _masked_type(max_len)
+    
+    # Décision finale avec marges de sécurité : les valeurs numériques non entières
+    # portent toutes la marque décimale
+    if non_numeric.empty:
+        return 'DECIMAL(15,6)'
+    return _varchar_type(max_len)
+
+
+def _max_abs_integer(values: pd.Series) -> int:
+    """Plus grande valeur absolue d'une colonne d'entiers texte (conversion vectorisée si possible)"""
+    try:
+        numbers = values.astype('int64')
+        return max(abs(int(numbers.min())), abs(int(numbers.max())))
+    except (ValueError, OverflowError):
+        # Entiers hors de la plage 64 bits : conversion exacte valeur par valeur
+        return max(abs(int(v)) for v in values)
+
+
+def _masked_type(max_len: int) -> str:
+    """Type d'une colonne contenant des valeurs masquées (secret statistique)"""
+    if max_len <= 10:
+        return 'VARCHAR(50)'
+    elif max_len <= 25:
+        return 'VARCHAR(200)'
     else:
-        # VARCHAR avec marges de sécurité
-        if max_len <= 5:
-            return 'VARCHAR(40)'
-        elif max_len <= 10:
-            return 'VARCHAR(80)'
-        elif max_len <= 25:
-            return 'VARCHAR(200)'
-        elif max_len <= 50:
-            return 'VARCHAR(400)'
-        elif max_len <= 100:
-            return 'VARCHAR(800)'
-        else:
-            return 'TEXT'
+        return 'TEXT'
+
+
+def _integer_type(max_val: int) -> str:
+    if max_val < 32768:
+        return 'SMALLINT'
+    elif max_val < 2147483648:
+        return 'INTEGER'
+    else:
+        return 'BIGINT'
+
+
+def _varchar_type(max_len: int) -> str:
+    """VARCHAR avec marges de sécurité"""
+    if max_len <= 5:
+        return 'VARCHAR(40)'
+    elif max_len <= 10:
+        return 'VARCHAR(80)'
+    elif max_len <= 25:
+        return 'VARCHAR(200)'
+    elif max_len <= 50:
+        return 'VARCHAR(400)'
+    elif max_len <= 100:
+        return 'VARCHAR(800)'
+    else:
+        return 'TEXT'
+
+
+def _detect_column_type_from_profile(profile: ColumnProfile, csv_separator: str = ';') -> str:
+    """
+    Mêmes règles que l'analyse des valeurs de detect_column_type, appliquées aux
+    statistiques du fichier complet. Les valeurs vides sont ignorées (chargées en NULL).
+    """
+    if profile.masked_count:
+        return _masked_type(profile.max_len)
+    if profile.all_numeric(csv_separator):
+        if profile.has_decimals(csv_separator):
+            return 'DECIMAL(15,6)'
+        return _integer_type(profile.max_abs_int)
+    return _varchar_type(profile.max_len)
 
 
+@memoize_inference('description', normalize_description)
 def detect_type_from_description(description: str) -> str:
     """
     Détection universelle du type SQL basée sur l'analyse sémantique des descriptions.
@@ -334,55 +276,9 @@ def detect_type_from_description(description: str) -> str:
         
     desc_lower = description.lower()
     
-    # RÈGLE 1 PRIORITAIRE: Comptages → INTEGER (plus spécifique, doit venir AVANT les codes)
-    counting_keywords = [
-        'nombre de', "nombre d'", 'count', 'total', 'effectif', 'population', 
-        'nb de', 'quantité', 'quantite', 'effectifs'
-    ]
-    if any(keyword in desc_lower for keyword in counting_keywords):
-        return 'INTEGER'
-    
-    # RÈGLE 2: Taux/Pourcentages/Ratios → DECIMAL (avant les codes aussi)
-    ratio_keywords = [
-        'taux', 'pourcentage', 'ratio', 'rate', 'part de', 'proportion',
-        'indice', 'moyenne', 'median', 'percentile'
-    ]
-    if any(keyword in desc_lower for keyword in ratio_keywords):
-        return 'DECIMAL(15,6)'
-    
-    # RÈGLE 3: Codes/Identifiants → VARCHAR (protection universelle anti-ZZZZZZ)
-    # Attention : exclure "aide"/"aidé" qui ne sont pas des codes mais des catégories
-    code_keywords = [
-        'code', 'codes', 'identifiant', 'identifier', 'numéro', 'numero', 
-        'référence', 'reference', 'clé', 'cle', 'key', 'id', 'siren', 'siret'
-    ]
-    # Vérification plus stricte : ne pas confondre "aide" avec "code"
-    if any(keyword in desc_lower for keyword in code_keywords):
-        # Exclure les faux positifs comme "emplois aidés", "aides familiaux"
-        false_positives = ['emplois aidés', 'aides familiaux', 'emploi aidé', 'aide familial']
-        if not any(fp in desc_lower for fp in false_positives):
-            return 'VARCHAR(50)'
-    
-    # RÈGLE 4: Libellés/Noms → différentes tailles selon le type
-    
-    # RÈGLE 4a: Libellés géographiques spécifiques → VARCHAR(200)
-    geo_label_keywords = [
-        'libellé de la commune', 'libellé commune', 'libellé de l\'iris', 'libellé iris',
-        'label de l\'iris', 'label iris',  # Ajout pour LAB_IRIS
-        'libcom', 'libiris', 'lab_iris'
-    ]
-    if any(keyword in desc_lower for keyword in geo_label_keywords):
-        return 'VARCHAR(200)'  # Pour les libellés géographiques (peuvent être longs)
-    
-    # RÈGLE 4b: Autres libellés → VARCHAR(255)
-    text_keywords = [
-        'libellé', 'libelle', 'nom de', 'intitulé', 'intitule', 
-        'designation', 'désignation', 'appellation'
-    ]
-    if any(keyword in desc_lower for keyword in text_keywords):
-        return 'VARCHAR(255)'  # Pour les libellés courts/moyens standards
-    
-    return None  # Aucune détection sémantique claire
+    # Règles par priorité (voir DESCRIPTION_RULES) : comptages → INTEGER, taux → DECIMAL,
+    # codes → VARCHAR(50) sauf faux positifs ("emplois aidés"), libellés → VARCHAR
+    return DESCRIPTION_RULES.sql_type(desc_lower)
 
 
 def detect_column_type_with_column_name(clean_values: list, csv_separator: str, column_name: str) -> str:
@@ -400,36 +296,11 @@ def detect_column_type_with_column_name(clean_values: list, csv_separator: str,
     """
     col_lower = column_name.lower()
     
-    # RÈGLE PRIORITAIRE NOUVELLE : Libellés géographiques → VARCHAR(200)
-    label_patterns = [
-        r'^libcom$', r'^libiris$', r'^lab_iris$'  # Vrais libellés descriptifs
-    ]
-    
-    # Si le nom de colonne matche un pattern de libellé → VARCHAR(200)
-    if any(re.search(pattern, col_lower) for pattern in label_patterns):
-        return 'VARCHAR(200)'
-    
-    # RÈGLE UNIVERSELLE 1 : Détection PRÉCISE des identifiants et codes
-    # Utilisation de regex pour des patterns exacts et éviter les faux positifs
-    identifier_patterns = [
-        # Codes explicites (patterns exacts ou délimités)
-        r'^code$', r'^cod$', r'^id$', r'_id$', r'^id_', r'_code$', r'^code_',
-        r'^identifier$', r'^identifiant$',
-        # Codes géographiques INSEE (patterns précis uniquement)
-        r'^iris$', r'^triris$', r'^codgeo$', r'^geocode$', 
-        r'^commune$', r'^com$', r'^dep$', r'^reg$', r'^uu\d*$',
-        # Codes d'entreprises (patterns précis)
-        r'^siren$', r'^siret$', r'^nic$', r'^ape$', r'^naf$', r'^tva$',
-        # Autres identifiants (patterns délimités)
-        r'^reference$', r'^ref$', r'^numero$', r'^num$', r'^matricule$', 
-        r'^cle$', r'^key$', r'_ref$', r'_key$',
-        # Indicateurs techniques géographiques (SANS les vrais libellés)
-        r'^typ_iris$', r'^modif_iris$',
-    ]
-    
-    # Si le nom de colonne matche un pattern d'identifiant PRÉCIS → VARCHAR(50)
-    if any(re.search(pattern, col_lower) for pattern in identifier_patterns):
-        return 'VARCHAR(50)'
+    # RÈGLES PRIORITAIRES : libellés géographiques → VARCHAR(200),
+    # identifiants et codes (patterns PRÉCIS) → VARCHAR(50)
+    name_type = COLUMN_NAME_RULES.sql_type(col_lower)
+    if name_type:
+        return name_type
     
     # RÈGLE UNIVERSELLE 2 : Listes de codes → VARCHAR(200) minimum
     if (col_lower.startswith('codes_') or 
@@ -476,19 +347,10 @@ def detect_column_type_intelligent_universal(clean_values: list, csv_separator:
     # Ces colonnes DOIVENT être VARCHAR même si les données semblent numériques (protection anti-ZZZZZZ)
     col_lower = column_name.lower()
     
-    # Protection spéciale pour les libellés géographiques → VARCHAR(200)
-    geo_label_patterns = [r'^libcom$', r'^libiris$', r'^lab_iris$']
-    if any(re.search(pattern, col_lower) for pattern in geo_label_patterns):
-        return 'VARCHAR(200)'  # Protection absolue pour les libellés géographiques
-    
-    # Protection pour les identifiants techniques → VARCHAR(50)
-    geographic_critical_patterns = [
-        r'^iris$', r'^triris$', r'^codgeo$', r'^geocode$', 
-        r'^commune$', r'^com$', r'^dep$', r'^reg$', r'^uu\d*$',
-        r'^typ_iris$', r'^modif_iris$'  # Seulement les identifiants techniques
-    ]
-    if any(re.search(pattern, col_lower) for pattern in geographic_critical_patterns):
-        return 'VARCHAR(50)'  # Protection absolue pour les codes seulement
+    # Libellés géographiques → VARCHAR(200), identifiants techniques → VARCHAR(50)
+    protected_type = GEO_PROTECTION_RULES.sql_type(col_lower)
+    if protected_type:
+        return protected_type
     
     # PRIORITÉ 1 : Type explicite dans le dictionnaire des variables
     if dict_row and len(dict_row) > 0:
@@ -537,11 +399,74 @@ def parse_csv_line(line: str, separator: str) -> list:
         return line.split(separator)
 
 
+# Marqueurs de valeur absente ou secrète (secret statistique INSEE, codes non renseignés)
+NULL_MARKERS = ('', 's', 'S', 'nd', 'ND', 'nc', 'NC', 'NA', 'ZZZZZ', 'ZZZZZZZZZ')
+CODE_NULL_MARKERS = ('', 'ZZZZZ', 'ZZZZZZZZZ')
+
+# Colonnes de codes indexées après le chargement (codes géographiques et d'entreprises)
+INDEXED_CODE_PATTERNS = [
+    r'^codgeo$', r'^code_insee$', r'^insee$', r'^geocode$', r'^iris$', r'^triris$',
+    r'^commune$', r'^com$', r'^depcom$', r'^dep$', r'^reg$', r'^epci$', r'^uu\d*$',
+    r'^code_(com|commune|dep|reg|epci|iris)$', r'^siren$', r'^siret$',
+]
+
+NUMERIC_TYPE_PREFIXES = ('SMALLINT', 'INTEGER', 'BIGINT', 'DECIMAL', 'NUMERIC', 'REAL', 'DOUBLE', 'FLOAT')
+TEXT_TYPE_PREFIXES = ('VARCHAR', 'CHAR', 'TEXT')
+
+
+def _sql_literal_list(values) -> str:
+    return ', '.join("'" + value.replace("'", "''") + "'" for value in values)
+
+
+INDEXED_CODE_RE = re.compile('|'.join(INDEXED_CODE_PATTERNS))
+
+
+def _is_code_column(column_name: str) -> bool:
+    return INDEXED_CODE_RE.search(column_name.lower()) is not None
+
+
+def _conversion_expression(column_name: str, sql_type: str, separator: str = ';') -> str:
+    """
+    Expression SQL convertissant la colonne texte de la table de transit vers son type final :
+    marqueurs de secret/absence remplacés par NULL, espaces de milliers et séparateur décimal
+    gérés pour les numériques (virgule décimale si le séparateur est ';', virgule de milliers
+    sinon), dates françaises (JJ/MM/AAAA) ou ISO. Les colonnes texte ne sont pas converties
+    explicitement : l'affectation à VARCHAR(n) échoue sur une valeur trop longue au lieu de la tronquer.
+    """
+    col = f'btrim("{column_name}")'
+    type_upper = sql_type.upper()
+    if type_upper.startswith(NUMERIC_TYPE_PREFIXES):
+        # ';' : format français (1 234,5) ; sinon format anglais (1,234.5)
+        comma = "'.'" if separator == ';' else "''"
+        return (f"CASE WHEN {col} IN ({_sql_literal_list(NULL_MARKERS)}) THEN NULL "
+                f"ELSE replace(replace(replace({col}, ' ', ''), chr(160), ''), ',', {comma})::{sql_type} END")
+    if type_upper == 'DATE':
+        return (f"CASE WHEN {col} IN ({_sql_literal_list(NULL_MARKERS)}) THEN NULL "
+                f"WHEN {col} ~ '^\\d{{2}}/\\d{{2}}/\\d{{4}}$' THEN to_date({col}, 'DD/MM/YYYY') "
+                f"ELSE {col}::DATE END")
+    if type_upper == 'BOOLEAN':
+        return f"CASE WHEN {col} IN ({_sql_literal_list(NULL_MARKERS)}) THEN NULL ELSE {col}::BOOLEAN END"
+    # Codes : seuls les codes de remplissage sont absents ('NC', 'NA'... peuvent être des codes réels)
+    markers = CODE_NULL_MARKERS if _is_code_column(column_name) else NULL_MARKERS
+    value = col if type_upper.startswith(TEXT_TYPE_PREFIXES) else f"{col}::{sql_type}"
+    return f"CASE WHEN {col} IN ({_sql_literal_list(markers)}) THEN NULL ELSE {value} END"
+
+
 def generate_sql_script(table_name: str, schema: str, columns: List[Dict], description: str = "", 
                    producteur: str = "", type_donnees: str = "", millesime: str = "",
-                   derniere_maj: str = "", frequence_maj: str = "") -> str:
+                   derniere_maj: str = "", frequence_maj: str = "", separator: str = ';',
+                   encoding: str = 'UTF8', csv_path: str = "", index_columns: List[str] = None) -> str:
     """
-    Génère un script SQL pour créer une table avec les colonnes spécifiées.
+    Génère un script SQL complet d'import pour la table avec les colonnes spécifiées :
+    table de transit UNLOGGED en texte, chargement \\copy, conversion typée vers la
+    table finale (marqueurs de secret, virgule décimale, dates), passage en LOGGED,
+    création différée des index sur les colonnes de codes puis ANALYZE.
+
+    Args:
+        separator: Séparateur du fichier CSV
+        encoding: Encodage du fichier (nom PostgreSQL : UTF8, LATIN1, WIN1252...)
+        csv_path: Chemin du fichier à charger (emplacement à compléter s'il est vide)
+        index_columns: Colonnes à indexer (par défaut : colonnes de codes détectées)
     """
     # Formatage de la description en lignes de 80 caractères max, chacune précédée de --
     wrapped_description = []
@@ -570,14 +495,36 @@ def generate_sql_script(table_name: str, schema: str, columns: List[Dict], descr
 -- Fréquence de mise à jour: {frequence_maj}
 -- Généré le {current_time}
 -- =====================================================================================
+-- Exécution : psql -v ON_ERROR_STOP=1 -f import_{table_name}.sql
+-- (la commande \\copy est propre à psql ; ailleurs, utiliser COPY ... FROM STDIN)
+-- =====================================================================================
 
 """
+    target = f'"{schema}"."{table_name}"'
+    staging = f'"{schema}"."{table_name}__import"'
+
+    # 1. Table de transit : colonnes texte, non journalisée (chargement sans écriture WAL)
+    staging_table = (
+        f'-- 1. Table de transit non journalisée, toutes colonnes en texte\n'
+        f'DROP TABLE IF EXISTS {staging};\n'
+        f'CREATE UNLOGGED TABLE {staging} (\n'
+        + ',\n'.join(f'    "{col["name"]}" TEXT' for col in columns)
+        + '\n);\n\n'
+    )
 
-    # Suppression de la table
-    drop_table = f'-- Suppression de la table existante (si elle existe)\nDROP TABLE IF EXISTS "{schema}"."{table_name}";\n\n'
+    # 2. Chargement du fichier (une seule ligne : contrainte de psql)
+    delimiter = separator.replace("'", "''")
+    path = (csv_path or 'chemin/vers/le/fichier.csv').replace("'", "''")
+    column_list = ', '.join(f'"{col["name"]}"' for col in columns)
+    copy_command = (
+        f'-- 2. Chargement du fichier (remplacer le chemin si nécessaire)\n'
+        f"\\copy {staging} ({column_list}) FROM '{path}' "
+        f"WITH (FORMAT csv, HEADER true, DELIMITER '{delimiter}', QUOTE '\"', ENCODING '{encoding}')\n\n"
+    )
 
-    # Création de la table
-    create_table = f'-- Création de la table avec types optimisés\nCREATE TABLE "{schema}"."{table_name}" (\n'
+    # 3. Table finale typée, remplie en une seule instruction depuis la table de transit
+    drop_table = f'-- 3. Table finale : suppression de la table existante (si elle existe)\nDROP TABLE IF EXISTS {target};\n\n'
+    create_table = f'-- Création de la table avec types optimisés (non journalisée pendant le remplissage)\nCREATE UNLOGGED TABLE {target} (\n'
     
     # Ajout des colonnes
     columns_sql = []
@@ -587,123 +534,228 @@ def generate_sql_script(table_name: str, schema: str, columns: List[Dict], descr
         columns_sql.append(f'    "{col_name}" {col_type}')
     
     create_table += ',\n'.join(columns_sql)
-    create_table += '\n);\n'
+    create_table += '\n);\n\n'
+
+    insert_select = (
+        f'-- Conversion : marqueurs de secret (s, ZZZZZ...) en NULL, virgule décimale, dates\n'
+        f'INSERT INTO {target} ({column_list})\nSELECT\n'
+        + ',\n'.join(f'    {_conversion_expression(col["name"], col["type"], separator)}' for col in columns)
+        + f'\nFROM {staging};\n\n'
+    )
+
+    finalize = (
+        f'-- 4. Journalisation de la table finale et suppression de la table de transit\n'
+        f'ALTER TABLE {target} SET LOGGED;\n'
+        f'DROP TABLE {staging};\n\n'
+    )
+
+    # 5. Index créés après le chargement (un tri unique au lieu d'une mise à jour par ligne)
+    if index_columns is None:
+        index_columns = [col['name'] for col in columns if _is_code_column(col['name'])]
+    indexes = '-- 5. Index différés sur les colonnes de codes, puis statistiques\n'
+    for col_name in index_columns:
+        indexes += f'CREATE INDEX ON {target} ("{col_name}");\n'
+    indexes += f'ANALYZE {target};\n'
 
     # Assemblage du script final
-    sql_script = header + drop_table + create_table
+    sql_script = (header + staging_table + copy_command + drop_table + create_table
+                  + insert_select + finalize + indexes)
     
     return sql_script
 
 
-def generate_sql_from_metadata(table_name: str, debug_mode: bool = False) -> str:
+METADATA_BATCH_QUERY = """
+    SELECT DISTINCT ON (nom_table) *
+    FROM metadata
+    WHERE {condition}
+    ORDER BY nom_table, id DESC
+"""
+
+
+def fetch_metadata_rows(conn, table_names: Optional[List[str]] = None, schema: Optional[str] = None) -> List[Dict]:
     """
-    Génère une requête SQL d'import complète basée sur les métadonnées stockées.
-    Version améliorée avec support complet du dictionnaire et détection intelligente des types.
+    Lit en une seule requête les fiches des tables demandées (la plus récente par nom de table).
+
+    Args:
+        conn: Connexion psycopg2
+        table_names: Noms des tables (nom_table) à lire
+        schema: Ou bien : toutes les tables de ce schéma (insensible à la casse)
+
+    Returns:
+        Liste de dictionnaires (une entrée par table), triée par nom de table
+    """
+    if table_names:
+        condition, params = "nom_table = ANY(%s)", (list(table_names),)
+    elif schema:
+        condition, params = "LOWER(schema) = LOWER(%s) AND nom_table IS NOT NULL", (schema,)
+    else:
+        raise ValueError("Indiquer des noms de tables ou un schéma")
+    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+        cursor.execute(METADATA_BATCH_QUERY.format(condition=condition), params)
+        rows = [dict(row) for row in cursor.fetchall()]
+    conn.rollback()
+    return rows
+
+
+def _dictionary_mapping(dictionnaire: Dict) -> Dict[str, Dict]:
+    """Dictionnaire des variables indexé par nom de colonne (première colonne de chaque ligne)"""
+    dict_mapping = {}
+    if dictionnaire and 'header' in dictionnaire and 'data' in dictionnaire:
+        dict_headers = dictionnaire['header']
+        dict_data = dictionnaire['data']
+        
+        # Pour chaque ligne du dictionnaire, créer un mapping nom_colonne -> infos
+        for row in dict_data:
+            if len(row) >= len(dict_headers):
+                var_info = dict(zip(dict_headers, row))
+                if dict_headers and row:
+                    var_name = row[0]
+                    dict_mapping[var_name] = var_info
+    return dict_mapping
+
+
+def dictionary_row_hashes(metadata: Dict) -> List[str]:
+    """Empreintes (voir type_memo) des lignes du dictionnaire d'une fiche, pour le préchargement"""
+    dict_mapping = _dictionary_mapping(metadata.get('dictionnaire') or {})
+    return [type_memo.dictionary_row_hash(info) for info in dict_mapping.values()]
+
+
+def generate_sql_from_metadata_row(metadata: Dict, debug_mode: bool = False, csv_path: Optional[str] = None,
+                                   csv_encoding: str = 'utf-8') -> str:
+    """
+    Génère le script SQL d'import d'une fiche déjà lue (aucun accès à la base).
     
     Args:
-        table_name: Nom de la table dans la base de métadonnées
+        metadata: Ligne de la table metadata sous forme de dictionnaire
         debug_mode: Si True, affiche des informations de débogage
+        csv_path: Fichier CSV local complet ; s'il est fourni, les types sont déduits
+            du profil de tout le fichier et non de l'extrait stocké
+        csv_encoding: Encodage Python du fichier CSV local
     
     Returns:
         Script SQL complet pour l'import des données
     """
-    try:
-        # Connexion à la base de métadonnées
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Récupération des métadonnées
-        cursor.execute("SELECT * FROM metadata WHERE nom_table = %s", (table_name,))
-        result = cursor.fetchone()
+    # Extraction des informations principales
+    nom_table = metadata.get('nom_table', 'unknown_table')
+    schema = metadata.get('schema', 'public')
+    description = metadata.get('description', '')
+    producteur = metadata.get('producteur', '')
+    type_donnees = metadata.get('type_donnees', '')
+    date_maj = metadata.get('date_maj', '')
+    frequence_maj = metadata.get('frequence_maj', '')
+    millesime = metadata.get('date_creation', '')
+    
+    # Extraction du contenu CSV et du dictionnaire
+    contenu_csv = metadata.get('contenu_csv', {})
+    dictionnaire = metadata.get('dictionnaire', {})
+    
+    # Vérification de la présence des en-têtes CSV
+    if not contenu_csv or 'header' not in contenu_csv:
+        raise ValueError(f"Structure CSV non disponible pour la table '{nom_table}'")
+    
+    colonnes = contenu_csv['header']
+    separateur = contenu_csv.get('separator', ';')
+    donnees_exemple = contenu_csv.get('data', [])
+    
+    # Création du dictionnaire des variables pour l'inférence de type
+    dict_mapping = _dictionary_mapping(dictionnaire)
+
+    # Profil du fichier complet (une passe, mémoire bornée) si un fichier local est fourni
+    profiles_by_name = {}
+    if csv_path:
+        profiling = profile_csv(csv_path, separator=separateur, encoding=csv_encoding)
+        profiles_by_name = {profile.name: profile for profile in profiling['profiles']}
+        if debug_mode:
+            st.write(f"Profil du fichier : {profiling['rows']:,} lignes analysées en {profiling['seconds']:.1f}s")
+
+    # Génération des définitions de colonnes
+    columns_info = []
+    for i, col in enumerate(colonnes):
+        # Nettoyage du nom de colonne
+        col_clean = col.strip()
         
-        if not result:
-            raise ValueError(f"Table '{table_name}' non trouvée dans la base de métadonnées")
+        # Récupération des valeurs d'exemple pour cette colonne
+        sample_values = [row[i] if len(row) > i else None for row in donnees_exemple]
         
-        # Conversion en dictionnaire
-        columns = [desc[0] for desc in cursor.description]
-        metadata = dict(zip(columns, result))
+        # Recherche des informations du dictionnaire
+        dict_info = dict_mapping.get(col, {})
+        profile = profiles_by_name.get(col_clean)
         
-        # Extraction des informations principales
-        nom_table = metadata.get('nom_table', 'unknown_table')
-        schema = metadata.get('schema', 'public')
-        description = metadata.get('description', '')
-        producteur = metadata.get('producteur', '')
-        type_donnees = metadata.get('type_donnees', '')
-        date_maj = metadata.get('date_maj', '')
-        frequence_maj = metadata.get('frequence_maj', '')
-        millesime = metadata.get('date_creation', '')
+        # Inférence du type SQL avec toutes les informations disponibles
+        sql_type = detect_column_type(
+            clean_values=sample_values,
+            csv_separator=separateur,
+            column_name=col_clean,
+            dict_info=dict_info,
+            profile=profile
+        )
         
-        # Extraction du contenu CSV et du dictionnaire
-        contenu_csv = metadata.get('contenu_csv', {})
-        dictionnaire = metadata.get('dictionnaire', {})
+        # Debug mode : afficher les détails de l'inférence
+        if debug_mode:
+            st.write(f"Colonne: {col_clean}")
+            st.write(f"Type inféré: {sql_type}")
+            if profile is not None:
+                # Statistiques seulement : jamais de valeurs lues dans le fichier
+                st.write(f"Profil: {profile.to_dict(include_values=False)}")
+            st.write("---")
         
-        # Vérification de la présence des en-têtes CSV
-        if not contenu_csv or 'header' not in contenu_csv:
-            raise ValueError(f"Structure CSV non disponible pour la table '{table_name}'")
+        columns_info.append({
+            "name": col_clean,
+            "type": sql_type
+        })
+
+    # Utilisation de generate_sql_script pour la génération finale
+    sql_script = generate_sql_script(
+        table_name=nom_table,
+        schema=schema,
+        columns=columns_info,
+        description=description,
+        producteur=producteur,
+        type_donnees=type_donnees,
+        millesime=millesime,
+        derniere_maj=date_maj,
+        frequence_maj=frequence_maj,
+        separator=separateur,
+        encoding=PG_ENCODINGS.get(csv_encoding.lower(), 'UTF8'),
+        csv_path=csv_path or ""
+    )
+    
+    return sql_script
+
+
+def generate_sql_from_metadata(table_name: str, debug_mode: bool = False, csv_path: Optional[str] = None,
+                               csv_encoding: str = 'utf-8') -> str:
+    """
+    Génère une requête SQL d'import complète basée sur les métadonnées stockées.
+    Version améliorée avec support complet du dictionnaire et détection intelligente des types.
+    
+    Args:
+        table_name: Nom de la table dans la base de métadonnées
+        debug_mode: Si True, affiche des informations de débogage
+        csv_path: Fichier CSV local complet ; s'il est fourni, les types sont déduits
+            du profil de tout le fichier et non de l'extrait stocké
+        csv_encoding: Encodage Python du fichier CSV local
+    
+    Returns:
+        Script SQL complet pour l'import des données
+    """
+    try:
+        # Récupération des métadonnées et des inférences déjà calculées pour ce dictionnaire
+        # (autres fiches, autres millésimes), sur une connexion empruntée au pool
+        with db_connection() as conn:
+            rows = fetch_metadata_rows(conn, table_names=[table_name])
+            if not rows:
+                raise ValueError(f"Table '{table_name}' non trouvée dans la base de métadonnées")
+            metadata = rows[0]
+            type_memo.preload(conn, dictionary_row_hashes(metadata))
         
-        colonnes = contenu_csv['header']
-        separateur = contenu_csv.get('separator', ';')
-        donnees_exemple = contenu_csv.get('data', [])
+        sql_script = generate_sql_from_metadata_row(metadata, debug_mode=debug_mode, csv_path=csv_path,
+                                                    csv_encoding=csv_encoding)
         
-        # Création du dictionnaire des variables pour l'inférence de type
-        dict_mapping = {}
-        if dictionnaire and 'header' in dictionnaire and 'data' in dictionnaire:
-            dict_headers = dictionnaire['header']
-            dict_data = dictionnaire['data']
-            
-            # Pour chaque ligne du dictionnaire, créer un mapping nom_colonne -> infos
-            for row in dict_data:
-                if len(row) >= len(dict_headers):
-                    var_info = dict(zip(dict_headers, row))
-                    if dict_headers and row:
-                        var_name = row[0]
-                        dict_mapping[var_name] = var_info
-
-        # Génération des définitions de colonnes
-        columns_info = []
-        for i, col in enumerate(colonnes):
-            # Nettoyage du nom de colonne
-            col_clean = col.strip()
-            
-            # Récupération des valeurs d'exemple pour cette colonne
-            sample_values = [row[i] if len(row) > i else None for row in donnees_exemple]
-            
-            # Recherche des informations du dictionnaire
-            dict_info = dict_mapping.get(col, {})
-            
-            # Inférence du type SQL avec toutes les informations disponibles
-            sql_type = detect_column_type(
-                clean_values=sample_values,
-                csv_separator=separateur,
-                column_name=col_clean,
-                dict_info=dict_info
-            )
-            
-            # Debug mode : afficher les détails de l'inférence
-            if debug_mode:
-                st.write(f"Colonne: {col_clean}")
-                st.write(f"Type inféré: {sql_type}")
-                st.write("---")
-            
-            columns_info.append({
-                "name": col_clean,
-                "type": sql_type
-            })
-
-        # Utilisation de generate_sql_script pour la génération finale
-        sql_script = generate_sql_script(
-            table_name=nom_table,
-            schema=schema,
-            columns=columns_info,
-            description=description,
-            producteur=producteur,
-            type_donnees=type_donnees,
-            millesime=millesime,
-            derniere_maj=date_maj,
-            frequence_maj=frequence_maj
-        )
+        # Enregistrement des nouvelles inférences pour les prochaines générations
+        with db_connection() as conn:
+            type_memo.flush(conn)
         
-        conn.close()
         return sql_script
         
     except Exception as e:
@@ -736,6 +788,9 @@ def generate_sql_download_button(table_name: str, button_label: str = "💾 Tél
 def display_sql_generation_interface_new(table_name: str, debug_mode: bool = True) -> None:
     """
     Affiche l'interface complète de génération SQL avec le script et les boutons.
+    Les types sont déduits de l'extrait stocké : le profilage du fichier complet,
+    qui lit un chemin local, est réservé à la génération par lots en ligne de commande
+    (scripts/generate_sql_batch.py).
     
     Args:
         table_name: Nom de la table pour laquelle générer le script
@@ -768,8 +823,9 @@ def display_sql_generation_interface_new(table_name: str, debug_mode: bool = Tru
             ### 📋 Instructions d'utilisation :
             1. **Téléchargez** le script SQL ci-dessus
             2. **Créez le schéma** si nécessaire : `CREATE SCHEMA IF NOT EXISTS "nom_schema";`
-            3. **Importez vos données** avec une commande COPY adaptée à votre fichier
-            4. **Exécutez** le script dans votre outil de gestion PostgreSQL (DBeaver, pgAdmin, etc.)
+            3. **Indiquez le chemin du fichier** dans la commande `\\copy` (étape 2 du script) et vérifiez l'encodage
+            4. **Exécutez** le script avec psql : `psql -v ON_ERROR_STOP=1 -f import_nom_table.sql`
+               (le chargement, la conversion des types, les index et ANALYZE sont inclus)
             """)
     except Exception as e:
         st.error(f"🔥 ERREUR DANS NOTRE NOUVELLE FONCTION : {str(e)}") 
\ No newline at end of file
@@ -0,0 +1,193 @@
+"""
+Mémoire des types inférés à partir du dictionnaire des variables.
+
+Les mêmes définitions de variables INSEE (CODGEO, LIBCOM, P21_POP...) reviennent
+d'un millésime et d'une fiche à l'autre : le type déduit d'une ligne du dictionnaire
+est mémorisé sous une empreinte de cette ligne et de la version des règles
+(``RULES_VERSION``), dans un cache LRU borné du processus. La mémoire peut être
+partagée entre processus et redémarrages via la table ``type_inference_memo``.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+import psycopg2
+import psycopg2.extras
+
+from .cache import LRUCache
+from .type_rules import RULES_VERSION
+
+TYPE_MEMO_MAX_ENTRIES = 4096
+TYPE_MEMO_PERSIST = os.getenv('TYPE_INFERENCE_MEMO_PERSIST', '1') != '0'
+
+_memo = LRUCache(max_entries=TYPE_MEMO_MAX_ENTRIES, ttl=float('inf'))
+_MEMO_GENERATION = 0  # les entrées ne sont jamais invalidées : la version des règles fait partie de la clé
+
+# Inférences calculées depuis le dernier enregistrement en base (empreinte -> type)
+_pending: Dict[str, Optional[str]] = {}
+_pending_lock = threading.Lock()
+
+
+def row_hash(kind: str, normalized) -> str:
+    """Empreinte d'une entrée normalisée, préfixée par son genre et la version des règles"""
+    payload = json.dumps([RULES_VERSION, kind, normalized], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def normalize_dictionary_row(dict_info: Dict) -> List:
+    """
+    Forme canonique d'une ligne du dictionnaire pour _detect_column_type_from_dictionary :
+    seules les transformations déjà appliquées par les règles sont faites (en-têtes en
+    minuscules, valeurs non textuelles ignorées) ; l'ordre des colonnes est conservé
+    car la première colonne reconnue l'emporte.
+    """
+    return [[str(key).lower(), value if isinstance(value, str) else None]
+            for key, value in (dict_info or {}).items()]
+
+
+def normalize_description(description: str) -> str:
+    """Forme canonique d'une description pour detect_type_from_description (texte en minuscules)"""
+    return description.lower() if description else ''
+
+
+def dictionary_row_hash(dict_info: Dict) -> str:
+    return row_hash('dictionnaire', normalize_dictionary_row(dict_info))
+
+
+def memoize_inference(kind: str, normalize: Callable):
+    """
+    Décorateur mémorisant une fonction d'inférence à un argument (ligne du dictionnaire,
+    description...) sous l'empreinte de sa forme normalisée.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(arg):
+            key = row_hash(kind, normalize(arg))
+            found, sql_type = _memo.get(key, _MEMO_GENERATION)
+            if found:
+                return sql_type
+            sql_type = func(arg)
+            _memo.set(key, sql_type, _MEMO_GENERATION)
+            if TYPE_MEMO_PERSIST:
+                with _pending_lock:
+                    if len(_pending) < TYPE_MEMO_MAX_ENTRIES:
+                        _pending[key] = sql_type
+            return sql_type
+        return wrapper
+    return decorator
+
+
+def preload(conn, hashes: Iterable[str]) -> int:
+    """
+    Charge en mémoire les inférences déjà enregistrées pour ces empreintes (une requête).
+    Sans effet si la table n'existe pas encore.
+
+    Returns:
+        Nombre d'inférences chargées
+    """
+    missing = [key for key in set(hashes) if not _memo.get(key, _MEMO_GENERATION)[0]]
+    if not TYPE_MEMO_PERSIST or not missing:
+        return 0
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT row_hash, sql_type FROM type_inference_memo "
+                "WHERE rules_version = %s AND row_hash = ANY(%s)",
+                (RULES_VERSION, missing)
+            )
+            rows = cur.fetchall()
+        conn.rollback()
+    except psycopg2.Error as e:
+        conn.rollback()
+        logging.warning(f"Lecture de la mémoire des types inférés impossible : {str(e)}")
+        return 0
+    for key, sql_type in rows:
+        _memo.set(key, sql_type, _MEMO_GENERATION)
+    return len(rows)
+
+
+def flush(conn) -> int:
+    """
+    Enregistre en base les inférences calculées depuis le dernier appel (un seul INSERT).
+    En cas d'erreur, les inférences restent en attente pour le prochain appel.
+
+    Returns:
+        Nombre d'inférences enregistrées
+    """
+    with _pending_lock:
+        entries = list(_pending.items())
+        _pending.clear()
+    if not entries:
+        return 0
+    try:
+        with conn.cursor() as cur:
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO type_inference_memo (rules_version, row_hash, sql_type)
+                VALUES %s
+                ON CONFLICT (rules_version, row_hash)
+                DO UPDATE SET sql_type = EXCLUDED.sql_type, updated_at = CURRENT_TIMESTAMP
+            """, [(RULES_VERSION, key, sql_type) for key, sql_type in entries])
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        logging.warning(f"Enregistrement de la mémoire des types inférés impossible : {str(e)}")
+        with _pending_lock:
+            for key, sql_type in entries:
+                if len(_pending) < TYPE_MEMO_MAX_ENTRIES:
+                    _pending.setdefault(key, sql_type)
+        return 0
+    return len(entries)
+
+
+def known(hashes: Iterable[str]) -> Dict[str, Optional[str]]:
+    """Inférences en mémoire pour ces empreintes (à transmettre à un processus de travail)"""
+    entries = {}
+    for key in hashes:
+        found, sql_type = _memo.get(key, _MEMO_GENERATION)
+        if found:
+            entries[key] = sql_type
+    return entries
+
+
+def seed(entries: Dict[str, Optional[str]]) -> None:
+    """Charge en mémoire des inférences déjà enregistrées (sans les remettre en attente)"""
+    for key, sql_type in entries.items():
+        _memo.set(key, sql_type, _MEMO_GENERATION)
+
+
+def take_pending() -> Dict[str, Optional[str]]:
+    """Retire et retourne les inférences en attente (transmises par un processus de travail)"""
+    with _pending_lock:
+        entries = dict(_pending)
+        _pending.clear()
+    return entries
+
+
+def merge(entries: Dict[str, Optional[str]]) -> None:
+    """Ajoute des inférences calculées dans un autre processus (mémoire et attente d'enregistrement)"""
+    for key, sql_type in entries.items():
+        _memo.set(key, sql_type, _MEMO_GENERATION)
+    if TYPE_MEMO_PERSIST:
+        with _pending_lock:
+            for key, sql_type in entries.items():
+                if len(_pending) < TYPE_MEMO_MAX_ENTRIES:
+                    _pending[key] = sql_type
+
+
+def clear() -> None:
+    """Vide la mémoire du processus (la table n'est pas modifiée)"""
+    _memo.clear()
+    with _pending_lock:
+        _pending.clear()
+
+
+def stats() -> Dict:
+    snapshot = _memo.stats()
+    snapshot['pending'] = len(_pending)
+    snapshot['rules_version'] = RULES_VERSION
+    return snapshot
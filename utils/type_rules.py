@@ -0,0 +1,286 @@
+"""
+Règles déclaratives d'inférence des types SQL (dictionnaire, descriptions, noms de colonnes).
+
+Chaque table de règles est compilée une seule fois, à l'import, en une expression
+régulière combinée : une seule recherche par texte analysé, quel que soit le
+nombre de mots-clés. L'ordre des règles dans une table fixe leur priorité
+(la première règle qui correspond l'emporte, comme dans les anciennes cascades
+de ``if``/``elif``).
+"""
+
+import hashlib
+import re
+from typing import Iterable, NamedTuple, Optional, Tuple
+
+# À incrémenter quand la logique d'inférence change en dehors des tables de règles
+RULES_REVISION = 1
+
+
+class Rule(NamedTuple):
+    """
+    Règle d'inférence.
+
+    Attributes:
+        name: Identifiant de la règle (journalisation, débogage)
+        sql_type: Type SQL proposé quand la règle s'applique
+        keywords: Sous-chaînes recherchées telles quelles (texte déjà en minuscules)
+        patterns: Expressions régulières recherchées (ancrages ^/$ autorisés)
+        exclude: Sous-chaînes qui annulent la règle (faux positifs connus) ;
+            les règles suivantes sont alors évaluées
+    """
+    name: str
+    sql_type: str
+    keywords: Tuple[str, ...] = ()
+    patterns: Tuple[str, ...] = ()
+    exclude: Tuple[str, ...] = ()
+
+
+class RuleMatch(NamedTuple):
+    rule: Rule
+    priority: int
+
+
+def _alternation(rule: Rule) -> str:
+    alternation = '|'.join([re.escape(keyword) for keyword in rule.keywords] + list(rule.patterns))
+    if rule.keywords and not rule.patterns:
+        # Filtre sur la première lettre : la plupart des positions sont écartées sans
+        # essayer chaque mot-clé
+        first_chars = ''.join(sorted({re.escape(keyword[0]) for keyword in rule.keywords}))
+        return f"(?=[{first_chars}])(?:{alternation})"
+    return alternation
+
+
+class RuleSet:
+    """
+    Table de règles ordonnée compilée en une seule expression régulière.
+
+    Chaque règle devient une alternative ``.*?(?P<rN>...)`` : le moteur essaie les
+    alternatives dans l'ordre et ne passe à la suivante que si la règle est absente
+    de tout le texte. Un seul appel ``match`` (dans le moteur C) retourne donc la
+    règle la plus prioritaire présente dans le texte.
+    """
+
+    def __init__(self, rules: Iterable[Rule], _priorities: Optional[Tuple[int, ...]] = None):
+        self.rules = tuple(rules)
+        self._priorities = _priorities or tuple(range(len(self.rules)))
+        alternatives = [f".*?(?P<r{i}>{_alternation(rule)})" for i, rule in enumerate(self.rules)]
+        self._regex = re.compile('|'.join(alternatives), re.DOTALL) if alternatives else None
+        self._matches = tuple(RuleMatch(rule, priority) for rule, priority in zip(self.rules, self._priorities))
+        self._exclusions = {}
+        self._fallbacks = {}
+        for i, rule in enumerate(self.rules):
+            if rule.exclude:
+                self._exclusions[i] = re.compile('|'.join(re.escape(fp) for fp in rule.exclude))
+                # Table sans la règle exclue, évaluée quand un faux positif est détecté
+                kept = [j for j in range(len(self.rules)) if j != i]
+                self._fallbacks[i] = RuleSet(
+                    [self.rules[j] for j in kept], tuple(self._priorities[j] for j in kept)
+                )
+
+    def match(self, text: str) -> Optional[RuleMatch]:
+        """Règle la plus prioritaire présente dans le texte, avec sa priorité (0 = la plus forte)"""
+        if not text or self._regex is None:
+            return None
+        found = self._regex.match(text)
+        if found is None:
+            return None
+        best = int(found.lastgroup[1:])
+        exclusion = self._exclusions.get(best)
+        if exclusion is not None and exclusion.search(text):
+            return self._fallbacks[best].match(text)
+        return self._matches[best]
+
+    def sql_type(self, text: str) -> Optional[str]:
+        """Type SQL de la règle gagnante, ou None si aucune règle ne s'applique"""
+        found = self.match(text)
+        return found.rule.sql_type if found else None
+
+
+# ---------------------------------------------------------------------------
+# Types déclarés dans le dictionnaire des variables (normalize_data_type)
+# ---------------------------------------------------------------------------
+
+TYPE_MAPPINGS = {
+    # Types texte
+    'text': 'TEXT',
+    'string': 'VARCHAR(255)',
+    'str': 'VARCHAR(255)',
+    'char': 'VARCHAR(255)',
+    'character': 'VARCHAR(255)',
+    'varchar': 'VARCHAR(255)',
+    'texte': 'TEXT',
+    'chaîne': 'VARCHAR(255)',
+    'chaine': 'VARCHAR(255)',
+
+    # Types numériques entiers
+    'int': 'INTEGER',
+    'integer': 'INTEGER',
+    'entier': 'INTEGER',
+    'number': 'INTEGER',
+    'numeric': 'INTEGER',
+    'num': 'INTEGER',
+    'bigint': 'BIGINT',
+    'smallint': 'SMALLINT',
+
+    # Types numériques décimaux
+    'float': 'DECIMAL(15,6)',
+    'decimal': 'DECIMAL(15,6)',
+    'double': 'DECIMAL(15,6)',
+    'real': 'DECIMAL(15,6)',
+    'décimal': 'DECIMAL(15,6)',
+    'flottant': 'DECIMAL(15,6)',
+
+    # Types date/temps ('temps' seul est trop générique : "temps partiel")
+    'date': 'DATE',
+    'datetime': 'TIMESTAMP',
+    'timestamp': 'TIMESTAMP',
+    'time': 'TIME',
+
+    # Types booléens
+    'boolean': 'BOOLEAN',
+    'bool': 'BOOLEAN',
+    'booléen': 'BOOLEAN',
+    'vrai/faux': 'BOOLEAN',
+    'oui/non': 'BOOLEAN',
+
+    # Types binaires/blob
+    'blob': 'BYTEA',
+    'binary': 'BYTEA',
+    'binaire': 'BYTEA'
+}
+
+VARCHAR_SIZE_RE = re.compile(r'varchar\s*\(\s*(\d+)\s*\)')
+DECIMAL_SIZE_RE = re.compile(r'decimal\s*\(\s*(\d+)\s*,\s*(\d+)\s*\)')
+
+# Types contenant certains mots-clés (patterns PRÉCIS pour éviter les faux positifs)
+DECLARED_TYPE_RULES = RuleSet([
+    Rule('texte', 'TEXT', keywords=('text', 'texte', 'long')),
+    Rule('entier', 'INTEGER', keywords=('int', 'entier', 'number')),
+    Rule('decimal', 'DECIMAL(15,6)', keywords=('float', 'decimal', 'double')),
+    Rule('date', 'DATE', keywords=('date', 'datetime', 'timestamp')),
+    Rule('booleen', 'BOOLEAN', keywords=('bool', 'vrai', 'faux')),
+])
+
+# ---------------------------------------------------------------------------
+# Colonnes du dictionnaire (_detect_column_type_from_dictionary)
+# ---------------------------------------------------------------------------
+
+# En-têtes de colonnes listant des codes ou modalités
+DICTIONARY_CODES_KEY_RE = re.compile('|'.join([
+    r'code[s]?\s*(?:possible|autorisé|valide|détaillé)',
+    r'modalité[s]?\s*(?:possible|autorisée)',
+    r'correspondance[s]?[\s_](?:code|valeur)',
+    r'valeur[s]?\s*(?:possible|autorisée)',
+    r'liste\s*(?:des\s*)?(?:code|valeur)',
+    r'nomenclature',
+    r'codification',
+]))
+
+# En-têtes de colonnes décrivant le type de la variable
+DICTIONARY_TYPE_KEY_RE = re.compile('|'.join([
+    r'type[s]?[\s_](?:donnée|variable|champ)',
+    r'format[\s_](?:donnée|variable|champ)',
+    r'nature[\s_](?:donnée|variable|champ)',
+    r'caractéristique[\s_](?:donnée|variable)',
+    r'description[\s_]type',
+]))
+
+NUMERIC_CODE_RE = re.compile(r'[-]?\d+')
+ALPHANUMERIC_CODE_RE = re.compile(r'[A-Za-z0-9]+')
+TEXT_LENGTH_RE = re.compile(r'(\d+)[\s]*(?:caractère|char)')
+
+# Valeur d'une colonne "type" du dictionnaire ; la règle 'texte' peut préciser une longueur
+DICTIONARY_TYPE_VALUE_RULES = RuleSet([
+    Rule('entier', 'INTEGER', keywords=('entier', 'integer', 'nombre entier')),
+    Rule('decimal', 'DECIMAL(10,3)', keywords=('decimal', 'réel', 'float', 'nombre décimal')),
+    Rule('booleen', 'BOOLEAN', keywords=('booléen', 'boolean', 'vrai/faux', 'oui/non')),
+    Rule('date', 'DATE', keywords=('date', 'datetime')),
+    Rule('texte', 'VARCHAR(255)', keywords=('texte', 'caractère')),
+])
+
+# ---------------------------------------------------------------------------
+# Descriptions des variables (detect_type_from_description)
+# ---------------------------------------------------------------------------
+
+DESCRIPTION_RULES = RuleSet([
+    # Comptages → INTEGER (plus spécifique, doit venir AVANT les codes)
+    Rule('comptage', 'INTEGER', keywords=(
+        'nombre de', "nombre d'", 'count', 'total', 'effectif', 'population',
+        'nb de', 'quantité', 'quantite', 'effectifs'
+    )),
+    # Taux/Pourcentages/Ratios → DECIMAL (avant les codes aussi)
+    Rule('ratio', 'DECIMAL(15,6)', keywords=(
+        'taux', 'pourcentage', 'ratio', 'rate', 'part de', 'proportion',
+        'indice', 'moyenne', 'median', 'percentile'
+    )),
+    # Codes/Identifiants → VARCHAR (protection universelle anti-ZZZZZZ),
+    # sauf "emplois aidés", "aides familiaux"... qui sont des catégories
+    Rule('code', 'VARCHAR(50)', keywords=(
+        'code', 'codes', 'identifiant', 'identifier', 'numéro', 'numero',
+        'référence', 'reference', 'clé', 'cle', 'key', 'id', 'siren', 'siret'
+    ), exclude=('emplois aidés', 'aides familiaux', 'emploi aidé', 'aide familial')),
+    # Libellés géographiques spécifiques (peuvent être longs)
+    Rule('libelle_geo', 'VARCHAR(200)', keywords=(
+        'libellé de la commune', 'libellé commune', "libellé de l'iris", 'libellé iris',
+        "label de l'iris", 'label iris',
+        'libcom', 'libiris', 'lab_iris'
+    )),
+    # Autres libellés courts/moyens
+    Rule('libelle', 'VARCHAR(255)', keywords=(
+        'libellé', 'libelle', 'nom de', 'intitulé', 'intitule',
+        'designation', 'désignation', 'appellation'
+    )),
+])
+
+# ---------------------------------------------------------------------------
+# Noms de colonnes
+# ---------------------------------------------------------------------------
+
+GEO_LABEL_PATTERNS = (r'^libcom$', r'^libiris$', r'^lab_iris$')
+
+# Identifiants géographiques techniques : toujours VARCHAR (protection anti-ZZZZZZ)
+GEO_CRITICAL_PATTERNS = (
+    r'^iris$', r'^triris$', r'^codgeo$', r'^geocode$',
+    r'^commune$', r'^com$', r'^dep$', r'^reg$', r'^uu\d*$',
+    r'^typ_iris$', r'^modif_iris$',
+)
+
+# Protections absolues de detect_column_type_intelligent_universal
+GEO_PROTECTION_RULES = RuleSet([
+    Rule('libelle_geo', 'VARCHAR(200)', patterns=GEO_LABEL_PATTERNS),
+    Rule('code_geo', 'VARCHAR(50)', patterns=GEO_CRITICAL_PATTERNS),
+])
+
+# Identifiants et codes reconnus par leur nom (patterns exacts ou délimités)
+COLUMN_NAME_RULES = RuleSet([
+    Rule('libelle_geo', 'VARCHAR(200)', patterns=GEO_LABEL_PATTERNS),
+    Rule('identifiant', 'VARCHAR(50)', patterns=(
+        # Codes explicites
+        r'^code$', r'^cod$', r'^id$', r'_id$', r'^id_', r'_code$', r'^code_',
+        r'^identifier$', r'^identifiant$',
+        # Codes géographiques INSEE
+        r'^iris$', r'^triris$', r'^codgeo$', r'^geocode$',
+        r'^commune$', r'^com$', r'^dep$', r'^reg$', r'^uu\d*$',
+        # Codes d'entreprises
+        r'^siren$', r'^siret$', r'^nic$', r'^ape$', r'^naf$', r'^tva$',
+        # Autres identifiants
+        r'^reference$', r'^ref$', r'^numero$', r'^num$', r'^matricule$',
+        r'^cle$', r'^key$', r'_ref$', r'_key$',
+        # Indicateurs techniques géographiques (sans les libellés)
+        r'^typ_iris$', r'^modif_iris$',
+    )),
+])
+
+
+def _rules_version() -> str:
+    """Empreinte des tables de règles : toute modification invalide les inférences mémorisées"""
+    tables = (
+        RULES_REVISION, sorted(TYPE_MAPPINGS.items()), VARCHAR_SIZE_RE.pattern, DECIMAL_SIZE_RE.pattern,
+        DECLARED_TYPE_RULES.rules, DICTIONARY_CODES_KEY_RE.pattern, DICTIONARY_TYPE_KEY_RE.pattern,
+        NUMERIC_CODE_RE.pattern, ALPHANUMERIC_CODE_RE.pattern, TEXT_LENGTH_RE.pattern,
+        DICTIONARY_TYPE_VALUE_RULES.rules, DESCRIPTION_RULES.rules,
+    )
+    return hashlib.sha1(repr(tables).encode('utf-8')).hexdigest()[:12]
+
+
+RULES_VERSION = _rules_version()